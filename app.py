@@ -13,6 +13,9 @@ try:
     from views.welcome import render_welcome_page
     from views.upload import render_upload_page
     from views.analysis import render_analysis_dashboard
+    from views.comparison import render_comparison_page
+    from views.batch import render_batch_page
+    from views.spc import render_spc_page
     from views.help import render_help_page
 except ImportError as e:
     st.error(f"Import error: {e}")
@@ -39,12 +42,30 @@ def init_session_state():
     state_defaults = {
         'data_uploaded': False,
         'processed_data': None,
+        'pre_data': None,
+        'post_data': None,
+        'pre_features': None,
+        'post_features': None,
+        'scoring_profile': None,
+        'custom_profiles': {},
         'pre_scores': None,
         'post_scores': None,
+        'pre_index': None,
+        'post_index': None,
+        'pre_summary': None,
+        'post_summary': None,
         'pre_plots': {},
         'post_plots': {},
-        'pre_report_html': "",
-        'post_report_html': "",
+        'pre_lots': {},
+        'post_lots': {},
+        'pre_report_request': None,
+        'post_report_request': None,
+        'comparison': None,
+        'spec_limits': {},
+        'pre_similarity': None,
+        'post_similarity': None,
+        'similarity_library': {},
+        'batch_bundle': None,
         'processed_filename': None,
         'target_mean_pre': 120.0,
         'target_mean_post': 17.5,
@@ -74,6 +95,9 @@ def main():
             ("☁️ Data Upload", "Data Upload"), 
             ("📏 Pre-OL Analysis", "Pre-OL Analysis"),
             ("📐 Post-OL Analysis", "Post-OL Analysis"),
+            ("🔁 Pre → Post Comparison", "Comparison"),
+            ("🗂️ Batch Reports", "Batch Reports"),
+            ("📈 SPC Charts", "SPC"),
             ("❓ Help", "Help")
         ]
         
@@ -125,6 +149,12 @@ def main():
             render_analysis_dashboard("Pre-OL")
         elif page == "Post-OL Analysis":
             render_analysis_dashboard("Post-OL")
+        elif page == "Comparison":
+            render_comparison_page()
+        elif page == "Batch Reports":
+            render_batch_page()
+        elif page == "SPC":
+            render_spc_page()
         elif page == "Help":
             render_help_page()
 
@@ -0,0 +1,204 @@
+import io
+import os
+import glob
+import time
+import datetime
+import shutil
+import zipfile
+import tempfile
+import multiprocessing
+import concurrent.futures
+
+import pandas as pd
+from utils import report_templates as templates
+from utils.report_templates import ReportTemplate
+
+# Lot files scored at once; each worker holds a single lot in memory
+MAX_BATCH_WORKERS = max(1, min(4, os.cpu_count() or 1))
+
+# Bundles are temporary ZIP files; ones older than this are removed (e.g. left by ended sessions)
+BUNDLE_PREFIX = "lot_reports_"
+STALE_BUNDLE_SECONDS = 24 * 3600
+
+# Plotly.js is shipped once at the bundle root; reports in reports/ load it from there
+BUNDLE_PLOTLY_JS = "plotly.min.js"
+
+# Cross-lot index page rows
+BUNDLE_INDEX_TABLE_START = (
+    '<table class="styled-table"><thead><tr><th>Lot</th><th>Condition</th><th>Sensors</th>'
+    '<th>Mean TUS</th><th>Mean RUS</th><th>Yield</th><th>Disposition</th><th>Files</th></tr></thead><tbody>\n'
+)
+BUNDLE_INDEX_ROW = ReportTemplate(
+    '<tr><td>{lot}</td><td>{condition}</td><td>{sensors}</td><td>{mean_tus}</td><td>{mean_rus}</td>'
+    '<td>{yield_}</td><td>{disposition}</td>'
+    '<td><a href="reports/{report}">Report</a> · <a href="scores/{scores}">Scores</a></td></tr>\n'
+)
+BUNDLE_INDEX_ERROR_ROW = ReportTemplate('<tr><td>{lot}</td><td colspan="7">⚠️ {error}</td></tr>\n')
+
+def _safe_name(name):
+    """Turns a lot file name into a name usable inside the bundle."""
+    stem = os.path.splitext(os.path.basename(name))[0]
+    return "".join(c if c.isalnum() or c in "-_." else "_" for c in stem) or "lot"
+
+def new_bundle_path():
+    """Creates an empty temporary file for a bundle and returns its path."""
+    fd, path = tempfile.mkstemp(prefix=BUNDLE_PREFIX, suffix=".zip")
+    os.close(fd)
+    return path
+
+def remove_stale_bundles(max_age=STALE_BUNDLE_SECONDS):
+    """Deletes bundle files older than `max_age` seconds; returns how many were removed."""
+    removed = 0
+    cutoff = time.time() - max_age
+    for path in glob.glob(os.path.join(tempfile.gettempdir(), f"{BUNDLE_PREFIX}*.zip")):
+        try:
+            if os.path.getmtime(path) < cutoff:
+                os.remove(path)
+                removed += 1
+        except OSError:
+            pass
+    return removed
+
+def process_lot_file(csv_path, lot_name, target_mean_pre, target_mean_post, out_dir, profile=None):
+    """Scores one lot file and writes its reports and score files into `out_dir`.
+
+    Runs in a worker process. Only a small summary per condition is returned;
+    reports go straight to disk so the parent never holds them in memory.
+    Lots are dispositioned against the default limits for each target mean and the profile's mean width.
+    """
+    from processing.data_processing import (
+        CONDITIONS, DEFAULT_WINDOW, validate_lot_data, prepare_condition_data, compute_uniformity_scores, create_condition_plots
+    )
+    from processing.summary import summarize_scores
+    from processing.disposition import default_spec_limits, evaluate_disposition
+    from processing.spc import lot_values
+    from utils.helpers import write_lot_analysis_report
+
+    entries = []
+    try:
+        df = validate_lot_data(pd.read_csv(csv_path))
+    except Exception as e:
+        return {'lot': lot_name, 'error': str(e), 'entries': entries}
+
+    for condition, target_mean in [('Pre', target_mean_pre), ('Post', target_mean_post)]:
+        label = CONDITIONS[condition]['label']
+        condition_df = prepare_condition_data(df, condition)
+        if condition_df is None or condition_df.empty:
+            continue
+        scores = compute_uniformity_scores(condition_df, target_mean, profile)
+        if scores.empty:
+            continue
+
+        summary = summarize_scores(scores)
+        disposition = evaluate_disposition(scores, default_spec_limits(target_mean, profile))
+        plots = create_condition_plots(condition_df, scores, condition, target_mean, profile.window if profile else DEFAULT_WINDOW)
+        report_path = os.path.join(out_dir, f"{lot_name}_{label}_report.html")
+        scores_path = os.path.join(out_dir, f"{lot_name}_{label}_scores.csv")
+        with open(report_path, "w", encoding="utf-8") as out:
+            write_lot_analysis_report(out, f"{label} Thickness Report", scores, plots, target_mean, lot_name, summary=summary,
+                                      disposition=disposition, plotly_src=f"../{BUNDLE_PLOTLY_JS}")
+        scores.to_csv(scores_path, index=False)
+
+        entries.append({
+            'condition': label,
+            'sensors': summary.count,
+            'mean_tus': summary.mean('TUS'),
+            'mean_rus': summary.mean('RUS'),
+            'yield': disposition.yield_,
+            'disposition': disposition.status,
+            'fingerprint': summary.fingerprint,
+            'spc_values': lot_values(summary),
+            'report': report_path,
+            'scores': scores_path,
+        })
+    return {'lot': lot_name, 'error': None, 'entries': entries}
+
+def write_bundle_index(out, results, target_mean_pre, target_mean_post):
+    """Writes the cross-lot index page linking every report and score file in the bundle."""
+    title = "Lot Report Bundle"
+    out.write(templates.PAGE_START.render(raw=('head_extra',), title=title, head_extra=""))
+    out.write(templates.PAGE_HEADER.render(
+        raw=('logo',), logo=templates.logo_img_html(), title=title,
+        generated=datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    ))
+    out.write(templates.METRICS_START)
+    for label, value in [
+        ("Lots", len(results)),
+        ("Reports", sum(len(r['entries']) for r in results)),
+        ("Target Mean Pre-OL", f"{target_mean_pre} μm"),
+        ("Target Mean Post-OL", f"{target_mean_post} μm"),
+    ]:
+        out.write(templates.METRIC_CARD.render(label=label, value=value))
+    out.write(templates.METRICS_END)
+
+    out.write(templates.SECTION_START.render(heading="📋 Lots"))
+    out.write(BUNDLE_INDEX_TABLE_START)
+    for result in results:
+        if result['error'] or not result['entries']:
+            out.write(BUNDLE_INDEX_ERROR_ROW.render(lot=result['lot'], error=result['error'] or "No scorable data"))
+        for entry in result['entries']:
+            out.write(BUNDLE_INDEX_ROW.render(
+                lot=result['lot'], condition=entry['condition'], sensors=entry['sensors'],
+                mean_tus=f"{entry['mean_tus']:.3f}", mean_rus=f"{entry['mean_rus']:.3f}",
+                yield_=f"{entry['yield']:.1%}", disposition=entry['disposition'],
+                report=os.path.basename(entry['report']), scores=os.path.basename(entry['scores'])
+            ))
+    out.write('</tbody></table>\n')
+    out.write(templates.SECTION_END)
+    out.write(templates.PAGE_END.render(input_filename=f"{len(results)} lot files"))
+
+def build_lot_bundle(lot_files, target_mean_pre, target_mean_post, bundle_path, max_workers=None, progress_callback=None, profile=None):
+    """Scores many lot files across a process pool and streams the results into one ZIP.
+
+    `lot_files` is a list of (file name, file-like or bytes). Each finished lot is
+    copied into the archive and deleted from disk before the next is added, so
+    memory holds at most one lot per worker. Plotly.js is written once at the
+    archive root and shared by every report. Returns the per-lot results.
+    """
+    from plotly.offline import get_plotlyjs
+
+    work_dir = tempfile.mkdtemp(prefix="lot_bundle_")
+    results = []
+    try:
+        jobs = []
+        used_names = set()
+        for name, data in lot_files:
+            lot_name = _safe_name(name)
+            while lot_name in used_names:
+                lot_name += "_1"
+            used_names.add(lot_name)
+            csv_path = os.path.join(work_dir, f"{lot_name}.csv")
+            with open(csv_path, "wb") as f:
+                f.write(data if isinstance(data, bytes) else data.getbuffer())
+            jobs.append((csv_path, lot_name))
+
+        with zipfile.ZipFile(bundle_path, "w", compression=zipfile.ZIP_DEFLATED) as bundle, \
+                concurrent.futures.ProcessPoolExecutor(
+                    max_workers=max_workers or MAX_BATCH_WORKERS,
+                    mp_context=multiprocessing.get_context('spawn')
+                ) as executor:
+            bundle.writestr(BUNDLE_PLOTLY_JS, get_plotlyjs())
+            futures = {
+                executor.submit(process_lot_file, csv_path, lot_name, target_mean_pre, target_mean_post, work_dir, profile): lot_name
+                for csv_path, lot_name in jobs
+            }
+            for done, future in enumerate(concurrent.futures.as_completed(futures), start=1):
+                try:
+                    result = future.result()
+                except Exception as e:
+                    # One bad lot is reported in the index instead of failing the whole bundle
+                    result = {'lot': futures[future], 'error': str(e), 'entries': []}
+                for entry in result['entries']:
+                    for folder, key in [('reports', 'report'), ('scores', 'scores')]:
+                        bundle.write(entry[key], f"{folder}/{os.path.basename(entry[key])}")
+                        os.remove(entry[key])
+                results.append(result)
+                if progress_callback is not None:
+                    progress_callback(done, len(futures), result['lot'])
+
+            results.sort(key=lambda r: r['lot'])
+            with bundle.open("index.html", "w") as raw, io.TextIOWrapper(raw, encoding="utf-8") as out:
+                write_bundle_index(out, results, target_mean_pre, target_mean_post)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return results
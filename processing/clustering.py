@@ -0,0 +1,151 @@
+import threading
+import time
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+from .scoring import SortedProfiles, resample_profiles
+
+# Points of the common position grid every profile is resampled onto
+CLUSTER_GRID_POINTS = 21
+
+DEFAULT_CLUSTERS = 6
+MAX_CLUSTERS = 12
+
+# Mini-batch k-means settings: sensors per batch and restarts
+CLUSTER_BATCH_SIZE = 4096
+CLUSTER_N_INIT = 3
+
+# Centroids whose shape varies less than this (in normalized units) are called flat
+FLAT_SHAPE_AMPLITUDE = 0.3
+
+# Shapes that vary mostly outside the inner part of the grid (|t| <= extent on
+# [-1, 1]) are edge effects: inner variation below this share of the whole
+EDGE_SHAPE_EXTENT = 0.6
+EDGE_SHAPE_RATIO = 0.2
+
+# Clusterings kept in memory, keyed by (lot hash, clusters, grid points).
+# Keys are content hashes, so entries can be shared safely between sessions.
+MAX_CACHED_CLUSTERINGS = 8
+_cluster_cache = OrderedDict()
+_cluster_lock = threading.Lock()
+
+def normalize_profiles(resampled):
+    """Centres each profile on its mean and scales it by its SD, floored at the lot's median SD.
+
+    The floor keeps near-flat profiles small instead of blowing their noise up
+    to unit size, so they gather in a flat cluster rather than spreading out.
+    """
+    centred = resampled - resampled.mean(axis=1, keepdims=True)
+    sd = centred.std(axis=1)
+    scale = np.maximum(sd, np.median(sd)) if len(sd) else sd
+    scale = np.where(scale > 0, scale, 1.0)
+    return centred / scale[:, None]
+
+def describe_shape(centroid):
+    """Names a normalized centroid shape: flat, edge roll-off, edge bead, wedge, dome or dish.
+
+    A shape whose inner 60% is nearly flat is an edge effect; otherwise a
+    quadratic fit over the grid splits it into a tilt and a curvature and the
+    larger part names it.
+    """
+    amplitude = centroid.std()
+    if amplitude < FLAT_SHAPE_AMPLITUDE:
+        return "Flat"
+    t = np.linspace(-1.0, 1.0, len(centroid))
+    inner = np.abs(t) <= EDGE_SHAPE_EXTENT
+    if centroid[inner].std() < EDGE_SHAPE_RATIO * amplitude:
+        return "Edge roll-off" if centroid[~inner].mean() < centroid[inner].mean() else "Edge bead"
+    curvature, tilt, _ = np.polyfit(t, centroid, 2)
+    if abs(tilt) * t.std() > abs(curvature) * (t * t).std():
+        return "Wedge (rising)" if tilt > 0 else "Wedge (falling)"
+    return "Dome" if curvature < 0 else "Dish"
+
+class ProfileClusters:
+    """Shape families of a lot's thickness profiles.
+
+    Profiles are resampled onto a common grid, normalized (`normalize_profiles`)
+    and clustered with mini-batch k-means. Clusters are numbered by size
+    (1 = largest). `centroids` and the 10th–90th percentile `bands` are in
+    normalized units; `labels` and `distances` are per sensor in `keys` order.
+    """
+
+    def __init__(self, profiles, n_clusters=DEFAULT_CLUSTERS, grid_points=CLUSTER_GRID_POINTS, random_state=0):
+        from sklearn.cluster import MiniBatchKMeans
+
+        started = time.perf_counter()
+        self.keys = profiles.keys
+        self.grid = np.linspace(profiles.x_min, profiles.x_min + profiles.x_span, grid_points)
+        normalized = normalize_profiles(resample_profiles(profiles, self.grid))
+
+        n_clusters = max(1, min(n_clusters, profiles.n_sensors))
+        model = MiniBatchKMeans(
+            n_clusters=n_clusters, batch_size=CLUSTER_BATCH_SIZE, n_init=CLUSTER_N_INIT, random_state=random_state
+        ).fit(normalized)
+
+        # Renumber clusters by size so cluster 1 is the most common shape
+        sizes = np.bincount(model.labels_, minlength=n_clusters)
+        order = np.argsort(-sizes, kind='stable')
+        rank = np.empty(n_clusters, dtype=int)
+        rank[order] = np.arange(n_clusters)
+        self.labels = rank[model.labels_] + 1
+        self.centroids = model.cluster_centers_[order]
+        self.sizes = sizes[order]
+        self.distances = np.linalg.norm(normalized - self.centroids[self.labels - 1], axis=1)
+        self.shapes = [describe_shape(centroid) for centroid in self.centroids]
+        self.bands = np.array([
+            np.percentile(normalized[self.labels == cluster], [10, 90], axis=0) for cluster in range(1, n_clusters + 1)
+        ])
+        self.elapsed = time.perf_counter() - started
+
+    @property
+    def n_clusters(self):
+        return len(self.centroids)
+
+    def membership(self):
+        """Per-sensor table of keys, cluster, shape name and distance to the cluster centroid."""
+        membership = self.keys.copy()
+        membership['cluster'] = self.labels
+        membership['shape'] = np.array(self.shapes, dtype=object)[self.labels - 1]
+        membership['distance'] = self.distances
+        return membership
+
+    def summary(self, scores=None):
+        """One row per cluster: shape, size and share, plus mean TUS/RUS of its members when `scores` is given."""
+        summary = pd.DataFrame({
+            'cluster': np.arange(1, self.n_clusters + 1),
+            'shape': self.shapes,
+            'sensors': self.sizes,
+            'share': self.sizes / self.sizes.sum(),
+        })
+        if scores is not None and not scores.empty:
+            keys = list(self.keys.columns)
+            merged = self.membership()[keys + ['cluster']].merge(scores[keys + ['TUS', 'RUS']], on=keys, how='left')
+            means = merged.groupby('cluster')[['TUS', 'RUS']].mean()
+            summary = summary.merge(means.rename(columns={'TUS': 'mean_TUS', 'RUS': 'mean_RUS'}), left_on='cluster', right_index=True, how='left')
+        return summary
+
+def cluster_profiles(df, n_clusters=DEFAULT_CLUSTERS, lot_hash=None, grid_points=CLUSTER_GRID_POINTS):
+    """Clusters a lot's profiles, reusing a cached clustering for the same lot and settings.
+
+    Returns None when the lot has no valid profile rows.
+    """
+    key = (lot_hash, n_clusters, grid_points)
+    if lot_hash is not None:
+        with _cluster_lock:
+            if key in _cluster_cache:
+                _cluster_cache.move_to_end(key)
+                return _cluster_cache[key]
+
+    if df is None or df.empty:
+        return None
+    profiles = SortedProfiles(df)
+    if profiles.empty:
+        return None
+    clusters = ProfileClusters(profiles, n_clusters, grid_points)
+
+    if lot_hash is not None:
+        with _cluster_lock:
+            _cluster_cache[key] = clusters
+            while len(_cluster_cache) > MAX_CACHED_CLUSTERINGS:
+                _cluster_cache.popitem(last=False)
+    return clusters
@@ -0,0 +1,85 @@
+import numpy as np
+import pandas as pd
+from .summary import scores_fingerprint
+
+# Per-sensor columns paired between Pre-OL and Post-OL
+COMPARISON_COLUMNS = ['mean_thickness', 'thickness_sd', 'thickness_range', 'r2_straightness', 'slope', 'curvature', 'TUS', 'RUS']
+
+def pair_scores(pre_scores, post_scores):
+    """Joins Pre-OL and Post-OL scores per sensor and adds Post - Pre deltas.
+
+    One hash merge on the sensor key, (lot_id, sensor_id) for multi-lot files,
+    with only the numeric columns carried across. Columns are
+    `pre_<col>`, `post_<col>` and `delta_<col>`.
+    """
+    keys = [col for col in ['lot_id', 'sensor_id'] if col in pre_scores.columns and col in post_scores.columns]
+    columns = [col for col in COMPARISON_COLUMNS if col in pre_scores.columns and col in post_scores.columns]
+
+    pre = pre_scores[keys + columns].rename(columns={col: f'pre_{col}' for col in columns})
+    post = post_scores[keys + columns].rename(columns={col: f'post_{col}' for col in columns})
+    paired = pre.merge(post, on=keys, how='inner', sort=False)
+
+    for col in columns:
+        paired[f'delta_{col}'] = paired[f'post_{col}'].to_numpy() - paired[f'pre_{col}'].to_numpy()
+    return paired
+
+def fit_transfer(paired, column='mean_thickness'):
+    """Least-squares transfer line Post = slope * Pre + intercept across sensors.
+
+    Closed form from sums over the paired columns. Returns None with fewer
+    than two sensors or no spread in Pre.
+    """
+    x = paired[f'pre_{column}'].to_numpy(dtype=float)
+    y = paired[f'post_{column}'].to_numpy(dtype=float)
+    valid = np.isfinite(x) & np.isfinite(y)
+    x, y = x[valid], y[valid]
+    if len(x) < 2:
+        return None
+
+    x_c = x - x.mean()
+    y_c = y - y.mean()
+    sxx = float(x_c @ x_c)
+    if sxx <= 0:
+        return None
+    syy = float(y_c @ y_c)
+    slope = float(x_c @ y_c) / sxx
+    intercept = float(y.mean() - slope * x.mean())
+    residuals = y - (slope * x + intercept)
+    return {
+        'column': column,
+        'slope': slope,
+        'intercept': intercept,
+        'r2': 1 - float(residuals @ residuals) / syy if syy > 0 else 1.0,
+        'residual_sd': float(residuals.std(ddof=2)) if len(x) > 2 else 0.0,
+        'n': int(len(x)),
+    }
+
+def add_transfer_residuals(paired, transfer):
+    """Adds each sensor's deviation from the transfer line (Post actual - Post predicted)."""
+    column = transfer['column']
+    predicted = transfer['slope'] * paired[f'pre_{column}'] + transfer['intercept']
+    paired['transfer_residual'] = paired[f'post_{column}'] - predicted
+    return paired
+
+def build_comparison(pre_scores, post_scores):
+    """Builds the Pre -> Post comparison for one upload, or None if either condition is missing.
+
+    Returns {'paired', 'transfer', 'pre_only', 'post_only', 'fingerprint'}; the
+    unmatched counts are sensors measured in only one condition.
+    """
+    if not isinstance(pre_scores, pd.DataFrame) or not isinstance(post_scores, pd.DataFrame):
+        return None
+    if pre_scores.empty or post_scores.empty:
+        return None
+
+    paired = pair_scores(pre_scores, post_scores)
+    transfer = fit_transfer(paired)
+    if transfer is not None:
+        add_transfer_residuals(paired, transfer)
+    return {
+        'paired': paired,
+        'transfer': transfer,
+        'pre_only': len(pre_scores) - len(paired),
+        'post_only': len(post_scores) - len(paired),
+        'fingerprint': scores_fingerprint(paired),
+    }
@@ -1,10 +1,12 @@
 import streamlit as st
 import pandas as pd
-import numpy as np
-from sklearn.linear_model import LinearRegression
-from sklearn.metrics import r2_score
-from .plotting import create_distribution_plot, create_thickness_profiles_plot
-from utils.helpers import generate_lot_analysis_report_html
+from .plotting import create_distribution_plot, create_thickness_profiles_plot, create_roughness_spectrum_plot
+from .indexing import build_score_index
+from .summary import summarize_scores
+from .comparison import build_comparison
+from .disposition import default_spec_limits
+from .similarity import build_similarity_index, add_to_library
+from .scoring import LOT_COLUMN, DEFAULT_WINDOW, DEFAULT_PROFILE, compute_sensor_features, score_features, lot_spectrum
 
 def get_session_id():
     """Get unique session ID for cache isolation between users."""
@@ -17,12 +19,17 @@ def get_session_id():
 def load_and_validate_data(uploaded_file, _session_id=None):
     """Loads and validates the uploaded CSV file. _session_id ensures cache isolation between users."""
     df = pd.read_csv(uploaded_file)
-    
+    return validate_lot_data(df)
+
+def validate_lot_data(df):
+    """Normalizes the condition column and checks the columns each condition needs."""
     required_cols = ['sensor_id', 'position_mm', 'condition']
     if not all(col in df.columns for col in required_cols):
         raise ValueError("CSV must contain 'sensor_id', 'position_mm', and 'condition' columns.")
 
     df['condition'] = df['condition'].str.strip().str.title()
+    if LOT_COLUMN in df.columns:
+        df[LOT_COLUMN] = df[LOT_COLUMN].astype(str).str.strip()
     
     # Check condition-specific requirements
     if 'Pre' in df['condition'].values and 'measurement_mm' not in df.columns:
@@ -33,165 +40,190 @@ def load_and_validate_data(uploaded_file, _session_id=None):
         
     return df
 
-@st.cache_data
-def calculate_uniformity_scores(_df, target_mean=17.5, _session_id=None):
-    """Calculate uniformity scores for thickness data. _session_id ensures cache isolation between users."""
-    if _df.empty:
-        return pd.DataFrame()
-    
-    df_filtered = _df[
-        (_df['position_mm'] >= 0.2) & 
-        (_df['position_mm'] <= 0.8) & 
-        (_df['thickness_um'] > 0) & 
-        (_df['thickness_um'].notna())
-    ].copy()
-    
-    if df_filtered.empty:
-        return pd.DataFrame()
-    
-    # Vectorized calculations for speed
-    grouped = df_filtered.groupby('sensor_id')
-    
-    results = grouped['thickness_um'].agg(['mean', 'std', 'min', 'max']).reset_index()
-    results.rename(columns={'mean': 'mean_thickness', 'std': 'thickness_sd'}, inplace=True)
-    results['thickness_range'] = results['max'] - results['min']
-    
-    # R² straightness (requires iteration)
-    r2_scores = []
-    for sensor_id, sensor_data in grouped:
-        if len(sensor_data) > 2 and sensor_data['position_mm'].var() > 0:
-            X = sensor_data['position_mm'].values.reshape(-1, 1)
-            y = sensor_data['thickness_um'].values
-            model = LinearRegression().fit(X, y)
-            r2_scores.append({'sensor_id': sensor_id, 'r2_straightness': r2_score(y, model.predict(X))})
-        else:
-            r2_scores.append({'sensor_id': sensor_id, 'r2_straightness': 0})
-    
-    results = pd.merge(results, pd.DataFrame(r2_scores), on='sensor_id')
-
-    # Symmetry score (requires iteration)
-    symmetry_scores = []
-    for sensor_id, sensor_data in grouped:
-        median_pos = sensor_data['position_mm'].median()
-        left_mean = sensor_data[sensor_data['position_mm'] <= median_pos]['thickness_um'].mean()
-        right_mean = sensor_data[sensor_data['position_mm'] > median_pos]['thickness_um'].mean()
-        overall_mean = (left_mean + right_mean) / 2
-        symmetry_score = 1 - abs(left_mean - right_mean) / overall_mean if overall_mean > 0 else 0
-        symmetry_scores.append({'sensor_id': sensor_id, 'symmetry_bonus': max(symmetry_score, 0)})
-        
-    results = pd.merge(results, pd.DataFrame(symmetry_scores), on='sensor_id')
+# Per-condition settings: dashboard label, raw thickness column and profile plot padding
+CONDITIONS = {
+    'Pre': {'label': 'Pre-OL', 'thickness_column': 'measurement_mm', 'y_padding': 0.20},
+    'Post': {'label': 'Post-OL', 'thickness_column': 'thickness_mm', 'y_padding': 0.05},
+}
 
-    # Penalties and final scores
-    global_max_range = results['thickness_range'].max()
-    results['mean_penalty'] = np.exp(-((results['mean_thickness'] - target_mean)**2) / (2 * 2**2))
-    results['smoothness_penalty'] = 1 / (1 + results['thickness_sd'].fillna(0))
-    results['range_penalty'] = 1 - results['thickness_range'] / global_max_range if global_max_range > 0 else 0
-    
-    results['TUS'] = (0.3 * results['mean_penalty'] + 
-                      0.2 * results['smoothness_penalty'] + 
-                      0.2 * results['range_penalty'] + 
-                      0.2 * results['r2_straightness'] + 
-                      0.1 * results['symmetry_bonus'])
-    
-    results['RUS'] = (0.25 * results['smoothness_penalty'] + 
-                      0.35 * results['range_penalty'] + 
-                      0.20 * results['r2_straightness'] + 
-                      0.20 * results['symmetry_bonus'])
-
-    # Categorize scores
-    bins = [-np.inf, 0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9, np.inf]
-    labels = ["0.0 - 0.1", "0.1 - 0.2", "0.2 - 0.3", "0.3 - 0.4", "0.4 - 0.5", "0.5 - 0.6", "0.6 - 0.7", "0.7 - 0.8", "0.8 - 0.9", "0.9 - 1.0"]
-    results['TUS_category'] = pd.cut(results['TUS'], bins=bins, labels=labels, right=False)
-    results['RUS_category'] = pd.cut(results['RUS'], bins=bins, labels=labels, right=False)
-    
-    return results[['sensor_id', 'mean_thickness', 'thickness_sd', 'thickness_range', 'r2_straightness', 'TUS', 'RUS', 'TUS_category', 'RUS_category']]
+def prepare_condition_data(df, condition):
+    """Returns one condition's rows with a numeric `thickness_um` column, or None if its thickness column is missing."""
+    condition_df = df[df['condition'] == condition].copy()
+    thickness_column = CONDITIONS[condition]['thickness_column']
+    if condition_df.empty:
+        return condition_df
+    if thickness_column not in condition_df.columns:
+        return None
 
-def process_and_cache_results(df, target_mean_pre, target_mean_post, filename):
-    """Processes both Pre and Post OL data and caches all results."""
-    
-    # Get session ID for cache isolation
-    session_id = get_session_id()
-    
-    # --- Pre-OL ---
-    pre_df = df[df['condition'] == 'Pre'].copy()
-    if not pre_df.empty:
+    if condition == 'Pre':
         # For Pre-OL data, use measurement_mm as thickness (already in microns, just rename)
-        if 'measurement_mm' in pre_df.columns:
-            pre_df['thickness_um'] = pre_df['measurement_mm']  # Already in microns
-        else:
-            st.error("Pre-OL data requires 'measurement_mm' column")
-            return
-        st.session_state.pre_scores = calculate_uniformity_scores(pre_df, target_mean_pre, _session_id=session_id)
-        
-        pre_filtered = pre_df[(pre_df['position_mm'] >= 0.2) & (pre_df['position_mm'] <= 0.8) & (pre_df['thickness_um'] > 0)]
-        if not pre_filtered.empty:
-            pre_y_min = pre_filtered['thickness_um'].min()
-            pre_y_max = pre_filtered['thickness_um'].max()
-            # Calculate dynamic range with tighter padding for better profile visibility
-            y_range_padding = (pre_y_max - pre_y_min) * 0.20  # 20% padding for a taller view
-            y_range_pre = [max(0, pre_y_min - y_range_padding), pre_y_max + y_range_padding]
-        else:
-            y_range_pre = None
-        
-        st.session_state.pre_plots = {
-            'TUS_dist': create_distribution_plot(st.session_state.pre_scores, 'TUS'),
-            'RUS_dist': create_distribution_plot(st.session_state.pre_scores, 'RUS'),
-            'TUS_profile': create_thickness_profiles_plot(pre_filtered, st.session_state.pre_scores, 'TUS', target_mean_pre, y_range=y_range_pre),
-            'RUS_profile': create_thickness_profiles_plot(pre_filtered, st.session_state.pre_scores, 'RUS', target_mean_pre, y_range=y_range_pre)
-        }
-        
-        # Generate full HTML report with embedded interactive plots (INSTANT!)
-        st.session_state.pre_report_html = generate_lot_analysis_report_html(
-            "Pre-OL Thickness Report", st.session_state.pre_scores, 
-            st.session_state.pre_plots, target_mean_pre, filename
-        )
+        condition_df['thickness_um'] = condition_df[thickness_column]
     else:
-        st.session_state.pre_scores = pd.DataFrame()
-        st.session_state.pre_plots = {}
-        st.session_state.pre_report_html = ""
-
-    # --- Post-OL ---
-    post_df = df[df['condition'] == 'Post'].copy()
-    if not post_df.empty:
-        # For Post-OL data, use thickness_mm (already in microns, just rename)
-        if 'thickness_mm' in post_df.columns:
-            # Filter out empty/null thickness values first
-            post_df = post_df[post_df['thickness_mm'].notna() & (post_df['thickness_mm'] != '')]
-            post_df['thickness_um'] = pd.to_numeric(post_df['thickness_mm'], errors='coerce')  # Already in microns
-            # Remove rows where conversion failed
-            post_df = post_df[post_df['thickness_um'].notna()]
-        else:
-            st.error("Post-OL data requires 'thickness_mm' column")
+        # For Post-OL data, filter out empty/null thickness values first (already in microns)
+        condition_df = condition_df[condition_df[thickness_column].notna() & (condition_df[thickness_column] != '')]
+        condition_df['thickness_um'] = pd.to_numeric(condition_df[thickness_column], errors='coerce')
+        # Remove rows where conversion failed
+        condition_df = condition_df[condition_df['thickness_um'].notna()]
+    return condition_df
+
+def create_condition_plots(condition_df, scores, condition, target_mean, window=DEFAULT_WINDOW):
+    """Builds the distribution, profile and roughness spectrum figures for one condition."""
+    filtered = condition_df[(condition_df['position_mm'] >= window[0]) & (condition_df['position_mm'] <= window[1]) & (condition_df['thickness_um'] > 0)]
+    if not filtered.empty:
+        y_min = filtered['thickness_um'].min()
+        y_max = filtered['thickness_um'].max()
+        # Dynamic range with condition-specific padding for better profile visibility
+        y_range_padding = (y_max - y_min) * CONDITIONS[condition]['y_padding']
+        y_range = [max(0, y_min - y_range_padding), y_max + y_range_padding]
+    else:
+        y_range = None
+
+    return {
+        'TUS_dist': create_distribution_plot(scores, 'TUS'),
+        'RUS_dist': create_distribution_plot(scores, 'RUS'),
+        'TUS_profile': create_thickness_profiles_plot(filtered, scores, 'TUS', target_mean, y_range=y_range, window=window),
+        'RUS_profile': create_thickness_profiles_plot(filtered, scores, 'RUS', target_mean, y_range=y_range, window=window),
+        'spectrum': create_roughness_spectrum_plot(lot_spectrum(condition_df, window), window)
+    }
+
+def compute_uniformity_scores(df, target_mean=17.5, profile=None):
+    """Features and scores in one call, safe outside a Streamlit session (e.g. in batch worker processes)."""
+    if df.empty:
+        return pd.DataFrame()
+    profile = profile or DEFAULT_PROFILE
+    return score_features(compute_sensor_features(df, profile.window, profile.extra_windows, profile.robust), target_mean, profile)
+
+def condition_spec_limits(label, target_mean, profile=None):
+    """The specification limits set for a condition in this session, or the defaults for its target mean.
+
+    Defaults follow `profile`'s mean penalty width (the session's scoring profile when not given).
+    """
+    profile = profile or st.session_state.get('scoring_profile')
+    return st.session_state.get('spec_limits', {}).get(label) or default_spec_limits(target_mean, profile)
+
+def build_lot_views(condition_df, scores, condition, target_mean, filename, window=DEFAULT_WINDOW):
+    """Splits one condition's scores into per-lot views, so dashboards can switch lots without rescoring.
+
+    Returns {lot_id: {'scores', 'index', 'summary', 'plots', 'report_request'}}, or {}
+    when the file carries a single lot.
+    """
+    if LOT_COLUMN not in scores.columns or scores[LOT_COLUMN].nunique() < 2:
+        return {}
+
+    label = CONDITIONS[condition]['label']
+    rows_by_lot = condition_df.groupby(LOT_COLUMN).indices
+    lot_views = {}
+    for lot, positions in scores.groupby(LOT_COLUMN, sort=True).indices.items():
+        lot_scores = scores.iloc[positions].reset_index(drop=True)
+        lot_df = condition_df.iloc[rows_by_lot[lot]]
+        lot_views[lot] = {
+            'scores': lot_scores,
+            'index': build_score_index(lot_scores),
+            'summary': summarize_scores(lot_scores),
+            'plots': create_condition_plots(lot_df, lot_scores, condition, target_mean, window),
+            'report_request': {
+                'title': f"{label} Thickness Report - Lot {lot}", 'target_mean': target_mean, 'input_filename': filename
+            },
+        }
+    return lot_views
+
+def store_condition_results(condition, condition_df, features, target_mean, filename, profile):
+    """Scores one condition's cached features with `profile` and stores every derived view in session state."""
+    prefix = condition.lower()
+    label = CONDITIONS[condition]['label']
+    scores = score_features(features, target_mean, profile)
+    st.session_state[f'{prefix}_data'] = condition_df
+    st.session_state[f'{prefix}_features'] = features
+    st.session_state[f'{prefix}_scores'] = scores
+    st.session_state[f'{prefix}_index'] = build_score_index(scores)
+    st.session_state[f'{prefix}_summary'] = summarize_scores(scores)
+    st.session_state[f'{prefix}_plots'] = create_condition_plots(condition_df, scores, condition, target_mean, profile.window)
+    st.session_state[f'{prefix}_lots'] = build_lot_views(condition_df, scores, condition, target_mean, filename, profile.window)
+
+    # The HTML report is only built when a download asks for it
+    st.session_state[f'{prefix}_report_request'] = {
+        'title': f"{label} Thickness Report", 'target_mean': target_mean, 'input_filename': filename
+    }
+
+def clear_condition_results(condition):
+    """Stores empty results for a condition missing from the upload."""
+    prefix = condition.lower()
+    st.session_state[f'{prefix}_data'] = None
+    st.session_state[f'{prefix}_features'] = None
+    st.session_state[f'{prefix}_scores'] = pd.DataFrame()
+    st.session_state[f'{prefix}_index'] = None
+    st.session_state[f'{prefix}_summary'] = None
+    st.session_state[f'{prefix}_plots'] = {}
+    st.session_state[f'{prefix}_lots'] = {}
+    st.session_state[f'{prefix}_report_request'] = None
+    st.session_state[f'{prefix}_similarity'] = None
+
+def process_and_cache_results(df, target_mean_pre, target_mean_post, filename, profile=None):
+    """Processes both Pre and Post OL data and caches all results."""
+    profile = profile or st.session_state.get('scoring_profile') or DEFAULT_PROFILE
+
+    for condition, target_mean in [('Pre', target_mean_pre), ('Post', target_mean_post)]:
+        condition_df = prepare_condition_data(df, condition)
+        if condition_df is None:
+            st.error(f"{CONDITIONS[condition]['label']} data requires '{CONDITIONS[condition]['thickness_column']}' column")
             return
-        st.session_state.post_scores = calculate_uniformity_scores(post_df, target_mean_post, _session_id=session_id)
-        
-        post_filtered = post_df[(post_df['position_mm'] >= 0.2) & (post_df['position_mm'] <= 0.8) & (post_df['thickness_um'] > 0)]
-        if not post_filtered.empty:
-            post_y_min = post_filtered['thickness_um'].min()
-            post_y_max = post_filtered['thickness_um'].max()
-            # Calculate dynamic range with tighter padding for better profile visibility
-            y_range_padding = (post_y_max - post_y_min) * 0.05  # 5% padding for tighter view
-            y_range_post = [max(0, post_y_min - y_range_padding), post_y_max + y_range_padding]
+
+        if not condition_df.empty:
+            # Features are computed once; re-scoring with another profile reuses them
+            features = compute_sensor_features(condition_df, profile.window, profile.extra_windows, profile.robust)
+            store_condition_results(condition, condition_df, features, target_mean, filename, profile)
+
+            # Profiles do not depend on the scoring profile, so the similarity
+            # index is built once here and kept for later lots to search against
+            index = build_similarity_index(condition_df, f"{filename} · {CONDITIONS[condition]['label']}", condition)
+            st.session_state[f'{condition.lower()}_similarity'] = index
+            if index is not None:
+                st.session_state.similarity_library = add_to_library(st.session_state.get('similarity_library', {}), index)
         else:
-            y_range_post = None
-        
-        st.session_state.post_plots = {
-            'TUS_dist': create_distribution_plot(st.session_state.post_scores, 'TUS'),
-            'RUS_dist': create_distribution_plot(st.session_state.post_scores, 'RUS'),
-            'TUS_profile': create_thickness_profiles_plot(post_filtered, st.session_state.post_scores, 'TUS', target_mean_post, y_range=y_range_post),
-            'RUS_profile': create_thickness_profiles_plot(post_filtered, st.session_state.post_scores, 'RUS', target_mean_post, y_range=y_range_post)
-        }
-        
-        # Generate full HTML report with embedded interactive plots (INSTANT!)
-        st.session_state.post_report_html = generate_lot_analysis_report_html(
-            "Post-OL Thickness Report", st.session_state.post_scores, 
-            st.session_state.post_plots, target_mean_post, filename
-        )
-    else:
-        st.session_state.post_scores = pd.DataFrame()
-        st.session_state.post_plots = {}
-        st.session_state.post_report_html = ""
+            clear_condition_results(condition)
+
+    st.session_state.scoring_profile = profile
+
+    # Comparison stage: pair the two conditions per sensor
+    st.session_state.comparison = build_comparison(st.session_state.pre_scores, st.session_state.post_scores)
 
     st.session_state.data_uploaded = True
     st.session_state.input_filename = filename
-    st.success("Data processed successfully!") 
\ No newline at end of file
+    st.success("Data processed successfully!")
+
+def rescore_cached_results(profile):
+    """Re-scores the processed upload with another profile from the cached per-sensor features.
+
+    Features are recomputed when the profile measures different windows than
+    the one the features were computed with (the scoring window, or any extra
+    window's name or bounds) or switches between standard and robust
+    statistics; otherwise only the scores are recomputed.
+    """
+    previous = st.session_state.get('scoring_profile') or DEFAULT_PROFILE
+    recompute = (profile.window, profile.extra_windows, profile.robust) != (previous.window, previous.extra_windows, previous.robust)
+    for condition in CONDITIONS:
+        prefix = condition.lower()
+        features = st.session_state.get(f'{prefix}_features')
+        request = st.session_state.get(f'{prefix}_report_request')
+        if features is None or request is None:
+            continue
+        condition_df = st.session_state[f'{prefix}_data']
+        if recompute or not set(profile.extra_columns) <= set(features.columns):
+            features = compute_sensor_features(condition_df, profile.window, profile.extra_windows, profile.robust)
+        store_condition_results(condition, condition_df, features, request['target_mean'], request['input_filename'], profile)
+
+    if profile.mean_sigma != previous.mean_sigma:
+        # Limits still at the old profile's defaults follow the new mean width
+        for condition, settings in CONDITIONS.items():
+            label = settings['label']
+            request = st.session_state.get(f'{condition.lower()}_report_request')
+            limits = st.session_state.get('spec_limits', {}).get(label)
+            if request is None or limits is None:
+                continue
+            if limits.limits.get('mean_thickness') == default_spec_limits(request['target_mean'], previous).limits.get('mean_thickness'):
+                st.session_state.spec_limits = {k: v for k, v in st.session_state.spec_limits.items() if k != label}
+                for bound in ('low', 'high'):
+                    st.session_state.pop(f"limit_{bound}_mean_thickness_{label}", None)
+
+    st.session_state.scoring_profile = profile
+    st.session_state.comparison = build_comparison(st.session_state.pre_scores, st.session_state.post_scores)
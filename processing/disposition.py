@@ -0,0 +1,143 @@
+import numpy as np
+import pandas as pd
+from .scoring import LOT_COLUMN, DEFAULT_PROFILE
+
+# Score columns that can carry specification limits, with their display labels
+LIMIT_COLUMNS = {
+    'mean_thickness': 'Mean thickness',
+    'thickness_sd': 'Std dev',
+    'thickness_range': 'Range',
+    'r2_straightness': 'R²',
+    'TUS': 'TUS',
+    'RUS': 'RUS',
+}
+
+# Share of passing sensors a lot needs to be accepted
+DEFAULT_MIN_YIELD = 0.9
+
+# Failing sensors listed on the dashboard and in reports
+MAX_LISTED_FAILURES = 100
+
+class SpecLimits:
+    """Specification limits used to disposition a lot.
+
+    `limits` maps a column of LIMIT_COLUMNS to a (low, high) pair where either
+    bound may be None; a sensor passes when every limited column is present
+    and inside its bounds. A lot is accepted when its yield (share of passing
+    sensors) reaches `min_yield`.
+    """
+
+    def __init__(self, limits=None, min_yield=DEFAULT_MIN_YIELD):
+        self.limits = {}
+        for column, (low, high) in (limits or {}).items():
+            if column not in LIMIT_COLUMNS:
+                raise ValueError(f"Unknown limit column: {column}")
+            if low is not None and high is not None and high < low:
+                raise ValueError(f"The {LIMIT_COLUMNS[column]} upper limit is below the lower limit.")
+            if low is not None or high is not None:
+                self.limits[column] = (low, high)
+        self.min_yield = min_yield
+
+    @property
+    def key(self):
+        """Hashable identity of the limits (used in report cache keys)."""
+        return (tuple(sorted(self.limits.items())), self.min_yield)
+
+    def checks(self):
+        """The individual limit checks as (column, kind, bound, reason) in display order."""
+        checks = []
+        for column, (low, high) in self.limits.items():
+            label = LIMIT_COLUMNS[column]
+            checks.append((column, 'missing', None, f"{label} missing"))
+            if low is not None:
+                checks.append((column, 'low', low, f"{label} < {low:g}"))
+            if high is not None:
+                checks.append((column, 'high', high, f"{label} > {high:g}"))
+        return checks
+
+def default_spec_limits(target_mean, profile=None):
+    """Starting limits for a condition: mean thickness within the scoring profile's mean penalty width of the target."""
+    if target_mean is None:
+        return SpecLimits()
+    mean_sigma = (profile or DEFAULT_PROFILE).mean_sigma
+    return SpecLimits({'mean_thickness': (target_mean - mean_sigma, target_mean + mean_sigma)})
+
+class LotDisposition:
+    """Pass/fail evaluation of a scores frame against SpecLimits.
+
+    Every check is one vectorized comparison over a score column; the checks
+    form a boolean matrix whose rows give each sensor's flag and, packed into
+    a bit code, its failure reasons (text is built once per distinct code).
+
+    `passed` and `reasons` are per sensor, `failure_counts` holds the sensors
+    failing each check and `lots` the yield and Accept/Reject status per lot
+    (a single row when the data carries one lot).
+    """
+
+    def __init__(self, scores, limits):
+        self.limits = limits
+        self.keys = [col for col in (LOT_COLUMN, 'sensor_id') if col in scores.columns]
+        checks = limits.checks()
+        failures = np.zeros((len(scores), len(checks)), dtype=bool)
+        for i, (column, kind, bound, _) in enumerate(checks):
+            values = scores[column].to_numpy(dtype=float) if column in scores.columns else np.full(len(scores), np.nan)
+            if kind == 'missing':
+                failures[:, i] = np.isnan(values)
+            elif kind == 'low':
+                failures[:, i] = values < bound
+            else:
+                failures[:, i] = values > bound
+
+        self.passed = ~failures.any(axis=1)
+        self.failure_counts = pd.Series(failures.sum(axis=0), index=[reason for *_, reason in checks], dtype=int)
+
+        # Distinct failure combinations are few, so reasons are joined once per combination
+        codes = failures @ (1 << np.arange(len(checks), dtype=np.int64)) if checks else np.zeros(len(scores), dtype=np.int64)
+        distinct, inverse = np.unique(codes, return_inverse=True)
+        texts = np.array(["; ".join(reason for bit, (*_, reason) in enumerate(checks) if code >> bit & 1) for code in distinct], dtype=object)
+        self.reasons = texts[inverse.ravel()] if len(scores) else np.array([], dtype=object)
+
+        self.count = len(scores)
+        self.passed_count = int(self.passed.sum())
+        self.yield_ = self.passed_count / self.count if self.count else float('nan')
+        self.accepted = bool(self.count) and self.yield_ >= limits.min_yield
+
+        if LOT_COLUMN in scores.columns:
+            lot_codes, lots = pd.factorize(scores[LOT_COLUMN], sort=True)
+            sensors = np.bincount(lot_codes, minlength=len(lots))
+            passing = np.bincount(lot_codes, weights=self.passed, minlength=len(lots)).astype(int)
+            lot_ids = list(lots)
+        else:
+            sensors, passing, lot_ids = np.array([self.count]), np.array([self.passed_count]), [None]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            yields = passing / sensors
+        self.lots = pd.DataFrame({
+            'lot_id': lot_ids, 'sensors': sensors, 'passed': passing, 'failed': sensors - passing, 'yield': yields,
+            'disposition': np.where(yields >= limits.min_yield, 'Accept', 'Reject'),
+        })
+        self._scores = scores
+
+    @property
+    def status(self):
+        return 'Accept' if self.accepted else 'Reject'
+
+    def flags(self):
+        """Per-sensor table of keys, pass flag and failure reasons."""
+        flags = self._scores[self.keys].reset_index(drop=True)
+        flags['passed'] = self.passed
+        flags['failure_reasons'] = self.reasons
+        return flags
+
+    def failing(self, limit=MAX_LISTED_FAILURES):
+        """The first `limit` failing sensors with their reasons and limited columns."""
+        positions = np.flatnonzero(~self.passed)[:limit]
+        columns = self.keys + [col for col in self.limits.limits if col in self._scores.columns]
+        failing = self._scores.iloc[positions][columns].reset_index(drop=True)
+        failing['failure_reasons'] = self.reasons[positions]
+        return failing
+
+def evaluate_disposition(scores, limits):
+    """Evaluates `limits` over a scores frame, or returns None when there are no scores."""
+    if not isinstance(scores, pd.DataFrame) or scores.empty:
+        return None
+    return LotDisposition(scores, limits)
@@ -0,0 +1,178 @@
+import time
+import numpy as np
+import pandas as pd
+from .scoring import LOT_COLUMN
+
+# Score columns offered for drift analysis, with their display labels
+DRIFT_COLUMNS = {
+    'mean_thickness': 'Mean thickness (μm)',
+    'thickness_sd': 'Std dev (μm)',
+    'thickness_range': 'Range (μm)',
+    'slope': 'Slope (μm/mm)',
+    'TUS': 'TUS',
+    'RUS': 'RUS',
+}
+
+# Sensors per rolling window
+DEFAULT_ROLLING_WINDOW = 50
+
+# Change points: fewest sensors between two shifts, most shifts reported and
+# the split gain needed, in units of noise variance × log(sensors)
+MIN_SEGMENT_SENSORS = 20
+MAX_CHANGE_POINTS = 12
+DEFAULT_CHANGE_PENALTY = 3.0
+
+# Smallest noise SD assumed, relative to the largest absolute value, so a
+# noiseless or constant series does not make every split look significant
+NOISE_FLOOR = 1e-6
+
+def production_order(scores):
+    """Row order of `scores` in production order: by lot, then by sensor ID.
+
+    IDs made of a prefix and a number (S9, S10) are ordered by the number, so
+    IDs without zero padding still follow production order.
+    """
+    ids = scores['sensor_id'].astype(str)
+    parts = ids.str.extract(r'^(.*?)(\d+)$')
+    keys = {}
+    if LOT_COLUMN in scores.columns:
+        keys['lot'] = scores[LOT_COLUMN].astype(str).to_numpy()
+    if parts[1].notna().all():
+        keys['prefix'] = parts[0].to_numpy()
+        keys['number'] = parts[1].astype(np.int64).to_numpy()
+    else:
+        keys['id'] = ids.to_numpy()
+    return np.lexsort(list(keys.values())[::-1])
+
+def rolling_statistics(values, window):
+    """Trailing rolling mean and SD of `values` over `window` points, from prefix sums (O(n)).
+
+    The first points use the shorter window available; values are centred on
+    their mean first so the prefix sums stay well conditioned.
+    """
+    centre = values.mean() if len(values) else 0.0
+    shifted = values - centre
+    prefix = np.concatenate([[0.0], np.cumsum(shifted)])
+    prefix_sq = np.concatenate([[0.0], np.cumsum(shifted * shifted)])
+    stop = np.arange(1, len(values) + 1)
+    start = np.maximum(stop - window, 0)
+    count = stop - start
+    mean = (prefix[stop] - prefix[start]) / count
+    with np.errstate(invalid='ignore', divide='ignore'):
+        var = np.maximum((prefix_sq[stop] - prefix_sq[start]) / count - mean * mean, 0.0) * count / (count - 1)
+    return centre + mean, np.where(count > 1, np.sqrt(var), np.nan)
+
+def noise_sigma(values):
+    """Point-to-point noise SD from the MAD of first differences, insensitive to shifts and slow trends.
+
+    When most differences are equal (a MAD of zero, e.g. scores clipped at a
+    bound) the RMS of the differences is used instead, and the result is never
+    below NOISE_FLOOR times the largest absolute value.
+    """
+    if len(values) < 3:
+        return 0.0
+    diffs = np.diff(values)
+    sigma = 1.4826 * np.median(np.abs(diffs - np.median(diffs))) / np.sqrt(2)
+    if sigma == 0:
+        sigma = np.sqrt(np.mean(diffs * diffs) / 2)
+    return float(max(sigma, NOISE_FLOOR * np.abs(values).max()))
+
+def _best_split(prefix, start, stop, min_size):
+    """Best mean-shift split of values[start:stop]: (gain in sum of squares, split index), or (0, None).
+
+    Every candidate split is scored at once from the prefix sums: the gain is
+    the between-segment sum of squares k(n-k)/n · (mean_left - mean_right)².
+    """
+    n = stop - start
+    if n < 2 * min_size:
+        return 0.0, None
+    k = np.arange(min_size, n - min_size + 1)
+    left = prefix[start + k] - prefix[start]
+    total = prefix[stop] - prefix[start]
+    gain = (left / k - (total - left) / (n - k)) ** 2 * k * (n - k) / n
+    best = int(np.argmax(gain))
+    return float(gain[best]), start + int(k[best])
+
+def binary_segmentation(values, boundaries, penalty, min_size=MIN_SEGMENT_SENSORS, max_changes=MAX_CHANGE_POINTS):
+    """Mean-shift change points of `values` by binary segmentation.
+
+    Starting from the segments between `boundaries` (e.g. lot edges, never
+    crossed), the split with the largest gain anywhere is taken while it beats
+    `penalty`; each split costs one vectorized pass over its segment.
+    Returns the sorted change point indices.
+    """
+    prefix = np.concatenate([[0.0], np.cumsum(values - (values.mean() if len(values) else 0.0))])
+    candidates = [(*_best_split(prefix, start, stop, min_size), start, stop) for start, stop in zip(boundaries[:-1], boundaries[1:])]
+    changes = []
+    while candidates and len(changes) < max_changes:
+        best = max(range(len(candidates)), key=lambda i: candidates[i][0])
+        gain, split, start, stop = candidates.pop(best)
+        if split is None or gain <= penalty:
+            break
+        changes.append(split)
+        candidates.append((*_best_split(prefix, start, split, min_size), start, split))
+        candidates.append((*_best_split(prefix, split, stop, min_size), split, stop))
+    return sorted(changes)
+
+class DriftAnalysis:
+    """Drift of one score column along production order.
+
+    Sensors are put in production order (`production_order`) and sensors
+    without a value are skipped. `rolling_mean`/`rolling_sd` are trailing
+    rolling statistics and `change_points` the positions (in that order)
+    where the mean shifts, found by binary segmentation within each lot. A
+    split is kept when its gain beats `sensitivity` × noise variance ×
+    log(sensors), the noise coming from point-to-point differences. Every pass
+    is vectorized over the series, so 100k-sensor lots take milliseconds.
+    """
+
+    def __init__(self, scores, column, window=DEFAULT_ROLLING_WINDOW, sensitivity=DEFAULT_CHANGE_PENALTY):
+        started = time.perf_counter()
+        ordered = scores.iloc[production_order(scores)]
+        ordered = ordered[np.isfinite(ordered[column].to_numpy(dtype=float))]
+        self.column = column
+        self.keys = ordered[[col for col in (LOT_COLUMN, 'sensor_id') if col in ordered.columns]].reset_index(drop=True)
+        self.values = ordered[column].to_numpy(dtype=float)
+        self.window = window
+        self.rolling_mean, self.rolling_sd = rolling_statistics(self.values, window)
+        self.sigma = noise_sigma(self.values)
+
+        n = len(self.values)
+        if LOT_COLUMN in self.keys.columns and n:
+            lots = self.keys[LOT_COLUMN].to_numpy()
+            edges = np.flatnonzero(lots[1:] != lots[:-1]) + 1
+        else:
+            edges = np.array([], dtype=int)
+        self.lot_edges = edges
+        penalty = sensitivity * max(self.sigma, 1e-12) ** 2 * np.log(max(n, 2))
+        self.change_points = binary_segmentation(self.values, [0, *edges.tolist(), n], penalty)
+        self.elapsed = time.perf_counter() - started
+
+    def segments(self):
+        """One row per stretch between change points or lot edges: first and last sensor, size, mean and shift."""
+        bounds = sorted({0, len(self.values), *self.change_points, *self.lot_edges.tolist()})
+        starts, stops = np.array(bounds[:-1]), np.array(bounds[1:])
+        prefix = np.concatenate([[0.0], np.cumsum(self.values)])
+        means = (prefix[stops] - prefix[starts]) / (stops - starts)
+        segments = pd.DataFrame({
+            'first_sensor': self.keys['sensor_id'].to_numpy()[starts],
+            'last_sensor': self.keys['sensor_id'].to_numpy()[stops - 1],
+            'sensors': stops - starts,
+            'mean': means,
+            'shift': np.r_[np.nan, np.diff(means)],
+        })
+        if LOT_COLUMN in self.keys.columns:
+            segments.insert(0, LOT_COLUMN, self.keys[LOT_COLUMN].to_numpy()[starts])
+            # A new lot is not a shift within production
+            new_lot = np.r_[True, segments[LOT_COLUMN].to_numpy()[1:] != segments[LOT_COLUMN].to_numpy()[:-1]]
+            segments.loc[new_lot, 'shift'] = np.nan
+        segments['change_point'] = np.isin(starts, self.change_points)
+        return segments
+
+def analyze_drift(scores, column, window=DEFAULT_ROLLING_WINDOW, sensitivity=DEFAULT_CHANGE_PENALTY):
+    """Drift analysis of `column` over a scores frame, or None when it has no values for it."""
+    if not isinstance(scores, pd.DataFrame) or scores.empty or column not in scores.columns:
+        return None
+    if not np.isfinite(scores[column].to_numpy(dtype=float)).any():
+        return None
+    return DriftAnalysis(scores, column, window, sensitivity)
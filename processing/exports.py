@@ -0,0 +1,82 @@
+import io
+import threading
+from collections import OrderedDict
+
+# Export format -> (file extension, MIME type)
+EXPORT_FORMATS = {
+    'CSV': ('csv', 'text/csv'),
+    'Parquet': ('parquet', 'application/vnd.apache.parquet'),
+    'Excel': ('xlsx', 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'),
+}
+
+# Serialized exports kept in memory, keyed by (lot hash, filter key, format).
+# Keys are content hashes, so entries can be shared safely between sessions.
+MAX_CACHED_EXPORTS = 16
+_export_cache = OrderedDict()
+_export_lock = threading.Lock()
+
+def _to_csv(df):
+    return df.to_csv(index=False).encode('utf-8')
+
+def _to_parquet(df):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    # from_pandas copies the columns into Arrow memory (object and category columns included)
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    sink = pa.BufferOutputStream()
+    pq.write_table(table, sink, compression='zstd')
+    return sink.getvalue().to_pybytes()
+
+def _to_excel(df):
+    try:
+        import openpyxl  # noqa: F401
+    except ImportError:
+        raise ImportError("Excel export requires openpyxl. Please install it: `pip install openpyxl`")
+
+    buf = io.BytesIO()
+    df.to_excel(buf, index=False, sheet_name='Scores', engine='openpyxl')
+    return buf.getvalue()
+
+_SERIALIZERS = {
+    'CSV': _to_csv,
+    'Parquet': _to_parquet,
+    'Excel': _to_excel,
+}
+
+def export_scores(scores, fmt, lot_hash, filter_key=None):
+    """Serializes a scores frame to `fmt`, reusing a cached result when available.
+
+    Called lazily from download buttons, so nothing is serialized until a user
+    actually asks for the file.
+    """
+    if fmt not in _SERIALIZERS:
+        raise ValueError(f"Unsupported export format: {fmt}")
+
+    key = (lot_hash, filter_key, fmt)
+    with _export_lock:
+        if key in _export_cache:
+            _export_cache.move_to_end(key)
+            return _export_cache[key]
+
+    data = _SERIALIZERS[fmt](scores)
+
+    with _export_lock:
+        _export_cache[key] = data
+        if len(_export_cache) > MAX_CACHED_EXPORTS:
+            _export_cache.popitem(last=False)
+    return data
+
+def clear_export_cache(lot_hashes=None):
+    """Drops the cached exports of the given lot hashes, or every cached export when none are given.
+
+    The cache is shared by all sessions, so a session clearing its own data
+    should pass its lot hashes.
+    """
+    with _export_lock:
+        if lot_hashes is None:
+            _export_cache.clear()
+            return
+        lot_hashes = set(lot_hashes)
+        for key in [key for key in _export_cache if key[0] in lot_hashes]:
+            del _export_cache[key]
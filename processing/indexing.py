@@ -0,0 +1,156 @@
+import numpy as np
+import pandas as pd
+
+NGRAM_SIZE = 3
+
+# Score columns with a sorted order for range filters: the scores, the polynomial shape features and the roughness bands
+INDEXED_COLUMNS = ('TUS', 'RUS', 'slope', 'curvature', 'residual_rms', 'roughness_low', 'roughness_mid', 'roughness_high')
+
+class ScoreIndex:
+    """Precomputed lookup structures for filtering a lot's uniformity scores.
+
+    Built once when scores are produced. Score range filters become binary
+    searches over argsort orders, and sensor-ID substring searches only verify
+    the rows whose trigrams all match the query instead of scanning every row.
+    """
+
+    def __init__(self, scores, score_columns=('TUS', 'RUS'), ngram_size=NGRAM_SIZE):
+        self.size = len(scores)
+        self.ngram_size = ngram_size
+
+        # Sorted orders for range queries on each score column
+        self.orders = {}
+        self.sorted_values = {}
+        for col in score_columns:
+            if col in scores.columns:
+                values = scores[col].to_numpy(dtype=float)
+                order = np.argsort(values, kind='stable')
+                self.orders[col] = order
+                self.sorted_values[col] = values[order]
+
+        # Lower-cased sensor IDs as a fixed-width array; the NUL padding after
+        # each ID doubles as an end-of-string marker for the n-gram index.
+        ids = scores['sensor_id'].astype(str).str.lower().to_numpy(dtype=str)
+        self.sensor_ids = np.asarray(ids, dtype=f'<U{max(1, ids.dtype.itemsize // 4) + ngram_size - 1}')
+        self._build_ngram_index()
+
+    def _encode(self, codepoints):
+        """Packs n code points (last axis) into a single int64 key, 21 bits per character."""
+        key = np.zeros(codepoints.shape[:-1], dtype=np.int64)
+        for i in range(codepoints.shape[-1]):
+            key = (key << 21) | codepoints[..., i].astype(np.int64)
+        return key
+
+    def _build_ngram_index(self):
+        """Builds a CSR-style n-gram -> row positions index over sensor IDs."""
+        n = self.ngram_size
+        width = self.sensor_ids.dtype.itemsize // 4
+        chars = self.sensor_ids.view(np.uint32).reshape(self.size, width)
+
+        # Every window of n characters, encoded as one integer per (row, start)
+        windows = np.lib.stride_tricks.sliding_window_view(chars, n, axis=1)
+        keys = self._encode(windows)
+        rows = np.broadcast_to(np.arange(self.size, dtype=np.int64)[:, None], keys.shape)
+
+        # Drop windows that start in the padding, then de-duplicate (key, row) pairs
+        valid = windows[..., 0] != 0
+        keys, rows = keys[valid], rows[valid]
+        order = np.lexsort((rows, keys))
+        keys, rows = keys[order], rows[order]
+        distinct = np.ones(len(keys), dtype=bool)
+        distinct[1:] = (keys[1:] != keys[:-1]) | (rows[1:] != rows[:-1])
+        keys, rows = keys[distinct], rows[distinct]
+
+        self.gram_keys, starts = np.unique(keys, return_index=True)
+        self.gram_offsets = np.append(starts, len(keys)).astype(np.int64)
+        self.gram_rows = rows
+
+    def _key_range(self, text):
+        """Returns the [lo, hi) slice of gram_keys whose n-grams start with `text`."""
+        n = self.ngram_size
+        codepoints = np.array([ord(c) for c in text], dtype=np.int64)
+        prefix = self._encode(codepoints[None, :])[0]
+        shift = 21 * (n - len(text))
+        lo = np.searchsorted(self.gram_keys, prefix << shift, side='left')
+        hi = np.searchsorted(self.gram_keys, (prefix + 1) << shift, side='left')
+        return lo, hi
+
+    def _postings(self, gram):
+        """Returns the sorted row positions containing the given n-gram."""
+        lo, hi = self._key_range(gram)
+        return self.gram_rows[self.gram_offsets[lo]:self.gram_offsets[hi]]
+
+    def search_sensor_ids(self, text):
+        """Returns sorted row positions whose sensor ID contains `text` (case-insensitive)."""
+        query = text.lower()
+        n = self.ngram_size
+
+        if len(query) < n:
+            # Short queries match every n-gram they prefix; thanks to the end
+            # padding that covers occurrences at the end of an ID too.
+            lo, hi = self._key_range(query)
+            return np.unique(self.gram_rows[self.gram_offsets[lo]:self.gram_offsets[hi]])
+
+        candidates = None
+        grams = {query[i:i + n] for i in range(len(query) - n + 1)}
+        for rows in sorted((self._postings(g) for g in grams), key=len):
+            candidates = rows if candidates is None else np.intersect1d(candidates, rows, assume_unique=True)
+            if len(candidates) == 0:
+                return candidates
+
+        if len(grams) == 1 and len(query) == n:
+            return candidates
+
+        # N-gram matches are necessary but not sufficient; verify the survivors
+        matches = np.char.find(self.sensor_ids[candidates], query) >= 0
+        return candidates[matches]
+
+    def score_range(self, column, low, high):
+        """Returns row positions with `low <= column <= high`, or None if the range covers every row."""
+        sorted_values = self.sorted_values[column]
+        lo = np.searchsorted(sorted_values, low, side='left')
+        hi = np.searchsorted(sorted_values, high, side='right')
+        if lo == 0 and hi == self.size:
+            return None
+        return self.orders[column][lo:hi]
+
+    def order_by(self, positions, column, values=None, ascending=True):
+        """Returns `positions` reordered by `column`.
+
+        Indexed score columns reuse the precomputed argsort order (a linear
+        mask pass, no sort); other columns sort only the selected rows' values.
+        """
+        if column in self.orders:
+            selected = np.zeros(self.size, dtype=bool)
+            selected[positions] = True
+            order = self.orders[column]
+            ordered = order[selected[order]]
+        else:
+            ordered = positions[np.argsort(np.asarray(values)[positions], kind='stable')]
+        return ordered if ascending else ordered[::-1]
+
+    def query(self, search_text=None, score_ranges=None):
+        """Returns sorted row positions matching the search text and all score ranges."""
+        selections = []
+        if search_text:
+            selections.append(self.search_sensor_ids(search_text))
+        for column, (low, high) in (score_ranges or {}).items():
+            rows = self.score_range(column, low, high)
+            if rows is not None:
+                selections.append(rows)
+
+        if not selections:
+            return np.arange(self.size)
+
+        mask = np.ones(self.size, dtype=bool)
+        for rows in selections:
+            selected = np.zeros(self.size, dtype=bool)
+            selected[rows] = True
+            mask &= selected
+        return np.flatnonzero(mask)
+
+def build_score_index(scores):
+    """Builds a ScoreIndex for a scores frame, or None when there are no scores."""
+    if not isinstance(scores, pd.DataFrame) or scores.empty:
+        return None
+    return ScoreIndex(scores, INDEXED_COLUMNS)
@@ -2,6 +2,7 @@ import plotly.graph_objects as go
 import plotly.express as px
 from plotly.subplots import make_subplots
 import pandas as pd
+import numpy as np
 
 def create_distribution_plot(scores_df, score_type='TUS'):
     """Create distribution plot for TUS or RUS scores"""
@@ -16,12 +17,18 @@ def create_distribution_plot(scores_df, score_type='TUS'):
         return fig
     
     category_col = f'{score_type}_category'
-    all_categories = [
-        "0.0 - 0.1", "0.1 - 0.2", "0.2 - 0.3", "0.3 - 0.4", "0.4 - 0.5", 
-        "0.5 - 0.6", "0.6 - 0.7", "0.7 - 0.8", "0.8 - 0.9", "0.9 - 1.0"
-    ]
+    if isinstance(scores_df[category_col].dtype, pd.CategoricalDtype):
+        # Categories come from the scoring profile's bins
+        all_categories = list(scores_df[category_col].cat.categories)
+    else:
+        all_categories = [
+            "0.0 - 0.1", "0.1 - 0.2", "0.2 - 0.3", "0.3 - 0.4", "0.4 - 0.5", 
+            "0.5 - 0.6", "0.6 - 0.7", "0.7 - 0.8", "0.8 - 0.9", "0.9 - 1.0"
+        ]
     
     colors = ['#d73027', '#f46d43', '#fdae61', '#fee08b', '#d9ef8b', '#a6d96a', '#66bd63', '#1a9850', '#006837', '#00441b']
+    if len(all_categories) != len(colors):
+        colors = px.colors.sample_colorscale('RdYlGn', [i / max(1, len(all_categories) - 1) for i in range(len(all_categories))])
     color_map = {cat: color for cat, color in zip(all_categories, colors)}
 
     scores_df[category_col] = pd.Categorical(scores_df[category_col], categories=all_categories, ordered=True)
@@ -88,7 +95,7 @@ def create_distribution_plot(scores_df, score_type='TUS'):
     
     return fig
 
-def create_thickness_profiles_plot(df, scores_df, score_type='TUS', target_mean=17.5, y_range=None):
+def create_thickness_profiles_plot(df, scores_df, score_type='TUS', target_mean=17.5, y_range=None, window=(0.2, 0.8)):
     """Create thickness profiles plot grouped by score category"""
     if df.empty or scores_df.empty:
         fig = go.Figure()
@@ -101,15 +108,17 @@ def create_thickness_profiles_plot(df, scores_df, score_type='TUS', target_mean=
         return fig
     
     df_filtered = df[
-        (df['position_mm'] >= 0.2) & 
-        (df['position_mm'] <= 0.8) & 
+        (df['position_mm'] >= window[0]) & 
+        (df['position_mm'] <= window[1]) & 
         (df['thickness_um'] > 0)
     ].copy()
     
     category_col = f'{score_type}_category'
+    # Sensor ids repeat across lots in multi-lot files
+    keys = ['lot_id', 'sensor_id'] if 'lot_id' in scores_df.columns and 'lot_id' in df_filtered.columns else ['sensor_id']
     df_plot = df_filtered.merge(
-        scores_df[['sensor_id', category_col]], 
-        on='sensor_id', 
+        scores_df[keys + [category_col]], 
+        on=keys, 
         how='left'
     )
     
@@ -144,8 +153,8 @@ def create_thickness_profiles_plot(df, scores_df, score_type='TUS', target_mean=
     for i, category in enumerate(categories):
         category_data = df_plot[df_plot[category_col] == category]
         
-        for j, sensor_id in enumerate(category_data['sensor_id'].unique()):
-            sensor_data = category_data[category_data['sensor_id'] == sensor_id]
+        for j, (sensor_key, sensor_data) in enumerate(category_data.groupby(keys, sort=False)):
+            sensor_id = ' / '.join(map(str, sensor_key)) if isinstance(sensor_key, tuple) else sensor_key
             sensor_data = sensor_data.sort_values('position_mm')
             
             fig.add_trace(
@@ -161,8 +170,8 @@ def create_thickness_profiles_plot(df, scores_df, score_type='TUS', target_mean=
                 row=i+1, col=1
             )
         
-        fig.add_trace(go.Scatter(x=[0.2, 0.8], y=[target_mean, target_mean], mode='lines', line=dict(color='red', dash='dash', width=3), hoverinfo='none', showlegend=False), row=i+1, col=1)
-        fig.add_annotation(x=0.8, y=target_mean, text=f"Target: {target_mean} μm", showarrow=False, yshift=10, xanchor='right', row=i+1, col=1)
+        fig.add_trace(go.Scatter(x=list(window), y=[target_mean, target_mean], mode='lines', line=dict(color='red', dash='dash', width=3), hoverinfo='none', showlegend=False), row=i+1, col=1)
+        fig.add_annotation(x=window[1], y=target_mean, text=f"Target: {target_mean} μm", showarrow=False, yshift=10, xanchor='right', row=i+1, col=1)
         fig.update_xaxes(title_text="Position (mm)", showticklabels=True, row=i+1, col=1)
         fig.update_yaxes(title_text="Thickness (μm)", showticklabels=True, row=i+1, col=1)
         
@@ -218,4 +227,308 @@ def create_thickness_profiles_plot(df, scores_df, score_type='TUS', target_mean=
     
     fig.for_each_annotation(lambda a: a.update(text=a.text.split("=")[-1]))
     
-    return fig 
\ No newline at end of file
+    return fig 
+
+def create_transfer_plot(paired, transfer, column='mean_thickness'):
+    """Scatter of Post vs Pre per sensor with the fitted transfer line."""
+    if paired.empty:
+        fig = go.Figure()
+        fig.add_annotation(
+            text="No paired sensors available",
+            xref="paper", yref="paper",
+            x=0.5, y=0.5, showarrow=False,
+            font=dict(size=16, color="gray")
+        )
+        return fig
+
+    x = paired[f'pre_{column}']
+    y = paired[f'post_{column}']
+    # WebGL keeps hundreds of thousands of points responsive
+    fig = go.Figure(go.Scattergl(
+        x=x, y=y, mode='markers',
+        marker=dict(size=5, color='#D95D39', opacity=0.6),
+        text=paired['sensor_id'],
+        hovertemplate='%{text}<br>Pre: %{x:.2f}<br>Post: %{y:.2f}<extra></extra>',
+        showlegend=False
+    ))
+    if transfer is not None:
+        x_line = np.array([x.min(), x.max()])
+        fig.add_trace(go.Scatter(
+            x=x_line, y=transfer['slope'] * x_line + transfer['intercept'], mode='lines',
+            line=dict(color='#4A0E1A', width=3),
+            name=f"Post = {transfer['slope']:.3f} × Pre + {transfer['intercept']:.2f} (R² {transfer['r2']:.3f})"
+        ))
+
+    fig.update_layout(
+        title=dict(text='Pre → Post Transfer', font=dict(size=18, color='black'), x=0.5, xanchor='center'),
+        xaxis=dict(title=dict(text='Pre-OL Mean Thickness (μm)', font=dict(size=14, color='black')), showgrid=True, gridcolor='lightgray', showline=True, linecolor='black'),
+        yaxis=dict(title=dict(text='Post-OL Mean Thickness (μm)', font=dict(size=14, color='black')), showgrid=True, gridcolor='lightgray', showline=True, linecolor='black'),
+        legend=dict(orientation='h', yanchor='bottom', y=-0.25, x=0.5, xanchor='center'),
+        height=500,
+        plot_bgcolor='white',
+        paper_bgcolor='white',
+        font=dict(color='black'),
+        transition_duration=0
+    )
+    return fig
+
+def create_delta_distribution_plot(paired, score_type='TUS'):
+    """Histogram of per-sensor Post - Pre score changes."""
+    fig = go.Figure(go.Histogram(
+        x=paired[f'delta_{score_type}'], nbinsx=40,
+        marker=dict(color='#D95D39', line=dict(color='black', width=1))
+    ))
+    fig.add_vline(x=0, line=dict(color='black', dash='dash', width=2))
+    fig.update_layout(
+        title=dict(text=f'Δ{score_type} (Post - Pre)', font=dict(size=18, color='black'), x=0.5, xanchor='center'),
+        xaxis=dict(title=dict(text=f'Δ{score_type}', font=dict(size=14, color='black')), showgrid=True, gridcolor='lightgray', showline=True, linecolor='black'),
+        yaxis=dict(title=dict(text='Sensors', font=dict(size=14, color='black')), showgrid=True, gridcolor='lightgray', showline=True, linecolor='black'),
+        height=400,
+        plot_bgcolor='white',
+        paper_bgcolor='white',
+        font=dict(color='black'),
+        bargap=0.05,
+        transition_duration=0
+    )
+    return fig
+
+def create_target_sweep_plot(sweep, metric, metric_label, optimum, current_target=None):
+    """Curve of a sweep metric (mean TUS or yield) against the target mean."""
+    fig = go.Figure(go.Scatter(
+        x=sweep['target_mean'], y=sweep[metric], mode='lines',
+        line=dict(color='#D95D39', width=3),
+        hovertemplate='Target %{x:.2f} μm<br>' + metric_label + ' %{y:.3f}<extra></extra>',
+        showlegend=False
+    ))
+    fig.add_vline(
+        x=optimum['target_mean'], line=dict(color='#1a9850', dash='dash', width=2),
+        annotation_text=f"Optimal {optimum['target_mean']:.2f} μm", annotation_position='top right'
+    )
+    if current_target is not None:
+        fig.add_vline(
+            x=current_target, line=dict(color='#4A0E1A', dash='dot', width=2),
+            annotation_text=f"Current {current_target:.2f} μm", annotation_position='bottom left'
+        )
+    fig.update_layout(
+        title=dict(text=f'{metric_label} vs Target Mean', font=dict(size=18, color='black'), x=0.5, xanchor='center'),
+        xaxis=dict(title=dict(text='Target Mean (μm)', font=dict(size=14, color='black')), showgrid=True, gridcolor='lightgray', showline=True, linecolor='black'),
+        yaxis=dict(title=dict(text=metric_label, font=dict(size=14, color='black')), showgrid=True, gridcolor='lightgray', showline=True, linecolor='black'),
+        height=450,
+        plot_bgcolor='white',
+        paper_bgcolor='white',
+        font=dict(color='black'),
+        transition_duration=0
+    )
+    return fig
+
+def create_cluster_profiles_plot(clusters):
+    """One panel per shape cluster: the centroid and the 10th–90th percentile band of its members."""
+    cols = min(3, clusters.n_clusters)
+    rows = -(-clusters.n_clusters // cols)
+    titles = [f"C{i + 1} · {shape} · {size:,} sensors" for i, (shape, size) in enumerate(zip(clusters.shapes, clusters.sizes))]
+    fig = make_subplots(rows=rows, cols=cols, subplot_titles=titles, shared_yaxes=True,
+                        horizontal_spacing=0.05, vertical_spacing=0.12 if rows > 1 else 0.1)
+    grid = clusters.grid
+    for i, (centroid, (low, high)) in enumerate(zip(clusters.centroids, clusters.bands)):
+        row, col = i // cols + 1, i % cols + 1
+        fig.add_trace(go.Scatter(
+            x=np.r_[grid, grid[::-1]], y=np.r_[high, low[::-1]], fill='toself',
+            fillcolor='rgba(217, 93, 57, 0.2)', line=dict(width=0), hoverinfo='skip', showlegend=False
+        ), row=row, col=col)
+        fig.add_trace(go.Scatter(
+            x=grid, y=centroid, mode='lines', line=dict(color='#4A0E1A', width=3), showlegend=False,
+            hovertemplate='Position %{x:.2f} mm<br>%{y:.2f} σ<extra>C' + str(i + 1) + '</extra>'
+        ), row=row, col=col)
+        fig.add_hline(y=0, line=dict(color='gray', dash='dot', width=1), row=row, col=col)
+
+    fig.update_xaxes(title_text='Position (mm)', showgrid=True, gridcolor='lightgray', showline=True, linecolor='black', row=rows)
+    fig.update_xaxes(showgrid=True, gridcolor='lightgray', showline=True, linecolor='black')
+    fig.update_yaxes(showgrid=True, gridcolor='lightgray', showline=True, linecolor='black')
+    fig.update_yaxes(title_text='Normalized thickness (σ)', col=1)
+    fig.update_layout(
+        title=dict(text='Profile Shape Clusters', font=dict(size=18, color='black'), x=0.5, xanchor='center'),
+        height=300 * rows + 80,
+        plot_bgcolor='white',
+        paper_bgcolor='white',
+        font=dict(color='black'),
+        transition_duration=0
+    )
+    return fig
+
+def create_similar_profiles_plot(grid, profile, sensor_label, matches, curves):
+    """Overlays a sensor's normalized profile with its nearest neighbours from the similarity search."""
+    fig = go.Figure()
+    for (_, match), (match_grid, curve) in zip(matches.iterrows(), curves):
+        name = f"{match.get('lot_id', '')} {match['sensor_id']}".strip()
+        fig.add_trace(go.Scatter(
+            x=match_grid, y=curve, mode='lines', line=dict(color='#D95D39', width=1), opacity=0.5, name=name,
+            hovertemplate=f"{name}<br>{match['source']}<br>d = {match['distance']:.3f}<extra></extra>"
+        ))
+    fig.add_trace(go.Scatter(
+        x=grid, y=profile, mode='lines+markers', line=dict(color='#4A0E1A', width=3), name=sensor_label,
+        hovertemplate='Position %{x:.2f} mm<br>%{y:.2f} σ<extra>' + sensor_label + '</extra>'
+    ))
+    fig.update_layout(
+        title=dict(text=f'Profiles Most Similar to {sensor_label}', font=dict(size=18, color='black'), x=0.5, xanchor='center'),
+        xaxis=dict(title='Position (mm)', showgrid=True, gridcolor='lightgray', showline=True, linecolor='black'),
+        yaxis=dict(title='Normalized thickness (σ)', showgrid=True, gridcolor='lightgray', showline=True, linecolor='black'),
+        showlegend=False,
+        height=450,
+        plot_bgcolor='white',
+        paper_bgcolor='white',
+        font=dict(color='black'),
+        transition_duration=0
+    )
+    return fig
+
+def create_roughness_spectrum_plot(spectrum, window):
+    """Lot-averaged roughness spectrum with the low, mid and high bands shaded; `spectrum` comes from lot_spectrum."""
+    from .spectral import ROUGHNESS_BANDS
+
+    fig = go.Figure()
+    if spectrum is None:
+        return fig
+    frequencies, power = spectrum
+    length = window[1] - window[0]
+    colors = {'low': 'rgba(74, 14, 26, 0.08)', 'mid': 'rgba(217, 93, 57, 0.12)', 'high': 'rgba(241, 143, 1, 0.12)'}
+    top = frequencies[-1] if len(frequencies) else 0
+    for band, (low, high) in ROUGHNESS_BANDS.items():
+        start, end = low / length if length else 0, min(high / length, top) if length else top
+        if start < end:
+            fig.add_vrect(x0=start, x1=end, fillcolor=colors[band], line_width=0,
+                          annotation_text=band, annotation_position='top left')
+    with np.errstate(divide='ignore'):
+        wavelength = np.where(frequencies > 0, 1 / frequencies, np.inf)
+    fig.add_trace(go.Scatter(
+        x=frequencies[1:], y=power[1:], mode='lines+markers', line=dict(color='#4A0E1A', width=2), customdata=wavelength[1:],
+        hovertemplate='%{x:.2f} cycles/mm (λ = %{customdata:.3f} mm)<br>%{y:.2e} μm²<extra></extra>'
+    ))
+    fig.update_layout(
+        title=dict(text='Average Roughness Spectrum', font=dict(size=18, color='black'), x=0.5, xanchor='center'),
+        xaxis=dict(title='Spatial frequency (cycles/mm)', showgrid=True, gridcolor='lightgray', showline=True, linecolor='black'),
+        yaxis=dict(title='Mean power (μm²)', type='log', showgrid=True, gridcolor='lightgray', showline=True, linecolor='black'),
+        showlegend=False,
+        height=400,
+        plot_bgcolor='white',
+        paper_bgcolor='white',
+        font=dict(color='black'),
+        transition_duration=0
+    )
+    return fig
+
+# Sensor points drawn on run charts; longer series are thinned evenly
+RUN_CHART_MAX_POINTS = 20000
+
+def create_run_chart(drift, label):
+    """Run chart of a DriftAnalysis: values in production order, rolling mean, segment means and change points."""
+    n = len(drift.values)
+    step = max(1, -(-n // RUN_CHART_MAX_POINTS))
+    shown = np.arange(0, n, step)
+    sensors = drift.keys['sensor_id'].astype(str).to_numpy()
+
+    fig = go.Figure()
+    fig.add_trace(go.Scattergl(
+        x=shown, y=drift.values[shown], mode='markers', marker=dict(color='#D95D39', size=3, opacity=0.4),
+        customdata=sensors[shown], name='Sensors',
+        hovertemplate='%{customdata}<br>' + label + ': %{y:.3f}<extra></extra>'
+    ))
+    fig.add_trace(go.Scattergl(
+        x=shown, y=drift.rolling_mean[shown], mode='lines', line=dict(color='#4A0E1A', width=2),
+        name=f'Rolling mean ({drift.window})', hovertemplate='Rolling mean: %{y:.3f}<extra></extra>'
+    ))
+    segments = drift.segments()
+    bounds = np.r_[0, np.cumsum(segments['sensors'].to_numpy())]
+    fig.add_trace(go.Scatter(
+        x=np.column_stack([bounds[:-1], bounds[1:] - 1, bounds[:-1]]).ravel(),
+        y=np.column_stack([segments['mean'], segments['mean'], np.full(len(segments), np.nan)]).ravel(),
+        mode='lines', line=dict(color='#F18F01', width=3), name='Segment mean', hoverinfo='skip'
+    ))
+    for position in drift.change_points:
+        fig.add_vline(x=position - 0.5, line=dict(color='red', dash='dash', width=1.5))
+    for position in drift.lot_edges:
+        fig.add_vline(x=position - 0.5, line=dict(color='gray', dash='dot', width=1))
+
+    fig.update_layout(
+        title=dict(text=f'{label} in Production Order', font=dict(size=18, color='black'), x=0.5, xanchor='center'),
+        xaxis=dict(title='Sensor (production order)', showgrid=True, gridcolor='lightgray', showline=True, linecolor='black'),
+        yaxis=dict(title=label, showgrid=True, gridcolor='lightgray', showline=True, linecolor='black'),
+        legend=dict(orientation='h', yanchor='bottom', y=1.0, xanchor='right', x=1.0),
+        height=450,
+        plot_bgcolor='white',
+        paper_bgcolor='white',
+        font=dict(color='black'),
+        transition_duration=0
+    )
+    return fig
+
+def create_spc_chart(data, label):
+    """X̄ (individual lot means), moving-range and EWMA charts of one statistic from SpcHistory.chart_data.
+
+    Limits are drawn as steps: each lot is shown with the limits it was judged
+    against when it was appended. Signals are marked in red.
+    """
+    from .spc import EWMA_LAMBDA
+
+    fig = make_subplots(rows=3, cols=1, shared_xaxes=True, vertical_spacing=0.08,
+                        subplot_titles=(f'{label}: lot means (X̄)', 'Moving range (MR)', f'EWMA (λ = {EWMA_LAMBDA:g})'))
+    if data.empty:
+        return fig
+    x = data['index']
+    hover = data['lot'] + '<br>' + data['timestamp']
+    for row, (value, signal, limits) in enumerate([
+        ('value', 'signal', [('center', 'dot'), ('ucl', 'dash'), ('lcl', 'dash')]),
+        ('moving_range', 'mr_signal', [('mr_center', 'dot'), ('mr_ucl', 'dash')]),
+        ('ewma', 'ewma_signal', [('center', 'dot'), ('ewma_ucl', 'dash'), ('ewma_lcl', 'dash')]),
+    ], start=1):
+        for limit, dash in limits:
+            if limit in data.columns:
+                fig.add_trace(go.Scatter(
+                    x=x, y=data[limit], mode='lines', line=dict(color='gray' if dash == 'dot' else '#D95D39', dash=dash, width=1.5, shape='hv'),
+                    showlegend=False, hovertemplate=limit.upper() + ': %{y:.3f}<extra></extra>'
+                ), row=row, col=1)
+        flagged = data[signal].fillna(False).astype(bool) if signal in data.columns else pd.Series(False, index=data.index)
+        fig.add_trace(go.Scatter(
+            x=x, y=data[value], mode='lines+markers', line=dict(color='#4A0E1A', width=2),
+            marker=dict(color=np.where(flagged, 'red', '#4A0E1A'), size=np.where(flagged, 10, 6)),
+            customdata=hover, showlegend=False, hovertemplate='%{customdata}<br>%{y:.3f}<extra></extra>'
+        ), row=row, col=1)
+
+    fig.update_xaxes(showgrid=True, gridcolor='lightgray', showline=True, linecolor='black')
+    fig.update_xaxes(title_text='Lot (order appended)', row=3, col=1)
+    fig.update_yaxes(showgrid=True, gridcolor='lightgray', showline=True, linecolor='black')
+    fig.update_layout(
+        height=800,
+        plot_bgcolor='white',
+        paper_bgcolor='white',
+        font=dict(color='black'),
+        transition_duration=0
+    )
+    return fig
+
+def create_preview_histogram(histogram, label):
+    """Histogram of estimated sensor counts from UploadPreview.histogram, with 95% bounds as error bars."""
+    fig = go.Figure()
+    if not histogram.empty:
+        centres = (histogram['left'] + histogram['right']) / 2
+        fig.add_trace(go.Bar(
+            x=centres, y=histogram['estimate'], width=histogram['right'] - histogram['left'],
+            marker=dict(color='#F18F01', line=dict(color='black', width=1)), opacity=0.8,
+            error_y=dict(type='data', symmetric=False, array=histogram['high'] - histogram['estimate'],
+                         arrayminus=histogram['estimate'] - histogram['low'], color='#4A0E1A', thickness=1),
+            customdata=np.column_stack([histogram['left'], histogram['right'], histogram['low'], histogram['high'], histogram['sampled']]),
+            hovertemplate=(label + ' %{customdata[0]:.3f}–%{customdata[1]:.3f}<br>~%{y:,.0f} sensors '
+                           '(%{customdata[2]:,.0f}–%{customdata[3]:,.0f})<br>%{customdata[4]} sampled<extra></extra>')
+        ))
+    fig.update_layout(
+        title=dict(text=f'Estimated {label} Distribution', font=dict(size=16, color='black'), x=0.5, xanchor='center'),
+        xaxis=dict(title=label, showgrid=True, gridcolor='lightgray', showline=True, linecolor='black'),
+        yaxis=dict(title='Sensors (estimated)', showgrid=True, gridcolor='lightgray', showline=True, linecolor='black'),
+        height=350,
+        bargap=0,
+        showlegend=False,
+        plot_bgcolor='white',
+        paper_bgcolor='white',
+        font=dict(color='black'),
+        transition_duration=0
+    )
+    return fig
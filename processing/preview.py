@@ -0,0 +1,226 @@
+import time
+import numpy as np
+import pandas as pd
+from .scoring import LOT_COLUMN, DEFAULT_PROFILE, compute_sensor_features, score_features
+from .data_processing import CONDITIONS, prepare_condition_data
+
+# Uploads with fewer rows are processed without a preview
+PREVIEW_MIN_ROWS = 200_000
+
+# Seconds the preview may take, and the share of them kept for the estimates and plots
+PREVIEW_LATENCY_TARGET = 1.0
+PREVIEW_RESERVE = 0.25
+
+# Sensors in the first sample chunk; every further chunk doubles it
+PREVIEW_FIRST_CHUNK = 512
+
+# Previewed statistics with their display labels, histogram bins and the z of the 95% bounds
+PREVIEW_COLUMNS = {
+    'mean_thickness': 'Mean thickness (μm)',
+    'TUS': 'Mean TUS',
+    'RUS': 'Mean RUS',
+}
+PREVIEW_BINS = 30
+PREVIEW_Z = 1.96
+
+def sensor_strata(df):
+    """Per-row sensor codes (-1 for rows without a sensor or lot) and the stratum (lot code) of every sensor.
+
+    Returns (codes, strata, lots), `lots` holding the lot of each stratum.
+    """
+    codes, sensors = pd.factorize(df['sensor_id'])
+    if LOT_COLUMN not in df.columns:
+        return codes, np.zeros(len(sensors), dtype=np.int64), np.array([None])
+
+    lot_codes, lots = pd.factorize(df[LOT_COLUMN])
+    valid = (codes >= 0) & (lot_codes >= 0)
+    combined = np.full(len(codes), -1, dtype=np.int64)
+    combined[valid], _ = pd.factorize(lot_codes[valid].astype(np.int64) * len(sensors) + codes[valid])
+    # First row of every (lot, sensor): the reversed assignment leaves the earliest row
+    first = np.empty(combined.max() + 1, dtype=np.int64)
+    rows = np.flatnonzero(valid)
+    first[combined[rows[::-1]]] = rows[::-1]
+    return combined, lot_codes[first].astype(np.int64), np.asarray(lots)
+
+def stratified_order(strata, rng):
+    """Sensor codes in a random order of which every prefix is a proportionally stratified sample.
+
+    Sensors are shuffled within their stratum and the i-th of a stratum of
+    n_h gets the key (i + u_h) / n_h; sorting on the keys interleaves the
+    strata at their share of the population.
+    """
+    shuffled = rng.permutation(len(strata))
+    shuffled = shuffled[np.argsort(strata[shuffled], kind='stable')]
+    sizes = np.bincount(strata)
+    starts = np.concatenate([[0], np.cumsum(sizes)[:-1]])
+    in_stratum = strata[shuffled]
+    rank = np.arange(len(shuffled)) - starts[in_stratum]
+    keys = (rank + rng.random(len(sizes))[in_stratum]) / sizes[in_stratum]
+    return shuffled[np.argsort(keys, kind='stable')]
+
+def lot_max_range(df, condition, codes, strata, lots, window):
+    """Largest thickness range of any sensor inside `window`, per lot, for one condition.
+
+    One min/max pass over all rows of the upload, filtered as SortedProfiles
+    filters them. Returns a Series indexed by lot, a single value when the
+    upload has no lots, or None when the condition has no thickness column.
+    """
+    thickness_column = CONDITIONS[condition]['thickness_column']
+    if thickness_column not in df.columns:
+        return None
+    thickness = pd.to_numeric(df[thickness_column], errors='coerce').to_numpy(dtype=float)
+    position = df['position_mm'].to_numpy(dtype=float)
+    keep = (df['condition'].to_numpy() == condition) & (codes >= 0) & (thickness > 0) & (position >= window[0]) & (position <= window[1])
+    extremes = pd.Series(thickness[keep]).groupby(codes[keep]).agg(['min', 'max'])
+    ranges = (extremes['max'] - extremes['min']).groupby(strata[extremes.index.to_numpy()]).max()
+    if LOT_COLUMN not in df.columns:
+        return float(ranges.max()) if len(ranges) else np.nan
+    return pd.Series(ranges.to_numpy(), index=lots[ranges.index.to_numpy()])
+
+def _wilson_bounds(share, n, fpc):
+    """95% Wilson bounds of proportions from n sampled sensors, narrowed by the finite-population correction."""
+    z2 = PREVIEW_Z ** 2 * fpc
+    centre = (share + z2 / (2 * n)) / (1 + z2 / n)
+    half = np.sqrt(z2 * (share * (1 - share) / n + z2 / (4 * n * n))) / (1 + z2 / n)
+    return np.clip(centre - half, 0, 1), np.clip(centre + half, 0, 1)
+
+class UploadPreview:
+    """Provisional scores of an upload from a stratified random sample of its sensors.
+
+    Sensors are drawn lot by lot in proportion to the lot sizes
+    (`stratified_order`). The sample grows in chunks that double in size,
+    each timed, and stops before the next chunk would overrun
+    `latency_target`, so the sample size adapts to the upload and the
+    machine. Features are computed per chunk and scored together with the
+    same code as the full run; only the range penalty, normalised by the
+    largest range in the lot, needs the whole lot: it comes from one min/max
+    pass over all rows (`lot_max_range`), or from the sample in robust mode
+    (`exact_range` False), where the largest IQR would need a full pass.
+
+    Lot means are stratified estimates with 95% bounds, and histograms
+    estimate sensor counts per bin with Wilson bounds.
+    """
+
+    def __init__(self, df, target_means, profile=None, latency_target=PREVIEW_LATENCY_TARGET, seed=0):
+        started = time.perf_counter()
+        profile = profile or DEFAULT_PROFILE
+        codes, strata, self.lots = sensor_strata(df)
+        order = stratified_order(strata, np.random.default_rng(seed))
+        budget = latency_target * (1 - PREVIEW_RESERVE)
+        self.exact_range = not profile.robust
+        max_ranges = {
+            condition: lot_max_range(df, condition, codes, strata, self.lots, profile.window) if self.exact_range else None
+            for condition in CONDITIONS
+        }
+
+        features = {condition: [] for condition in CONDITIONS}
+        drawn, chunk, last = 0, PREVIEW_FIRST_CHUNK, None
+        while drawn < len(order):
+            if last is not None and time.perf_counter() - started + last[1] * chunk / last[0] > budget:
+                break
+            chunk_started = time.perf_counter()
+            selected = np.zeros(len(order) + 1, dtype=bool)
+            selected[order[drawn:drawn + chunk]] = True
+            # Code -1 looks up the trailing False
+            rows = df[selected[codes]]
+            for condition in CONDITIONS:
+                condition_df = prepare_condition_data(rows, condition)
+                if condition_df is not None and not condition_df.empty:
+                    features[condition].append(compute_sensor_features(condition_df, profile.window, profile.extra_windows, profile.robust))
+            last = (min(chunk, len(order) - drawn), time.perf_counter() - chunk_started)
+            drawn += last[0]
+            chunk *= 2
+
+        self.population = len(order)
+        self.sampled = drawn
+        self.stratum_sizes = np.bincount(strata, minlength=len(self.lots))
+        self.stratum_sampled = np.bincount(strata[order[:drawn]], minlength=len(self.lots))
+        self.scores = {}
+        for condition, chunks in features.items():
+            if chunks:
+                scores = score_features(pd.concat(chunks, ignore_index=True), target_means[condition], profile, max_ranges[condition])
+                self.scores[CONDITIONS[condition]['label']] = scores
+        self.elapsed = time.perf_counter() - started
+
+    @property
+    def fraction(self):
+        return self.sampled / self.population if self.population else 0.0
+
+    def _strata(self, scores):
+        if LOT_COLUMN not in scores.columns:
+            return np.zeros(len(scores), dtype=np.int64)
+        return pd.Index(self.lots).get_indexer(scores[LOT_COLUMN])
+
+    def _sample(self, label, column):
+        """Finite values of `column` with their strata and the estimated condition sensors per stratum."""
+        scores = self.scores.get(label)
+        if scores is None or column not in scores.columns:
+            return np.array([]), np.array([], dtype=np.int64), np.zeros(len(self.lots))
+        values = scores[column].to_numpy(dtype=float)
+        strata = self._strata(scores)
+        # Sensors of a stratum having this condition, scaled up from the sensors drawn there
+        scored = np.bincount(strata, minlength=len(self.lots))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            population = np.where(self.stratum_sampled > 0, self.stratum_sizes * scored / self.stratum_sampled, 0.0)
+        finite = np.isfinite(values)
+        return values[finite], strata[finite], population
+
+    def sensors(self, label):
+        """(sensors scored, estimated sensors in the upload) for a condition."""
+        scores = self.scores.get(label)
+        if scores is None:
+            return 0, 0
+        _, _, population = self._sample(label, 'TUS')
+        return len(scores), int(round(population.sum()))
+
+    def estimate(self, label, column):
+        """Stratified estimate of the lot mean of `column` with 95% bounds: (estimate, low, high)."""
+        values, strata, population = self._sample(label, column)
+        if not len(values):
+            return np.nan, np.nan, np.nan
+        n = np.bincount(strata, minlength=len(self.lots))
+        totals = np.bincount(strata, weights=values, minlength=len(self.lots))
+        sampled = n > 0
+        means = np.where(sampled, totals / np.maximum(n, 1), 0.0)
+        squares = np.bincount(strata, weights=(values - means[strata]) ** 2, minlength=len(self.lots))
+        # Strata with a single value borrow the pooled variance
+        pooled = values.var(ddof=1) if len(values) > 1 else 0.0
+        variances = np.where(n > 1, squares / np.maximum(n - 1, 1), pooled)
+
+        weights = np.where(sampled, population, 0.0)
+        weights = weights / weights.sum()
+        with np.errstate(divide='ignore', invalid='ignore'):
+            fpc = np.where(sampled, np.clip(1 - n / np.maximum(population, 1), 0, 1), 0.0)
+            variance = np.sum(np.where(sampled, weights ** 2 * fpc * variances / np.maximum(n, 1), 0.0))
+        estimate = float(weights @ means)
+        half = PREVIEW_Z * float(np.sqrt(variance))
+        return estimate, estimate - half, estimate + half
+
+    def histogram(self, label, column, bins=PREVIEW_BINS):
+        """Estimated sensors of the upload per bin of `column` with 95% bounds.
+
+        Each sampled sensor stands for the sensors of its stratum it was drawn
+        from. Returns a frame of bin edges, sampled sensors, estimated sensors
+        and their bounds.
+        """
+        values, strata, population = self._sample(label, column)
+        if not len(values):
+            return pd.DataFrame(columns=['left', 'right', 'sampled', 'estimate', 'low', 'high'])
+        n = np.bincount(strata, minlength=len(self.lots))
+        weights = (population / np.maximum(n, 1))[strata]
+        edges = np.histogram_bin_edges(values, bins=bins)
+        sampled, _ = np.histogram(values, bins=edges)
+        estimated, _ = np.histogram(values, bins=edges, weights=weights)
+        total = weights.sum()
+        fpc = max(1 - len(values) / total, 0.0) if total else 0.0
+        low, high = _wilson_bounds(estimated / total, len(values), fpc)
+        return pd.DataFrame({
+            'left': edges[:-1], 'right': edges[1:], 'sampled': sampled,
+            'estimate': estimated, 'low': low * total, 'high': high * total,
+        })
+
+def preview_upload(df, target_mean_pre, target_mean_post, profile=None, latency_target=PREVIEW_LATENCY_TARGET):
+    """UploadPreview of a validated upload, or None when it is small enough to be scored outright."""
+    if len(df) < PREVIEW_MIN_ROWS:
+        return None
+    return UploadPreview(df, {'Pre': target_mean_pre, 'Post': target_mean_post}, profile, latency_target)
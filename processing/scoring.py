@@ -0,0 +1,537 @@
+import ast
+import keyword
+from functools import lru_cache
+import numpy as np
+import pandas as pd
+from .spectral import ROUGHNESS_COLUMNS, spectrum_points, profile_spectra, band_features
+
+# Optional column identifying the lot of each row in multi-lot files
+LOT_COLUMN = 'lot_id'
+
+# Per-sensor feature columns available to score weights and expressions
+FEATURE_COLUMNS = [
+    'mean_thickness', 'thickness_sd', 'thickness_range', 'r2_straightness', 'symmetry_bonus',
+    'slope', 'curvature', 'residual_rms', 'n_points',
+]
+
+# Shape features from the polynomial fits: wedge slope (μm/mm), bow curvature
+# (μm/mm², negative for a dome) and the residual RMS of the cubic fit (μm)
+SHAPE_COLUMNS = ['slope', 'curvature', 'residual_rms']
+
+# Robust statistics of the scoring window, computed for profiles in robust mode:
+# median, trimmed mean, median absolute deviation (MAD), interquartile range and
+# the number of spikes further than SPIKE_THRESHOLD robust SDs from the median
+ROBUST_COLUMNS = ['median_thickness', 'trimmed_mean', 'thickness_mad', 'thickness_iqr', 'spike_count']
+
+# Share of points cut from each end for the trimmed mean
+TRIM_FRACTION = 0.1
+
+# MAD of normally distributed data times this estimates its SD
+MAD_TO_SD = 1.4826
+
+# Spike threshold in robust SDs (modified z-score)
+SPIKE_THRESHOLD = 3.5
+
+# Upper bound on (sensors x grid points) elements resampled per block
+RESAMPLE_BLOCK_ELEMENTS = 2_000_000
+
+# Statistics the penalties can be based on: mean/SD/range or median/MAD/IQR
+STATISTICS_MODES = ('standard', 'robust')
+
+# Penalty columns derived from the features by a profile (also usable in expressions)
+PENALTY_COLUMNS = ['mean_penalty', 'smoothness_penalty', 'range_penalty']
+
+# Score columns produced by every profile, in output order
+SCORE_COLUMNS = [
+    'mean_thickness', 'thickness_sd', 'thickness_range', 'r2_straightness', 'slope', 'curvature', 'residual_rms',
+    'TUS', 'RUS', 'TUS_category', 'RUS_category',
+]
+
+# Features of each extra position window carried into the score table
+WINDOW_SCORE_FEATURES = ['mean_thickness', 'thickness_range']
+
+# Defaults of the standard profile
+DEFAULT_WINDOW = (0.2, 0.8)
+EDGE_WINDOWS = {'left_edge': (0.0, 0.2), 'right_edge': (0.8, 1.0)}
+MEAN_PENALTY_SIGMA = 2.0
+
+# Functions callable from custom score expressions (all vectorized)
+EXPRESSION_FUNCTIONS = {
+    'abs': np.abs, 'exp': np.exp, 'log': np.log, 'sqrt': np.sqrt,
+    'minimum': np.minimum, 'maximum': np.maximum, 'clip': np.clip, 'where': np.where,
+}
+
+_ALLOWED_NODES = (
+    ast.Expression, ast.BinOp, ast.UnaryOp, ast.Compare, ast.Call, ast.Name, ast.Load, ast.Constant,
+    ast.Add, ast.Sub, ast.Mult, ast.Div, ast.Pow, ast.Mod, ast.USub, ast.UAdd,
+    ast.BitAnd, ast.BitOr, ast.Invert,
+    ast.Lt, ast.LtE, ast.Gt, ast.GtE, ast.Eq, ast.NotEq,
+)
+
+def _edge_label(value):
+    return f"{value:.1f}" if round(value, 1) == value else f"{value:g}"
+
+class ScoringProfile:
+    """A named, versioned set of scoring parameters.
+
+    The window selects which positions feed the per-sensor features, and the
+    named extra windows (e.g. the edges) are measured in the same pass and can
+    be used by custom expressions as `<window>_<feature>`. Everything else
+    (penalty width, weights, category edges, custom expressions) is applied to
+    an existing feature table, so changing it never recomputes the features.
+    Profiles hold only plain data and can be sent to worker processes.
+    """
+
+    def __init__(self, name, version=1, window=DEFAULT_WINDOW, mean_sigma=MEAN_PENALTY_SIGMA, tus_weights=None, rus_weights=None,
+                 category_edges=(0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9), expressions=None, extra_windows=None,
+                 statistics='standard'):
+        self.name = name
+        self.version = version
+        self.window = tuple(window)
+        self.mean_sigma = mean_sigma
+        self.tus_weights = dict(tus_weights if tus_weights is not None else {
+            'mean_penalty': 0.3, 'smoothness_penalty': 0.2, 'range_penalty': 0.2,
+            'r2_straightness': 0.2, 'symmetry_bonus': 0.1,
+        })
+        self.rus_weights = dict(rus_weights if rus_weights is not None else {
+            'smoothness_penalty': 0.25, 'range_penalty': 0.35, 'r2_straightness': 0.20, 'symmetry_bonus': 0.20,
+        })
+        self.category_edges = tuple(category_edges)
+        self.expressions = dict(expressions or {})
+        self.extra_windows = {name: tuple(bounds) for name, bounds in (extra_windows or {}).items()}
+        self.statistics = statistics
+
+        if statistics not in STATISTICS_MODES:
+            raise ValueError(f"Unknown statistics mode: {statistics}")
+
+        for name, (low, high) in self.extra_windows.items():
+            if not name.isidentifier() or keyword.iskeyword(name):
+                raise ValueError(f"'{name}' cannot be used as a window name.")
+            if high < low:
+                raise ValueError(f"Window '{name}' ends before it starts.")
+        for weights in (self.tus_weights, self.rus_weights):
+            unknown = set(weights) - set(FEATURE_COLUMNS) - set(PENALTY_COLUMNS)
+            if unknown:
+                raise ValueError(f"Unknown weight terms: {', '.join(sorted(unknown))}")
+        for column, source in self.expressions.items():
+            if not column.isidentifier() or keyword.iskeyword(column) or column in SCORE_COLUMNS + ROUGHNESS_COLUMNS or column in self.extra_columns:
+                raise ValueError(f"'{column}' cannot be used as a score name.")
+            compile_expression(source, self.extra_columns)
+
+    @property
+    def window_columns(self):
+        """Feature columns of the extra windows, as named in feature tables and expressions."""
+        return tuple(window_feature_name(name, feature) for name in self.extra_windows for feature in FEATURE_COLUMNS)
+
+    @property
+    def robust(self):
+        return self.statistics == 'robust'
+
+    @property
+    def extra_columns(self):
+        """Feature columns beyond FEATURE_COLUMNS this profile needs: extra windows and, in robust mode, ROBUST_COLUMNS."""
+        return self.window_columns + (tuple(ROBUST_COLUMNS) if self.robust else ())
+
+    @property
+    def level_column(self):
+        """The thickness level the mean penalty compares with the target."""
+        return 'median_thickness' if self.robust else 'mean_thickness'
+
+    @property
+    def label(self):
+        return f"{self.name} (v{self.version})"
+
+    @property
+    def category_labels(self):
+        bounds = [0.0] + list(self.category_edges) + [1.0]
+        return [f"{_edge_label(low)} - {_edge_label(high)}" for low, high in zip(bounds[:-1], bounds[1:])]
+
+    def revised(self, **changes):
+        """Returns the next version of this profile with `changes` applied."""
+        params = {
+            'name': self.name, 'version': self.version + 1, 'window': self.window, 'mean_sigma': self.mean_sigma,
+            'tus_weights': self.tus_weights, 'rus_weights': self.rus_weights,
+            'category_edges': self.category_edges, 'expressions': self.expressions, 'extra_windows': self.extra_windows,
+            'statistics': self.statistics,
+        }
+        params.update(changes)
+        return ScoringProfile(**params)
+
+@lru_cache(maxsize=128)
+def compile_expression(source, extra_columns=()):
+    """Validates a score expression and compiles it once.
+
+    Expressions are arithmetic over feature, penalty and roughness columns
+    (plus the profile's `extra_columns`), numeric constants and the functions in
+    EXPRESSION_FUNCTIONS; anything else is rejected.
+    """
+    try:
+        tree = ast.parse(source.strip(), mode='eval')
+    except SyntaxError as e:
+        raise ValueError(f"Invalid expression '{source}': {e.msg}")
+
+    allowed_names = set(FEATURE_COLUMNS) | set(PENALTY_COLUMNS) | set(ROUGHNESS_COLUMNS) | set(extra_columns) | set(EXPRESSION_FUNCTIONS)
+    for node in ast.walk(tree):
+        if not isinstance(node, _ALLOWED_NODES):
+            raise ValueError(f"Unsupported syntax in expression '{source}': {type(node).__name__}")
+        if isinstance(node, ast.Name) and node.id not in allowed_names:
+            raise ValueError(f"Unknown name '{node.id}' in expression '{source}'")
+        if isinstance(node, ast.Call) and not (isinstance(node.func, ast.Name) and node.func.id in EXPRESSION_FUNCTIONS):
+            raise ValueError(f"Only {', '.join(EXPRESSION_FUNCTIONS)} can be called in expressions")
+        if isinstance(node, ast.Constant) and not isinstance(node.value, (int, float)):
+            raise ValueError(f"Only numeric constants are allowed in expression '{source}'")
+    return compile(tree, '<score expression>', 'eval')
+
+def evaluate_expression(source, table, extra_columns=()):
+    """Evaluates a compiled expression once over whole columns of `table`."""
+    columns = FEATURE_COLUMNS + PENALTY_COLUMNS + ROUGHNESS_COLUMNS + list(extra_columns)
+    namespace = {col: table[col].to_numpy(dtype=float) for col in columns if col in table.columns}
+    namespace.update(EXPRESSION_FUNCTIONS)
+    with np.errstate(all='ignore'):
+        result = eval(compile_expression(source, tuple(extra_columns)), {'__builtins__': {}}, namespace)
+    return np.broadcast_to(np.asarray(result, dtype=float), (len(table),))
+
+def mean_penalty(mean_thickness, target_mean, sigma=MEAN_PENALTY_SIGMA):
+    """Gaussian closeness of a sensor's mean thickness to the target; broadcasts over arrays."""
+    return np.exp(-((mean_thickness - target_mean)**2) / (2 * sigma**2))
+
+def window_feature_name(window, feature):
+    """Column name of `feature` in the named window; the scoring window keeps the plain names."""
+    return f"{window}_{feature}" if window else feature
+
+class SortedProfiles:
+    """Valid profile rows sorted by sensor and position, for vectorized per-sensor lookups.
+
+    `keys` has one row per sensor in code order and `codes`, `x`, `y` are the
+    sorted rows. The sort key is the sensor code plus the position squeezed
+    into [0, 0.5), so one searchsorted finds a position inside every sensor's
+    run at once (`bound`). `start`/`stop` delimit each sensor's run.
+    """
+
+    def __init__(self, df):
+        valid = df[(df['thickness_um'] > 0) & df['thickness_um'].notna() & df['position_mm'].notna()]
+        key_columns = [LOT_COLUMN, 'sensor_id'] if LOT_COLUMN in valid.columns else ['sensor_id']
+        grouped = valid.groupby(key_columns, sort=True)
+        self.keys = grouped.size().reset_index()[key_columns]
+        self.n_sensors = len(self.keys)
+        self.sensor_codes = np.arange(self.n_sensors)
+
+        codes = grouped.ngroup().to_numpy()
+        x = valid['position_mm'].to_numpy(dtype=float)
+        y = valid['thickness_um'].to_numpy(dtype=float)
+        self.x_min, self.x_span = (x.min(), (x.max() - x.min()) or 1.0) if len(x) else (0.0, 1.0)
+        sort_key = codes + (x - self.x_min) / self.x_span * 0.5
+        if not np.all(sort_key[1:] >= sort_key[:-1]):
+            order = np.argsort(sort_key, kind='stable')
+            sort_key, codes, x, y = sort_key[order], codes[order], x[order], y[order]
+        self.sort_key, self.codes, self.x, self.y = sort_key, codes, x, y
+        self.start = np.searchsorted(codes, self.sensor_codes, side='left')
+        self.stop = np.searchsorted(codes, self.sensor_codes, side='right')
+
+    @property
+    def empty(self):
+        return self.n_sensors == 0
+
+    def bound(self, position, side='left'):
+        """Index of `position` (a scalar or one value per sensor) inside each sensor's sorted run."""
+        offset = np.clip((position - self.x_min) / self.x_span * 0.5, -0.25, 0.75)
+        return np.searchsorted(self.sort_key, self.sensor_codes + offset, side=side)
+
+def resample_profiles(profiles, grid):
+    """Linearly interpolates every sensor's sorted profile onto `grid`; ends are held flat.
+
+    The (sensor, grid point) sort keys are already in order row by row, so
+    one searchsorted locates the bracketing rows of a whole block of sensors
+    at once; blocks bound the temporaries to RESAMPLE_BLOCK_ELEMENTS.
+    """
+    x, y = profiles.x, profiles.y
+    grid = np.asarray(grid, dtype=float)
+    offset = np.clip((grid - profiles.x_min) / profiles.x_span * 0.5, -0.25, 0.75)
+    resampled = np.empty((profiles.n_sensors, len(grid)))
+    block = max(1, RESAMPLE_BLOCK_ELEMENTS // max(len(grid), 1))
+    for first in range(0, profiles.n_sensors, block):
+        codes = profiles.sensor_codes[first:first + block]
+        queries = (codes[:, None] + offset[None, :]).ravel()
+        left = np.searchsorted(profiles.sort_key, queries, side='right').reshape(len(codes), len(grid)) - 1
+        last = profiles.stop[codes, None] - 1
+        left = np.clip(left, profiles.start[codes, None], last)
+        right = np.minimum(left + 1, last)
+        x_left, y_left = x[left], y[left]
+        span = x[right] - x_left
+        with np.errstate(divide='ignore', invalid='ignore'):
+            weight = np.where(span > 0, np.clip((grid - x_left) / span, 0.0, 1.0), 0.0)
+        resampled[first:first + block] = y_left + weight * (y[right] - y_left)
+    return resampled
+
+def window_spectra(profiles, low, high, points_per_sensor):
+    """Roughness spectra of every sensor's profile in [low, high], from one batched FFT.
+
+    Profiles are resampled onto a uniform grid about as dense as the data
+    (`spectrum_points`) and transformed together (`profile_spectra`).
+    """
+    n_points = spectrum_points(points_per_sensor)
+    grid = np.linspace(low, high, n_points)
+    return profile_spectra(resample_profiles(profiles, grid), ((high - low) / (n_points - 1)) or 1.0)
+
+def _solve_normal_equations(gram, rhs, valid):
+    """Solves a batch of small normal-equation systems; degenerate ones come back invalid.
+
+    A system is degenerate when its Gram determinant is tiny next to the
+    product of its diagonal (e.g. too few distinct positions for the degree).
+    """
+    size = gram.shape[-1]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ratio = np.linalg.det(gram) / np.prod(np.einsum('sii->si', gram), axis=1)
+    valid = valid & (ratio > 1e-9)
+    gram = np.where(valid[:, None, None], gram, np.eye(size))
+    rhs = np.where(valid[:, None], rhs, 0.0)
+    return np.linalg.solve(gram, rhs[..., None])[..., 0], valid
+
+def _shape_fits(x, yd, bounds, n, syy, low, high):
+    """Quadratic and cubic least-squares fits of every sensor's rows in one window.
+
+    The grouped moments Σtᵏ (k ≤ 6) and Σtᵏy (k ≤ 3) are segment sums over the
+    sorted rows in window-local coordinates t = (x - centre) / half-width,
+    which keeps the systems well conditioned; the fits are then one batched
+    solve per degree. Returns slope and curvature at the window centre from
+    the quadratic fit and the residual RMS of the cubic fit.
+    """
+    centre, half = (low + high) / 2, ((high - low) / 2) or 1.0
+    t = np.append((x - centre) / half, 0.0)
+    y = np.append(yd, 0.0)
+    moments = np.empty((7, len(n)))
+    cross = np.empty((4, len(n)))
+    power = np.ones_like(t)
+    for k in range(7):
+        moments[k] = np.add.reduceat(power, bounds)[0::2]
+        if k < 4:
+            cross[k] = np.add.reduceat(power * y, bounds)[0::2]
+        power = power * t
+
+    gram = np.moveaxis(moments[np.add.outer(np.arange(4), np.arange(4))], -1, 0)
+    rhs = cross.T
+    quadratic, quadratic_ok = _solve_normal_equations(gram[:, :3, :3], rhs[:, :3], n >= 3)
+    cubic, cubic_ok = _solve_normal_equations(gram, rhs, n >= 4)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        residual = np.maximum(syy - np.einsum('si,si->s', cubic, rhs), 0.0)
+        residual_rms = np.where(cubic_ok, np.sqrt(residual / n), np.nan)
+    slope = np.where(quadratic_ok, quadratic[:, 1] / half, np.nan)
+    curvature = np.where(quadratic_ok, 2 * quadratic[:, 2] / half ** 2, np.nan)
+    return slope, curvature, residual_rms
+
+def _segment_sort(values, codes):
+    """Sorts `values` within contiguous segments of ascending `codes` with one argsort.
+
+    The sort key is the segment code plus the value squeezed into [0, 0.5), as
+    in SortedProfiles, so segments stay in place and each is sorted inside.
+    """
+    if not len(values):
+        return values
+    low, span = values.min(), (values.max() - values.min()) or 1.0
+    return values[np.argsort(codes + (values - low) / span * 0.5, kind='stable')]
+
+def _segment_quantile(ordered, offsets, n, q):
+    """Linearly interpolated `q` quantile of every segment of `ordered`; NaN for empty segments."""
+    rank = q * np.maximum(n - 1, 0)
+    below = np.floor(rank).astype(int)
+    padded = np.append(ordered, np.nan)
+    lower = padded[np.where(n > 0, offsets + below, len(ordered))]
+    upper = padded[np.where(n > 0, offsets + np.minimum(below + 1, np.maximum(n - 1, 0)), len(ordered))]
+    return lower + (rank - below) * (upper - lower)
+
+def _robust_statistics(yd, start, stop):
+    """ROBUST_COLUMNS of every sensor's rows start:stop, relative to the sensor's reference thickness.
+
+    The window rows are gathered into contiguous segments and sorted per
+    sensor (`_segment_sort`), so quantiles are gathers at per-sensor offsets
+    and the trimmed mean is a difference of prefix sums over the sorted
+    values. The MAD repeats the segment sort on absolute deviations from the
+    median. No per-sensor Python runs; the cost is two sorts of the window rows.
+    """
+    n = stop - start
+    offsets = np.cumsum(n) - n
+    codes = np.repeat(np.arange(len(n)), n)
+    rows = np.arange(n.sum()) - np.repeat(offsets - start, n)
+    values = _segment_sort(yd[rows], codes)
+
+    median = _segment_quantile(values, offsets, n, 0.5)
+    iqr = _segment_quantile(values, offsets, n, 0.75) - _segment_quantile(values, offsets, n, 0.25)
+
+    trim = np.floor(TRIM_FRACTION * n).astype(int)
+    prefix = np.concatenate([[0.0], np.cumsum(values)])
+    with np.errstate(divide='ignore', invalid='ignore'):
+        trimmed = (prefix[offsets + n - trim] - prefix[offsets + trim]) / (n - 2 * trim)
+
+    deviation = np.abs(values - median[codes])
+    mad = _segment_quantile(_segment_sort(deviation, codes), offsets, n, 0.5)
+    # A zero MAD (over half the points identical) gives no usable scale, so no spikes are counted
+    limit = SPIKE_THRESHOLD * MAD_TO_SD * mad
+    spikes = np.bincount(codes, weights=(deviation > limit[codes]) & (limit[codes] > 0), minlength=len(n))
+    return median, trimmed, mad, iqr, spikes.astype(int)
+
+def compute_window_features(df, windows, robust_windows=(), roughness_windows=()):
+    """Per-sensor features for several position windows in one sorted pass.
+
+    Rows are sorted once by sensor and position and turned into prefix sums of
+    count, x, y, x², y² and xy, so each window's sums per sensor are two
+    searchsorted lookups and a subtraction; ranges come from one
+    min/max.reduceat over the same sorted rows and the polynomial shape fits
+    from batched normal equations (`_shape_fits`). `windows` maps a name to a
+    (start, end) position pair (both inclusive) and the result carries one
+    block of FEATURE_COLUMNS per window, named by `window_feature_name`.
+    Windows named in `robust_windows` also get the ROBUST_COLUMNS block
+    (`_robust_statistics`) and those in `roughness_windows` the
+    ROUGHNESS_COLUMNS from one batched FFT (`window_spectra`). Sensors
+    without points in a window get NaN features and n_points 0 there.
+    """
+    profiles = SortedProfiles(df)
+    if profiles.empty:
+        return pd.DataFrame()
+    codes, x, y, n_sensors = profiles.codes, profiles.x, profiles.y, profiles.n_sensors
+
+    # Thickness relative to each sensor's mean keeps the prefix sums well conditioned
+    y_ref = np.bincount(codes, weights=y, minlength=n_sensors) / np.bincount(codes, minlength=n_sensors)
+    yd = y - y_ref[codes]
+    prefix = np.zeros((6, len(x) + 1))
+    np.cumsum(np.vstack([np.ones_like(x), x, yd, x * x, yd * yd, x * yd]), axis=1, out=prefix[:, 1:])
+
+    y_padded = np.append(y, np.nan)
+    table = profiles.keys.copy()
+    for name, (low, high) in windows.items():
+        start = profiles.bound(low, 'left')
+        stop = np.maximum(profiles.bound(high, 'right'), start)
+        n, sx, sy, sxx, syy, sxy = prefix[:, stop] - prefix[:, start]
+        has_points = n > 0
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            mean = np.where(has_points, y_ref + sy / n, np.nan)
+            cxx = sxx - sx * sx / n
+            cyy = np.maximum(syy - sy * sy / n, 0.0)
+            cxy = sxy - sx * sy / n
+            sd = np.where(n > 1, np.sqrt(cyy / (n - 1)), np.nan)
+
+            # R² straightness of a least-squares line: Sxy² / (Sxx * Syy); a flat profile fits exactly
+            fittable = (n > 2) & (cxx > 1e-12 * profiles.x_span ** 2 * n)
+            r2 = np.where(cyy > 0, np.clip(cxy * cxy / (cxx * cyy), 0.0, 1.0), 1.0)
+
+        bounds = np.column_stack([start, stop]).ravel()
+        low_y = np.minimum.reduceat(y_padded, bounds)[0::2]
+        high_y = np.maximum.reduceat(y_padded, bounds)[0::2]
+
+        # Symmetry score: left vs right half of the window around its median position
+        middle = start + np.maximum(n.astype(int) - 1, 0) // 2
+        middle_upper = start + n.astype(int) // 2
+        safe = lambda idx: np.minimum(idx, len(x) - 1)
+        median = (x[safe(middle)] + x[safe(middle_upper)]) / 2
+        split = np.clip(profiles.bound(median, 'right'), start, stop)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            left_mean = y_ref + (prefix[2, split] - prefix[2, start]) / (split - start)
+            right_mean = y_ref + (prefix[2, stop] - prefix[2, split]) / (stop - split)
+            overall_mean = (left_mean + right_mean) / 2
+            symmetry = np.where(overall_mean > 0, 1 - np.abs(left_mean - right_mean) / overall_mean, 0.0)
+
+        slope, curvature, residual_rms = _shape_fits(x, yd, bounds, n, syy, low, high)
+
+        columns = {
+            'mean_thickness': mean,
+            'thickness_sd': sd,
+            'thickness_range': np.where(has_points, high_y - low_y, np.nan),
+            'r2_straightness': np.where(fittable, r2, 0.0),
+            'symmetry_bonus': np.where(has_points, np.maximum(symmetry, 0), np.nan),
+            'slope': slope,
+            'curvature': curvature,
+            'residual_rms': residual_rms,
+            'n_points': n.astype(int),
+        }
+        if name in robust_windows:
+            median, trimmed, mad, iqr, spikes = _robust_statistics(yd, start, stop)
+            columns.update({
+                'median_thickness': y_ref + median, 'trimmed_mean': y_ref + trimmed,
+                'thickness_mad': mad, 'thickness_iqr': iqr, 'spike_count': spikes,
+            })
+        if name in roughness_windows:
+            frequencies, power = window_spectra(profiles, low, high, n[has_points])
+            columns.update(band_features(frequencies, power, high - low))
+        for feature in columns:
+            table[window_feature_name(name, feature)] = columns[feature]
+    return table
+
+def compute_sensor_features(df, window=DEFAULT_WINDOW, extra_windows=None, robust=False):
+    """Per-sensor features from the profile rows inside `window`, plus any named `extra_windows`.
+
+    The scoring window keeps the plain FEATURE_COLUMNS names, adds the
+    ROUGHNESS_COLUMNS (and ROBUST_COLUMNS when `robust`) and only sensors with
+    points inside it are kept. Sensors
+    are keyed by (lot_id, sensor_id) when the data carries several lots.
+    """
+    features = compute_window_features(df, {'': window, **(extra_windows or {})}, ('',) if robust else (), ('',))
+    if features.empty:
+        return features
+    return features[features['n_points'] > 0].reset_index(drop=True)
+
+def lot_spectrum(df, window=DEFAULT_WINDOW):
+    """Roughness spectrum of a lot averaged over its sensors: (frequencies in cycles/mm, mean power in μm²), or None."""
+    profiles = SortedProfiles(df)
+    if profiles.empty:
+        return None
+    low, high = window
+    n = profiles.bound(high, 'right') - profiles.bound(low, 'left')
+    if not (n > 0).any():
+        return None
+    frequencies, power = window_spectra(profiles, low, high, n[n > 0])
+    return frequencies, power[n > 0].mean(axis=0)
+
+def score_features(features, target_mean, profile=None, max_range=None):
+    """Scores a feature table with a profile: penalties, weighted TUS/RUS, custom expressions and categories.
+
+    The range penalty is relative to the largest range in each lot; `max_range`
+    (a Series indexed by lot, or one value) supplies it instead when `features`
+    only holds a sample of the lot's sensors.
+    """
+    if features.empty:
+        return pd.DataFrame()
+    profile = profile or DEFAULT_PROFILE
+    keys = [col for col in (LOT_COLUMN, 'sensor_id') if col in features.columns]
+    table = features.copy()
+
+    # Penalties on the profile's statistics: mean, SD and range, or median,
+    # MAD-based SD and IQR in robust mode. The range normalisation is relative to each lot
+    spread = MAD_TO_SD * table['thickness_mad'] if profile.robust else table['thickness_sd']
+    spread_range = 'thickness_iqr' if profile.robust else 'thickness_range'
+    if max_range is not None:
+        max_range = table[LOT_COLUMN].map(max_range) if isinstance(max_range, pd.Series) else pd.Series(max_range, index=table.index)
+    elif LOT_COLUMN in table.columns:
+        max_range = table.groupby(LOT_COLUMN)[spread_range].transform('max')
+    else:
+        max_range = pd.Series(table[spread_range].max(), index=table.index)
+    table['mean_penalty'] = mean_penalty(table[profile.level_column], target_mean, profile.mean_sigma)
+    table['smoothness_penalty'] = 1 / (1 + spread.fillna(0))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        table['range_penalty'] = np.where(max_range > 0, 1 - table[spread_range] / max_range, 0)
+
+    table['TUS'] = sum(weight * table[term] for term, weight in profile.tus_weights.items())
+    table['RUS'] = sum(weight * table[term] for term, weight in profile.rus_weights.items())
+
+    for column, source in profile.expressions.items():
+        table[column] = evaluate_expression(source, table, profile.extra_columns)
+
+    # Categorize scores
+    bins = [-np.inf] + list(profile.category_edges) + [np.inf]
+    labels = profile.category_labels
+    table['TUS_category'] = pd.cut(table['TUS'], bins=bins, labels=labels, right=False)
+    table['RUS_category'] = pd.cut(table['RUS'], bins=bins, labels=labels, right=False)
+
+    window_columns = [window_feature_name(name, feature) for name in profile.extra_windows for feature in WINDOW_SCORE_FEATURES]
+    window_columns = [col for col in window_columns if col in table.columns]
+    robust_columns = ROBUST_COLUMNS if profile.robust else []
+    roughness_columns = [col for col in ROUGHNESS_COLUMNS if col in table.columns]
+    return table[keys + SCORE_COLUMNS + roughness_columns + robust_columns + window_columns + list(profile.expressions)]
+
+DEFAULT_PROFILE = ScoringProfile("Standard", extra_windows=EDGE_WINDOWS)
+
+# Same weights with penalties on median, MAD and IQR, so single spikes do not sink a sensor
+ROBUST_PROFILE = ScoringProfile("Robust", extra_windows=EDGE_WINDOWS, statistics='robust')
+
+# Built-in profiles by label
+SCORING_PROFILES = {profile.label: profile for profile in (DEFAULT_PROFILE, ROBUST_PROFILE)}
@@ -0,0 +1,109 @@
+import time
+import numpy as np
+import pandas as pd
+from .scoring import LOT_COLUMN, SortedProfiles
+from .clustering import CLUSTER_GRID_POINTS, resample_profiles, normalize_profiles
+
+# Profiles per BallTree leaf
+SIMILARITY_LEAF_SIZE = 40
+
+# Lots kept searchable in a session, most recent last
+MAX_LIBRARY_LOTS = 8
+
+DEFAULT_NEIGHBOURS = 10
+
+class ProfileSimilarityIndex:
+    """Nearest-neighbour index over a lot's resampled, normalized profiles.
+
+    Profiles are put on a common position grid and normalized the same way as
+    for shape clustering, then stored in a scikit-learn BallTree (Euclidean),
+    so a top-k query touches a handful of leaves instead of every sensor.
+    Built once per processed condition and kept with its results.
+    """
+
+    def __init__(self, profiles, source, condition=None, grid_points=CLUSTER_GRID_POINTS):
+        from sklearn.neighbors import BallTree
+
+        started = time.perf_counter()
+        self.source = source
+        self.condition = condition
+        self.keys = profiles.keys
+        self.grid = np.linspace(profiles.x_min, profiles.x_min + profiles.x_span, grid_points)
+        self.tree = BallTree(normalize_profiles(resample_profiles(profiles, self.grid)), leaf_size=SIMILARITY_LEAF_SIZE)
+        self.build_seconds = time.perf_counter() - started
+        self._lookup = None
+
+    @property
+    def size(self):
+        return len(self.keys)
+
+    @property
+    def vectors(self):
+        """The normalized profiles, one row per sensor (the tree's own copy)."""
+        return np.asarray(self.tree.get_arrays()[0])
+
+    def locate(self, sensor_id, lot=None):
+        """Row position of a sensor in this index, or None if it is not in the lot."""
+        if self._lookup is None:
+            self._lookup = pd.Index(pd.MultiIndex.from_frame(self.keys.astype(str)) if LOT_COLUMN in self.keys.columns
+                                    else self.keys['sensor_id'].astype(str))
+        key = (str(lot), str(sensor_id)) if LOT_COLUMN in self.keys.columns else str(sensor_id)
+        try:
+            position = self._lookup.get_loc(key)
+        except KeyError:
+            return None
+        return position if isinstance(position, (int, np.integer)) else None
+
+    def query(self, vector, grid, k=DEFAULT_NEIGHBOURS):
+        """The k nearest profiles to `vector` (sampled on `grid`) as (positions, distances)."""
+        if not np.allclose(grid, self.grid):
+            vector = np.interp(self.grid, grid, vector)
+        k = min(k, self.size)
+        distances, positions = self.tree.query(vector[None, :], k=k)
+        return positions[0], distances[0]
+
+def build_similarity_index(df, source, condition=None):
+    """Builds the similarity index of one condition's rows, or None when it has no valid profiles."""
+    if df is None or df.empty:
+        return None
+    profiles = SortedProfiles(df)
+    if profiles.empty:
+        return None
+    return ProfileSimilarityIndex(profiles, source, condition)
+
+def add_to_library(library, index):
+    """Returns `library` ({source: index}) with `index` added as the most recent lot, capped at MAX_LIBRARY_LOTS."""
+    library = {source: existing for source, existing in library.items() if source != index.source}
+    library[index.source] = index
+    while len(library) > MAX_LIBRARY_LOTS:
+        library.pop(next(iter(library)))
+    return library
+
+def find_similar(query_index, position, indexes, k=DEFAULT_NEIGHBOURS):
+    """Top-k sensors across `indexes` whose profiles are closest to one sensor's profile.
+
+    The sensor itself is left out. Returns (matches, curves, seconds): matches
+    has the source, keys and distance of each neighbour, nearest first, and
+    curves the matching (grid, normalized profile) pairs in the same order.
+    """
+    started = time.perf_counter()
+    vector = query_index.vectors[position]
+    frames, curves = [], []
+    for index in indexes:
+        # One extra neighbour in the sensor's own lot, which is the sensor itself
+        own = index is query_index
+        positions, distances = index.query(vector, query_index.grid, k + 1 if own else k)
+        if own:
+            keep = positions != position
+            positions, distances = positions[keep][:k], distances[keep][:k]
+        found = index.keys.iloc[positions].reset_index(drop=True)
+        found.insert(0, 'source', index.source)
+        found['distance'] = distances
+        frames.append(found)
+        vectors = index.vectors
+        curves.extend((index.grid, vectors[p]) for p in positions)
+    if not frames:
+        return pd.DataFrame(), [], time.perf_counter() - started
+    matches = pd.concat(frames, ignore_index=True)
+    order = np.argsort(matches['distance'].to_numpy(), kind='stable')[:k]
+    return matches.iloc[order].reset_index(drop=True), [curves[i] for i in order], time.perf_counter() - started
@@ -0,0 +1,195 @@
+import os
+import glob
+import json
+import shutil
+import hashlib
+import threading
+import datetime
+import numpy as np
+import pandas as pd
+
+# Lot-level statistics charted across production history, with their display labels
+SPC_COLUMNS = {
+    'mean_thickness': 'Mean thickness (μm)',
+    'TUS': 'Mean TUS',
+    'RUS': 'Mean RUS',
+}
+
+# Where the history is kept; override with the SPC_HISTORY_DIR environment variable
+DEFAULT_SPC_DIR = os.environ.get('SPC_HISTORY_DIR', os.path.join(os.path.expanduser('~'), '.sava_lot_analysis', 'spc'))
+
+# The history is shared by every session, so resetting it must be enabled by
+# whoever runs the app (SPC_ALLOW_RESET=1); a reset keeps the old history as
+# a backup and the newest SPC_BACKUPS_KEPT backups are kept
+SPC_ALLOW_RESET = os.environ.get('SPC_ALLOW_RESET', '').strip().lower() in ('1', 'true', 'yes')
+SPC_BACKUPS_KEPT = 5
+
+# Each lot is one point, so the X̄ chart uses the moving range between
+# consecutive lots: limits are X̄ ± E2·MR̄ and the MR chart's upper limit D4·MR̄
+MR_E2 = 2.66
+MR_D4 = 3.267
+MR_D2 = 1.128
+
+# EWMA smoothing and limit width (in σ of the EWMA statistic)
+EWMA_LAMBDA = 0.2
+EWMA_WIDTH = 3.0
+
+# Lots needed before a point is judged against limits
+MIN_BASELINE_LOTS = 3
+
+def _blank_state():
+    return {'count': 0, 'mean': 0.0, 'mr_sum': 0.0, 'mr_count': 0, 'last': None, 'ewma': None}
+
+def _limits(state):
+    """Control limits implied by a running state (None before the baseline is complete)."""
+    if state['count'] < MIN_BASELINE_LOTS or not state['mr_count']:
+        return None
+    mr_bar = state['mr_sum'] / state['mr_count']
+    sigma = mr_bar / MR_D2
+    i = state['count'] + 1
+    ewma_sigma = sigma * float(np.sqrt(EWMA_LAMBDA / (2 - EWMA_LAMBDA) * (1 - (1 - EWMA_LAMBDA) ** (2 * i))))
+    return {
+        'center': state['mean'], 'ucl': state['mean'] + MR_E2 * mr_bar, 'lcl': state['mean'] - MR_E2 * mr_bar,
+        'mr_center': mr_bar, 'mr_ucl': MR_D4 * mr_bar,
+        'ewma_ucl': state['mean'] + EWMA_WIDTH * ewma_sigma, 'ewma_lcl': state['mean'] - EWMA_WIDTH * ewma_sigma,
+    }
+
+def update_state(state, value):
+    """Adds one lot value to a running state in constant time and returns the point record.
+
+    The point is judged against the limits of the lots before it; the running
+    mean (Welford), moving-range sum and EWMA are then updated in place.
+    """
+    limits = _limits(state)
+    moving_range = abs(value - state['last']) if state['last'] is not None else None
+    ewma = value if state['ewma'] is None else EWMA_LAMBDA * value + (1 - EWMA_LAMBDA) * state['ewma']
+    point = {'index': state['count'] + 1, 'value': value, 'moving_range': moving_range, 'ewma': ewma, **(limits or {})}
+    point['signal'] = bool(limits) and not (limits['lcl'] <= value <= limits['ucl'])
+    point['mr_signal'] = bool(limits) and moving_range is not None and moving_range > limits['mr_ucl']
+    point['ewma_signal'] = bool(limits) and not (limits['ewma_lcl'] <= ewma <= limits['ewma_ucl'])
+
+    state['count'] += 1
+    state['mean'] += (value - state['mean']) / state['count']
+    if moving_range is not None:
+        state['mr_sum'] += moving_range
+        state['mr_count'] += 1
+    state['last'] = value
+    state['ewma'] = ewma
+    return point
+
+def lot_values(summary):
+    """The SPC_COLUMNS values of one lot from its LotSummary."""
+    return {column: summary.mean(column) for column in SPC_COLUMNS}
+
+class SpcHistory:
+    """Production history of lot-level statistics with incrementally maintained control limits.
+
+    `directory` holds `state.json`, the fixed-size running state per
+    (condition, statistic), `history.jsonl`, one appended line per lot with
+    its values and the limits it was judged against, and `lots/`, one empty
+    marker file per appended lot to refuse duplicates. Appending a lot
+    updates the state in constant time and never reads the history; the
+    history is read incrementally (only the lines added since the last read)
+    to draw the charts.
+    """
+
+    def __init__(self, directory=DEFAULT_SPC_DIR):
+        self.directory = directory
+        self.state_path = os.path.join(directory, 'state.json')
+        self.history_path = os.path.join(directory, 'history.jsonl')
+        self.lots_dir = os.path.join(directory, 'lots')
+        self._lock = threading.Lock()
+        self._records = []
+        self._offset = 0
+
+    def _load_state(self):
+        if not os.path.exists(self.state_path):
+            return {'series': {}}
+        with open(self.state_path, encoding='utf-8') as f:
+            return json.load(f)
+
+    def _save_state(self, state):
+        # Written to a temporary file and swapped in, so a crash never leaves a torn state
+        temp_path = self.state_path + '.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f)
+        os.replace(temp_path, self.state_path)
+
+    def append_lot(self, key, lot, condition, values, sensors=None, profile=None):
+        """Appends one lot's statistics and returns its record, or None if the lot was already appended.
+
+        `key` identifies the lot's scores (e.g. the LotSummary fingerprint) and
+        `values` maps SPC_COLUMNS to the lot's values.
+        """
+        with self._lock:
+            os.makedirs(self.lots_dir, exist_ok=True)
+            marker = os.path.join(self.lots_dir, hashlib.blake2b(f"{condition}:{key}".encode('utf-8'), digest_size=16).hexdigest())
+            if os.path.exists(marker):
+                return None
+            state = self._load_state()
+
+            points = {}
+            for column in SPC_COLUMNS:
+                value = values.get(column)
+                if value is None or not np.isfinite(value):
+                    continue
+                series = state['series'].setdefault(f"{condition}:{column}", _blank_state())
+                points[column] = update_state(series, float(value))
+
+            record = {
+                'key': key, 'lot': str(lot), 'condition': condition, 'sensors': sensors, 'profile': profile,
+                'timestamp': datetime.datetime.now().isoformat(timespec='seconds'), 'points': points,
+            }
+            with open(self.history_path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(record) + '\n')
+            self._save_state(state)
+            open(marker, 'w').close()
+            return record
+
+    def records(self):
+        """All appended lot records, reading only the part of the history added since the last call."""
+        with self._lock:
+            if not os.path.exists(self.history_path):
+                self._records, self._offset = [], 0
+                return []
+            if os.path.getsize(self.history_path) < self._offset:
+                # The history was replaced (e.g. reset): start over
+                self._records, self._offset = [], 0
+            with open(self.history_path, encoding='utf-8') as f:
+                f.seek(self._offset)
+                for line in f:
+                    if line.endswith('\n'):
+                        self._records.append(json.loads(line))
+                        self._offset += len(line.encode('utf-8'))
+            return list(self._records)
+
+    def chart_data(self, condition, column):
+        """One row per lot of `condition` with the value, moving range, EWMA, the limits applied and signals."""
+        rows = [
+            {'lot': record['lot'], 'timestamp': record['timestamp'], 'sensors': record['sensors'], **record['points'][column]}
+            for record in self.records() if record['condition'] == condition and column in record['points']
+        ]
+        return pd.DataFrame(rows)
+
+    def backups(self):
+        """Backup directories left by `reset`, oldest first."""
+        return sorted(glob.glob(f"{glob.escape(self.directory)}.backup-*"))
+
+    def reset(self):
+        """Starts a new history, keeping the old one as a timestamped backup directory.
+
+        Returns the backup path (None if there was nothing to keep); backups
+        beyond SPC_BACKUPS_KEPT are deleted, oldest first.
+        """
+        with self._lock:
+            backup = None
+            if os.path.isdir(self.directory):
+                backup = f"{self.directory}.backup-{datetime.datetime.now().strftime('%Y%m%d-%H%M%S-%f')}"
+                os.replace(self.directory, backup)
+            self._records, self._offset = [], 0
+            for old in self.backups()[:-SPC_BACKUPS_KEPT]:
+                shutil.rmtree(old, ignore_errors=True)
+            return backup
+
+# Global instance
+spc_history = SpcHistory()
@@ -0,0 +1,56 @@
+import numpy as np
+
+# Spatial-frequency bands in cycles per scoring window: low holds bow and
+# leftover wedge, mid and high the ripple left by the coating head
+ROUGHNESS_BANDS = {'low': (0.0, 2.0), 'mid': (2.0, 6.0), 'high': (6.0, np.inf)}
+
+# Roughness features per sensor: RMS thickness (μm) in each band and the
+# wavelength (mm) of the strongest component above the low band
+ROUGHNESS_COLUMNS = ['roughness_low', 'roughness_mid', 'roughness_high', 'ripple_wavelength']
+
+# Bounds on the uniform grid profiles are resampled onto before the FFT
+SPECTRUM_MIN_POINTS = 8
+SPECTRUM_MAX_POINTS = 256
+
+def spectrum_points(points_per_sensor):
+    """Grid size for the FFT: the typical number of points per sensor, within the bounds."""
+    typical = int(np.median(points_per_sensor)) if len(points_per_sensor) else SPECTRUM_MIN_POINTS
+    return int(np.clip(typical, SPECTRUM_MIN_POINTS, SPECTRUM_MAX_POINTS))
+
+def profile_spectra(resampled, spacing):
+    """One-sided power spectra of every row of a sensor × position matrix with a single rfft.
+
+    Each profile loses its least-squares line first (the wedge is already the
+    slope feature) and is Hann-tapered. Power is scaled so that a sensor's
+    spectrum sums to the mean square of its detrended profile, making band
+    powers μm² and their square roots RMS thickness. Returns (frequencies in
+    cycles/mm, power with one row per sensor).
+    """
+    n_points = resampled.shape[1]
+    t = np.arange(n_points) - (n_points - 1) / 2
+    centred = resampled - resampled.mean(axis=1, keepdims=True)
+    detrended = centred - np.outer(centred @ t / (t @ t), t)
+
+    taper = np.hanning(n_points + 2)[1:-1]
+    power = np.abs(np.fft.rfft(detrended * taper, axis=1)) ** 2 / (n_points * (taper @ taper))
+    # Fold the negative frequencies into the one-sided spectrum
+    power[:, 1:(n_points + 1) // 2] *= 2
+    return np.fft.rfftfreq(n_points, d=spacing), power
+
+def band_features(frequencies, power, length):
+    """ROUGHNESS_COLUMNS from spectra over a window `length` mm long."""
+    cycles = frequencies * length
+    features = {}
+    for band, (low, high) in ROUGHNESS_BANDS.items():
+        in_band = (cycles > low) & (cycles <= high)
+        # A band above the grid's Nyquist frequency is not resolved, rather than empty
+        features[f'roughness_{band}'] = np.sqrt(power[:, in_band].sum(axis=1)) if in_band.any() else np.full(len(power), np.nan)
+
+    ripple = cycles > ROUGHNESS_BANDS['low'][1]
+    if ripple.any():
+        peak = np.argmax(power[:, ripple], axis=1)
+        has_ripple = power[:, ripple].max(axis=1) > 0
+        features['ripple_wavelength'] = np.where(has_ripple, 1 / frequencies[ripple][peak], np.nan)
+    else:
+        features['ripple_wavelength'] = np.full(len(power), np.nan)
+    return features
@@ -0,0 +1,64 @@
+import hashlib
+from collections import OrderedDict
+import pandas as pd
+
+# Per-sensor score columns summarised for a lot
+SUMMARY_COLUMNS = ['mean_thickness', 'thickness_sd', 'thickness_range', 'r2_straightness', 'TUS', 'RUS']
+
+# Number of filtered-subset summaries kept per lot
+MAX_CACHED_SUBSETS = 32
+
+class LotSummary:
+    """Lot-level aggregates of the uniformity scores, computed once.
+
+    `stats` is a single `describe()` pass over the score columns (count, mean,
+    std, min, quartiles, max). Summaries of filtered subsets are cached per
+    filter key so the Results tab does not recompute them on every rerun.
+    """
+
+    def __init__(self, scores, columns=SUMMARY_COLUMNS, fingerprint=None):
+        self.columns = [col for col in columns if col in scores.columns]
+        self.count = len(scores)
+        self.fingerprint = fingerprint
+        if self.count and self.columns:
+            self.stats = scores[self.columns].describe(percentiles=[0.25, 0.5, 0.75])
+        else:
+            self.stats = pd.DataFrame(columns=self.columns)
+        self._subsets = OrderedDict()
+
+    def stat(self, column, name):
+        """Returns one statistic (e.g. 'mean', 'std', '50%') for a score column."""
+        if self.count == 0 or column not in self.stats.columns:
+            return float('nan')
+        return float(self.stats.at[name, column])
+
+    def mean(self, column):
+        return self.stat(column, 'mean')
+
+    def median(self, column):
+        return self.stat(column, '50%')
+
+    def for_subset(self, key, scores, positions):
+        """Returns the summary of `scores.iloc[positions]`, cached under `key`."""
+        if len(positions) == self.count:
+            return self
+        if key in self._subsets:
+            self._subsets.move_to_end(key)
+            return self._subsets[key]
+
+        subset = LotSummary(scores.iloc[positions], self.columns)
+        self._subsets[key] = subset
+        if len(self._subsets) > MAX_CACHED_SUBSETS:
+            self._subsets.popitem(last=False)
+        return subset
+
+def scores_fingerprint(scores):
+    """Returns a content hash identifying a scores frame (used as a cache key)."""
+    row_hashes = pd.util.hash_pandas_object(scores, index=False).to_numpy()
+    return hashlib.blake2b(row_hashes.tobytes(), digest_size=16).hexdigest()
+
+def summarize_scores(scores):
+    """Builds a LotSummary for a scores frame, or None when there are no scores."""
+    if not isinstance(scores, pd.DataFrame) or scores.empty:
+        return None
+    return LotSummary(scores, fingerprint=scores_fingerprint(scores))
@@ -0,0 +1,57 @@
+import numpy as np
+import pandas as pd
+from .scoring import DEFAULT_PROFILE, mean_penalty
+
+# Upper bound on (targets x sensors) elements evaluated per broadcast block
+SWEEP_BLOCK_ELEMENTS = 4_000_000
+
+# Default TUS a sensor must reach to count towards yield
+DEFAULT_YIELD_THRESHOLD = 0.7
+
+SWEEP_METRICS = {'mean_TUS': "Mean TUS", 'yield': "Yield"}
+
+def target_grid(low, high, step):
+    """Returns the grid of target means from `low` to `high` inclusive."""
+    if step <= 0 or high < low:
+        raise ValueError("Target range must have low <= high and a positive step.")
+    return np.round(np.arange(low, high + step / 2, step), 6)
+
+def sweep_targets(scores, scored_target, targets, yield_threshold=DEFAULT_YIELD_THRESHOLD, profile=None):
+    """Evaluates every sensor's TUS at every target mean without rescoring.
+
+    Only the mean penalty depends on the target, so the target-independent part
+    of TUS is recovered once from the cached scores (using the scoring profile's
+    weight and width) and the penalty is broadcast
+    over a (targets x sensors) grid, in blocks to bound memory.
+    Returns one row per target with the mean TUS and the yield (share of
+    sensors with TUS >= `yield_threshold`).
+    """
+    profile = profile or DEFAULT_PROFILE
+    weight = profile.tus_weights.get('mean_penalty', 0.0)
+    sigma = profile.mean_sigma
+    targets = np.asarray(targets, dtype=float)
+    means = scores[profile.level_column].to_numpy(dtype=float)
+    base = scores['TUS'].to_numpy(dtype=float) - weight * mean_penalty(means, scored_target, sigma)
+    valid = np.isfinite(means) & np.isfinite(base)
+    means, base = means[valid], base[valid]
+
+    mean_tus = np.full(len(targets), np.nan)
+    yields = np.full(len(targets), np.nan)
+    if len(means):
+        rows = max(1, SWEEP_BLOCK_ELEMENTS // len(means))
+        for start in range(0, len(targets), rows):
+            block = targets[start:start + rows, None]
+            tus = base + weight * mean_penalty(means, block, sigma)
+            mean_tus[start:start + rows] = tus.mean(axis=1)
+            yields[start:start + rows] = (tus >= yield_threshold).mean(axis=1)
+
+    return pd.DataFrame({'target_mean': targets, 'mean_TUS': mean_tus, 'yield': yields})
+
+def optimal_target(sweep, metric='mean_TUS'):
+    """Returns the sweep row with the best value of `metric`; ties go to the lowest target.
+
+    Returns None when no target has a value (no sensor with a finite score).
+    """
+    if sweep[metric].dropna().empty:
+        return None
+    return sweep.loc[sweep[metric].idxmax()]
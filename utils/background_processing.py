@@ -1,165 +1,206 @@
+import os
+import atexit
 import threading
 import time
-import base64
+import hashlib
+import tempfile
 import concurrent.futures
-import streamlit as st
-from utils.ui import fig_to_base64
-from utils.helpers import generate_lot_analysis_report_html, generate_simple_report_html
+from collections import OrderedDict
+from utils.image_export import image_export_pool, kaleido_available
+from utils.helpers import write_lot_analysis_report, write_static_lot_report
+
+# Finished report files kept on disk, shared between sessions by content hash
+MAX_CACHED_REPORTS = 8
+
+# Report variants: the interactive HTML report, or static reports with PNG/SVG charts
+REPORT_VARIANTS = ('interactive', 'png', 'svg')
+
+def report_cache_key(title, target_mean, input_filename, summary, variant='interactive', disposition=None):
+    """Returns a content hash identifying one lot report."""
+    fingerprint = summary.fingerprint if summary is not None else None
+    limits = disposition.limits.key if disposition is not None else None
+    return hashlib.blake2b(repr((title, target_mean, input_filename, fingerprint, variant, limits)).encode('utf-8'), digest_size=16).hexdigest()
+
+def _remove_file(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+def _report_path(future):
+    """The report file of a finished build, or None if it failed."""
+    return future.result() if future.exception() is None else None
 
 class BackgroundReportGenerator:
-    """Handles background generation of HTML reports with chart images."""
-    
+    """Handles background generation of lot reports, interactive or with static chart images.
+
+    Reports are written into temporary files and a build's Future returns the
+    file path, so the cache holds paths rather than whole documents; a download
+    reads the finished file into memory. Files are deleted when their build is
+    evicted and when the process exits.
+    """
+
     def __init__(self):
-        self.threads = {}
         self.progress = {}
-        self.completed_reports = {}
-    
-    def start_background_generation(self, analysis_type, title, scores_data, plot_objects, target_mean, input_filename):
-        """Start background generation of HTML report with chart images."""
-        thread_key = f"{analysis_type}_report"
-        
-        # If already processing, don't start again
-        if thread_key in self.threads and self.threads[thread_key].is_alive():
-            return
-        
-        # Initialize progress
-        self.progress[thread_key] = {
-            'status': 'Starting...',
-            'percentage': 0,
-            'completed': False,
-            'error': None,
-            'start_time': time.time()
-        }
-        
-        # Start background thread
-        thread = threading.Thread(
-            target=self._generate_report_with_images,
-            args=(thread_key, title, scores_data, plot_objects, target_mean, input_filename)
-        )
-        thread.daemon = True
-        thread.start()
-        self.threads[thread_key] = thread
-    
-    def _generate_report_with_images(self, thread_key, title, scores_data, plot_objects, target_mean, input_filename):
-        """Background function to generate report with chart images - OPTIMIZED VERSION."""
+        self.report_futures = OrderedDict()
+        self._report_lock = threading.Lock()
+        self._report_executor = concurrent.futures.ThreadPoolExecutor(max_workers=2, thread_name_prefix="report")
+        atexit.register(self._remove_files)
+
+    def submit_report(self, title, scores_data, plot_objects, target_mean, input_filename, summary=None, variant='interactive', disposition=None):
+        """Starts building a lot report in the background and returns its Future (resolving to the file path).
+
+        Reports are keyed by content hash: submitting the same lot again reuses
+        the running or finished build instead of starting a new one.
+        """
+        if variant not in REPORT_VARIANTS:
+            raise ValueError(f"Unknown report variant: {variant}")
+        key = report_cache_key(title, target_mean, input_filename, summary, variant, disposition)
+        with self._report_lock:
+            future = self.report_futures.get(key)
+            if future is not None and not (future.done() and future.exception() is not None):
+                self.report_futures.move_to_end(key)
+                return future
+
+            self.progress[key] = {
+                'status': 'Starting...',
+                'percentage': 0,
+                'completed': False,
+                'error': None,
+                'start_time': time.time()
+            }
+            if variant == 'interactive':
+                future = self._report_executor.submit(
+                    self._generate_interactive_report,
+                    key, title, scores_data, plot_objects, target_mean, input_filename, summary, disposition
+                )
+            else:
+                future = self._report_executor.submit(
+                    self._generate_report_with_images,
+                    key, title, scores_data, plot_objects, target_mean, input_filename, summary, variant, disposition
+                )
+            self.report_futures[key] = future
+
+            # Evict the oldest finished reports beyond the cache limit
+            for old_key in list(self.report_futures):
+                if len(self.report_futures) <= MAX_CACHED_REPORTS:
+                    break
+                if self.report_futures[old_key].done():
+                    path = _report_path(self.report_futures.pop(old_key))
+                    if path:
+                        _remove_file(path)
+                    self.progress.pop(old_key, None)
+            return future
+
+    def report_bytes(self, **request):
+        """Builds a report with `submit_report` (or reuses the cached build) and returns the file's contents.
+
+        Made for `st.download_button`'s data callable, which holds the whole
+        download in memory anyway.
+        """
+        for _ in range(2):
+            try:
+                with open(self.submit_report(**request).result(), 'rb') as f:
+                    return f.read()
+            except FileNotFoundError:
+                # Evicted between the build finishing and the read: build it again
+                continue
+        raise FileNotFoundError("The report file was removed before it could be read.")
+
+    def peek(self, key):
+        """Returns the running or finished build for a report key without starting one, or None."""
+        with self._report_lock:
+            future = self.report_futures.get(key)
+        if future is not None and future.done() and future.exception() is not None:
+            return None
+        return future
+
+    def _write_report_file(self, write, *args, **kwargs):
+        """Streams a report into a new temporary file with `write` and returns its path."""
+        fd, path = tempfile.mkstemp(prefix="lot_report_", suffix=".html")
+        try:
+            with open(fd, 'w', encoding='utf-8') as f:
+                write(f, *args, **kwargs)
+        except BaseException:
+            _remove_file(path)
+            raise
+        return path
+
+    def _generate_interactive_report(self, key, title, scores_data, plot_objects, target_mean, input_filename, summary, disposition=None):
+        """Background function to build the interactive HTML report."""
         try:
-            # Update progress
-            self.progress[thread_key]['status'] = 'Converting charts to images...'
-            self.progress[thread_key]['percentage'] = 10
-            
-            # OPTIMIZATION 1: Parallel chart conversion using ThreadPoolExecutor
-            chart_images = {}
-            valid_plots = {k: v for k, v in plot_objects.items() if v is not None}
-            
-            if valid_plots:
-                with concurrent.futures.ThreadPoolExecutor(max_workers=4) as executor:
-                    # Submit all chart conversion tasks simultaneously
-                    future_to_key = {
-                        executor.submit(self._fast_convert_figure, plot_fig, plot_key): plot_key 
-                        for plot_key, plot_fig in valid_plots.items()
-                    }
-                    
-                    completed = 0
-                    total_charts = len(valid_plots)
-                    
-                    for future in concurrent.futures.as_completed(future_to_key):
-                        plot_key = future_to_key[future]
-                        try:
-                            chart_images[plot_key] = future.result()
-                            completed += 1
-                            
-                            # Update progress with time estimation
-                            progress_percent = 10 + (completed * 70 // total_charts)
-                            elapsed = time.time() - self.progress[thread_key]['start_time']
-                            if completed > 0:
-                                estimated_total = elapsed * total_charts / completed
-                                remaining = max(0, estimated_total - elapsed)
-                                self.progress[thread_key]['status'] = f'Converted {completed}/{total_charts} charts... (~{remaining:.0f}s remaining)'
-                            else:
-                                self.progress[thread_key]['status'] = f'Converted {completed}/{total_charts} charts...'
-                            self.progress[thread_key]['percentage'] = progress_percent
-                            
-                        except Exception as e:
-                            chart_images[plot_key] = ""
-                            completed += 1
-            
-            # Generate final report
-            self.progress[thread_key]['status'] = 'Generating final report...'
-            self.progress[thread_key]['percentage'] = 90
-            
-            # Create plot objects dict with base64 images
-            plot_objects_with_images = {}
-            for key, fig in plot_objects.items():
-                if key in chart_images and chart_images[key]:
-                    plot_objects_with_images[key] = fig
-                else:
-                    plot_objects_with_images[key] = None
-            
-            # Generate the complete report
-            html_report = generate_lot_analysis_report_html(
-                title, scores_data, plot_objects_with_images, target_mean, input_filename
+            self.progress[key]['status'] = 'Generating report...'
+            path = self._write_report_file(
+                write_lot_analysis_report, title, scores_data, plot_objects, target_mean, input_filename,
+                summary=summary, disposition=disposition
             )
-            
-            # Store completed report
-            self.completed_reports[thread_key] = html_report
-            
-            # Mark as completed
-            self.progress[thread_key]['status'] = 'Report ready for download!'
-            self.progress[thread_key]['percentage'] = 100
-            self.progress[thread_key]['completed'] = True
-            
+            self._mark_completed(key)
+            return path
         except Exception as e:
-            self.progress[thread_key]['error'] = str(e)
-            self.progress[thread_key]['status'] = f'Error: {str(e)}'
-            self.progress[thread_key]['completed'] = True
-    
-    def _fast_convert_figure(self, fig, plot_key):
-        """OPTIMIZED: Fast figure conversion with smaller images and better kaleido usage."""
-        if fig is None:
-            return ""
-        
-        try:
-            import kaleido
-        except ImportError:
-            return ""
-        
+            self._mark_failed(key, e)
+            raise
+
+    def _generate_report_with_images(self, key, title, scores_data, plot_objects, target_mean, input_filename, summary, image_format, disposition=None):
+        """Background function to build a static report; charts are rendered in one batch by the image export pool."""
         try:
-            from io import BytesIO
-            
-            buf = BytesIO()
-            
-            # OPTIMIZATION 2: Smaller image sizes for faster processing
-            width = 800  # Reduced from 1000
-            height = fig.layout.height if fig.layout.height else 500  # Reduced from 600
-            
-            # OPTIMIZATION 3: Direct conversion without additional threading
-            fig.write_image(buf, format="png", width=width, height=height, engine="kaleido")
-            return base64.b64encode(buf.getvalue()).decode("utf-8")
-            
+            if not kaleido_available():
+                raise RuntimeError("Kaleido library not found. Please install it for static reports: `pip install kaleido`")
+
+            self.progress[key]['status'] = 'Converting charts to images...'
+            self.progress[key]['percentage'] = 10
+
+            plot_keys = [k for k, fig in plot_objects.items() if fig is not None]
+            images, figures_per_second = image_export_pool.convert(
+                [plot_objects[k] for k in plot_keys], fmt=image_format
+            )
+            chart_images = dict(zip(plot_keys, images))
+            self.progress[key]['figures_per_second'] = figures_per_second
+
+            self.progress[key]['status'] = f'Converted {sum(1 for i in images if i)}/{len(plot_keys)} charts ({figures_per_second:.1f} figures/s). Generating final report...'
+            self.progress[key]['percentage'] = 90
+
+            path = self._write_report_file(
+                write_static_lot_report, title, scores_data, chart_images, target_mean, input_filename,
+                summary=summary, image_format=image_format, disposition=disposition
+            )
+            self._mark_completed(key)
+            return path
         except Exception as e:
-            return ""
-    
-    def get_progress(self, analysis_type):
+            self._mark_failed(key, e)
+            raise
+
+    def _mark_completed(self, key):
+        progress = self.progress.get(key, {})
+        progress['status'] = 'Report ready for download!'
+        progress['percentage'] = 100
+        progress['completed'] = True
+
+    def _mark_failed(self, key, error):
+        progress = self.progress.get(key, {})
+        progress['error'] = str(error)
+        progress['status'] = f'Error: {str(error)}'
+        progress['completed'] = True
+
+    def get_progress(self, key):
         """Get progress of background report generation."""
-        thread_key = f"{analysis_type}_report"
-        return self.progress.get(thread_key, {
+        return self.progress.get(key, {
             'status': 'Not started',
             'percentage': 0,
             'completed': False,
             'error': None
         })
-    
-    def get_completed_report(self, analysis_type):
-        """Get completed report if available."""
-        thread_key = f"{analysis_type}_report"
-        return self.completed_reports.get(thread_key, None)
-    
-    def is_processing(self, analysis_type):
+
+    def _remove_files(self):
+        with self._report_lock:
+            for future in self.report_futures.values():
+                if future.done() and _report_path(future):
+                    _remove_file(future.result())
+
+    def is_processing(self, key):
         """Check if background processing is active."""
-        thread_key = f"{analysis_type}_report"
-        return (thread_key in self.threads and 
-                self.threads[thread_key].is_alive() and 
-                not self.progress.get(thread_key, {}).get('completed', False))
+        with self._report_lock:
+            future = self.report_futures.get(key)
+        return future is not None and not future.done()
 
 # Global instance
-background_generator = BackgroundReportGenerator() 
\ No newline at end of file
+background_generator = BackgroundReportGenerator()
@@ -1,453 +1,214 @@
+import io
+import html
 import pandas as pd
 import base64
 import datetime
 import streamlit.components.v1 as components
+from utils.report_figures import figure_div, plotly_bundle_html, plotly_script_html
+from utils.report_writer import write_scores_table, write_static_scores_table
+from utils import report_templates as templates
+
+# Report sections as (heading, [(plot heading, plot key), ...])
+REPORT_FIGURE_SECTIONS = [
+    ("📊 Score Distributions", [("TUS Distribution", 'TUS_dist'), ("RUS Distribution", 'RUS_dist')]),
+    ("📈 Thickness Profiles", [("TUS Profiles", 'TUS_profile'), ("RUS Profiles", 'RUS_profile')]),
+    ("〰️ Roughness", [("Average Roughness Spectrum", 'spectrum')]),
+]
+
+# MIME types for static images embedded as data URIs
+IMAGE_MIME_TYPES = {'png': 'image/png', 'svg': 'image/svg+xml'}
+
+def _report_summary(scores_data, summary):
+    """Returns the lot summary for a report, building it only if the caller has none."""
+    if summary is None:
+        from processing.summary import summarize_scores
+        summary = summarize_scores(scores_data)
+    return summary
+
+def _write_page_start(out, title, head_extra=""):
+    """Writes the document head (shared stylesheet) and the report header banner."""
+    out.write(templates.PAGE_START.render(raw=('head_extra',), title=title, head_extra=head_extra))
+    out.write(templates.PAGE_HEADER.render(
+        raw=('logo',), logo=templates.logo_img_html(), title=title,
+        generated=datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    ))
+
+def _write_metrics(out, summary, target_mean):
+    """Writes the summary metric cards."""
+    out.write(templates.METRICS_START)
+    for label, value in [
+        ("Total Sensors", summary.count),
+        ("Average Thickness", f"{round(summary.mean('mean_thickness'), 1)} μm"),
+        ("Average TUS", round(summary.mean('TUS'), 3)),
+        ("Average RUS", round(summary.mean('RUS'), 3)),
+        ("Target Mean", f"{target_mean} μm"),
+    ]:
+        out.write(templates.METRIC_CARD.render(label=label, value=value))
+    out.write(templates.METRICS_END)
+
+def _write_table(out, frame):
+    """Writes a small frame as a styled HTML table."""
+    out.write('<table class="styled-table"><thead><tr>')
+    out.write(''.join(f'<th>{html.escape(str(col))}</th>' for col in frame.columns))
+    out.write('</tr></thead><tbody>\n')
+    for row in frame.itertuples(index=False):
+        out.write('<tr>' + ''.join(f'<td>{html.escape(str(value))}</td>' for value in row) + '</tr>\n')
+    out.write('</tbody></table>\n')
+
+def _write_disposition_section(out, disposition):
+    """Writes the lot disposition: status and yield, per-lot yields, failure counts and failing sensors."""
+    if disposition is None:
+        return
+    from processing.disposition import LIMIT_COLUMNS, MAX_LISTED_FAILURES
+    out.write(templates.SECTION_START.render(heading="✅ Lot Disposition"))
+    out.write(templates.METRICS_START)
+    for label, value in [
+        ("Disposition", disposition.status),
+        ("Yield", f"{disposition.yield_:.1%}"),
+        ("Passed Sensors", f"{disposition.passed_count:,}"),
+        ("Failed Sensors", f"{disposition.count - disposition.passed_count:,}"),
+        ("Minimum Yield", f"{disposition.limits.min_yield:.0%}"),
+    ]:
+        out.write(templates.METRIC_CARD.render(label=label, value=value))
+    out.write(templates.METRICS_END)
+
+    limits = [(LIMIT_COLUMNS[col], "—" if low is None else f"{low:g}", "—" if high is None else f"{high:g}")
+              for col, (low, high) in disposition.limits.limits.items()]
+    if limits:
+        _write_table(out, pd.DataFrame(limits, columns=['Limit', 'Min', 'Max']))
+    if len(disposition.lots) > 1:
+        lots = disposition.lots.assign(**{'yield': disposition.lots['yield'].map('{:.1%}'.format)})
+        _write_table(out, lots)
+    failures = disposition.failure_counts[disposition.failure_counts > 0]
+    if not failures.empty:
+        _write_table(out, failures.sort_values(ascending=False).rename_axis('Failure').reset_index(name='Sensors'))
+        failing = disposition.failing()
+        out.write(f'<h3>Failing Sensors (first {min(len(failing), MAX_LISTED_FAILURES)})</h3>\n')
+        _write_table(out, failing.round(3))
+    out.write(templates.SECTION_END)
+
+def _write_scores_section(out, scores_data):
+    out.write(templates.SECTION_START.render(heading="📋 Detailed Results"))
+    write_scores_table(out, scores_data)
+    out.write(templates.SECTION_END)
+
+def generate_simple_report_html(title, scores_data, target_mean, input_filename, summary=None, disposition=None):
+    """
+    Generates a simple HTML report without plots, returned as one string.
+    """
+    out = io.StringIO()
+    write_simple_report(out, title, scores_data, target_mean, input_filename, summary, disposition)
+    return out.getvalue()
 
-def generate_simple_report_html(title, scores_data, target_mean, input_filename):
+def write_simple_report(out, title, scores_data, target_mean, input_filename, summary=None, disposition=None):
     """
-    Generates a simple HTML report without plots.
+    Streams a simple HTML report without plots into the text stream `out`.
     """
+    _write_page_start(out, title)
     if not isinstance(scores_data, pd.DataFrame) or scores_data.empty:
-        return f"""
-        <!DOCTYPE html>
-        <html>
-        <head>
-            <title>{title}</title>
-            <style>
-                body {{ font-family: Arial, sans-serif; margin: 40px; }}
-                .header {{ background-color: #D95D39; color: white; padding: 20px; text-align: center; }}
-                .content {{ padding: 20px; }}
-            </style>
-        </head>
-        <body>
-            <div class="header">
-                <h1>{title}</h1>
-                <p>Generated on {datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')}</p>
-            </div>
-            <div class="content">
-                <h2>No Data Available</h2>
-                <p>No analysis data was found for this report.</p>
-            </div>
-        </body>
-        </html>
-        """
-
-    # Encode logo
-    logo_base64 = ""
-    try:
-        with open("logo.png", "rb") as f:
-            logo_base64 = base64.b64encode(f.read()).decode("utf-8")
-    except FileNotFoundError:
-        logo_base64 = ""
-
-    # Calculate summary statistics
-    total_sensors = len(scores_data)
-    avg_tus = round(scores_data['TUS'].mean(), 3)
-    avg_rus = round(scores_data['RUS'].mean(), 3)
-    avg_thickness = round(scores_data['mean_thickness'].mean(), 1)
-
-    # Create scores table HTML
-    scores_table_html = scores_data.round(3).to_html(classes='styled-table', index=False)
-
-    html_content = f"""
-    <!DOCTYPE html>
-    <html lang="en">
-    <head>
-        <meta charset="UTF-8">
-        <meta name="viewport" content="width=device-width, initial-scale=1.0">
-        <title>{title}</title>
-        <link href="https://fonts.googleapis.com/css2?family=Inter:wght@400;600;700&display=swap" rel="stylesheet">
-        <style>
-            body {{
-                font-family: 'Inter', sans-serif;
-                background-color: #F8F9FA;
-                color: #333333;
-                margin: 0;
-                padding: 20px;
-            }}
-            .container {{
-                max-width: 1200px;
-                margin: 0 auto;
-                background-color: #FFFFFF;
-                border-radius: 12px;
-                box-shadow: 0 8px 24px rgba(0,0,0,0.05);
-                padding: 40px;
-            }}
-            .header {{
-                position: relative;
-                background: linear-gradient(90deg, #D95D39, #4A0E1A);
-                color: #FFFFFF;
-                padding: 30px;
-                border-radius: 12px 12px 0 0;
-                text-align: center;
-                margin: -40px -40px 40px -40px;
-            }}
-            .header h1 {{
-                margin: 0;
-                font-size: 2.5em;
-            }}
-            .header p {{
-                margin: 5px 0 0;
-                font-size: 1.1em;
-                opacity: 0.9;
-            }}
-            .header .logo {{
-                position: absolute;
-                left: 40px;
-                top: 50%;
-                transform: translateY(-50%);
-                height: 50px;
-            }}
-            .metrics-grid {{
-                display: grid;
-                grid-template-columns: repeat(auto-fit, minmax(200px, 1fr));
-                gap: 20px;
-                margin-bottom: 40px;
-            }}
-            .metric-card {{
-                background-color: #F8F9FA;
-                border: 1px solid #EAECEF;
-                border-radius: 12px;
-                padding: 20px;
-                text-align: center;
-            }}
-            .metric-card h3 {{
-                margin: 0 0 10px 0;
-                font-size: 1em;
-                color: #5A6474;
-                font-weight: 600;
-            }}
-            .metric-card h2 {{
-                margin: 0;
-                font-size: 2em;
-                color: #D95D39;
-                font-weight: 700;
-            }}
-            .section {{
-                margin-bottom: 40px;
-            }}
-            .section h2 {{
-                color: #4A0E1A;
-                border-bottom: 2px solid #D95D39;
-                padding-bottom: 10px;
-                margin-bottom: 20px;
-            }}
-            .styled-table {{
-                width: 100%;
-                border-collapse: collapse;
-                margin-bottom: 20px;
-                background-color: #FFFFFF;
-                border-radius: 8px;
-                overflow: hidden;
-                box-shadow: 0 2px 8px rgba(0,0,0,0.1);
-            }}
-            .styled-table th {{
-                background-color: #4A0E1A;
-                color: #FFFFFF;
-                padding: 12px;
-                text-align: left;
-                font-weight: 600;
-            }}
-            .styled-table td {{
-                padding: 12px;
-                border-bottom: 1px solid #EAECEF;
-            }}
-            .styled-table tr:hover {{
-                background-color: #F8F9FA;
-            }}
-            .footer {{
-                text-align: center;
-                color: #5A6474;
-                margin-top: 40px;
-                padding-top: 20px;
-                border-top: 1px solid #EAECEF;
-            }}
-        </style>
-    </head>
-    <body>
-        <div class="container">
-            <div class="header">
-                {f'<img src="data:image/png;base64,{logo_base64}" alt="Logo" class="logo">' if logo_base64 else ''}
-                <h1>{title}</h1>
-                <p>Generated on {datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')}</p>
-            </div>
-
-            <div class="metrics-grid">
-                <div class="metric-card">
-                    <h3>Total Sensors</h3>
-                    <h2>{total_sensors}</h2>
-                </div>
-                <div class="metric-card">
-                    <h3>Average Thickness</h3>
-                    <h2>{avg_thickness} μm</h2>
-                </div>
-                <div class="metric-card">
-                    <h3>Average TUS</h3>
-                    <h2>{avg_tus}</h2>
-                </div>
-                <div class="metric-card">
-                    <h3>Average RUS</h3>
-                    <h2>{avg_rus}</h2>
-                </div>
-                <div class="metric-card">
-                    <h3>Target Mean</h3>
-                    <h2>{target_mean} μm</h2>
-                </div>
-            </div>
-
-            <div class="section">
-                <h2>📊 Detailed Results</h2>
-                {scores_table_html}
-            </div>
+        out.write(templates.NO_DATA)
+    else:
+        # Summary statistics (precomputed by the caller when available)
+        _write_metrics(out, _report_summary(scores_data, summary), target_mean)
+        _write_disposition_section(out, disposition)
+        _write_scores_section(out, scores_data)
+    out.write(templates.PAGE_END.render(input_filename=input_filename))
+
+def generate_lot_analysis_report_html(title, scores_data, plot_objects, target_mean, input_filename, summary=None, compress_figures=True, disposition=None):
+    """
+    Generates a self-contained HTML report with embedded interactive plots, returned as one string.
 
-            <div class="footer">
-                <p>Report generated from: {input_filename}</p>
-                <p>Thickness Uniformity Analysis System</p>
-            </div>
-        </div>
-    </body>
-    </html>
+    The app streams reports into files with `write_lot_analysis_report` instead;
+    this wrapper holds the whole document in memory.
     """
-    return html_content
+    out = io.StringIO()
+    write_lot_analysis_report(out, title, scores_data, plot_objects, target_mean, input_filename, summary, compress_figures, disposition)
+    return out.getvalue()
 
-def generate_lot_analysis_report_html(title, scores_data, plot_objects, target_mean, input_filename):
+def write_lot_analysis_report(out, title, scores_data, plot_objects, target_mean, input_filename, summary=None, compress_figures=True, disposition=None, plotly_src=None):
     """
-    OPTIMIZED: Generates HTML report with embedded interactive plots (no image conversion needed).
+    Streams the full lot report into the text stream `out` (a buffer or an open file).
+
+    The page is written section by section and the scores table chunk by chunk,
+    so when `out` is a file no single string holds the whole report. With
+    `plotly_src` the report loads Plotly.js from that URL (e.g. a file shipped
+    alongside it) instead of inlining the bundle.
     """
     if not isinstance(scores_data, pd.DataFrame) or scores_data.empty:
-        return generate_simple_report_html(title, scores_data, target_mean, input_filename)
+        return write_simple_report(out, title, scores_data, target_mean, input_filename, summary, disposition)
 
-    # Encode logo
-    logo_base64 = ""
+    # Figures are embedded as compressed, binary-encoded JSON and drawn by one
+    # shared Plotly.js bundle (inlined unless plotly_src is given), so reports
+    # stay small and work offline.
     try:
-        with open("logo.png", "rb") as f:
-            logo_base64 = base64.b64encode(f.read()).decode("utf-8")
-    except FileNotFoundError:
-        logo_base64 = ""
-
-    total_sensors = len(scores_data)
-    avg_tus = round(scores_data['TUS'].mean(), 3)
-    avg_rus = round(scores_data['RUS'].mean(), 3)
-    avg_thickness = round(scores_data['mean_thickness'].mean(), 1)
-
-    # OPTIMIZATION: Convert plots to HTML directly (no image conversion!)
-    try:
-        tus_dist_html = plot_objects.get('TUS_dist').to_html(include_plotlyjs='cdn', div_id='tus-dist-plot') if plot_objects.get('TUS_dist') else '<p>Chart not available</p>'
-        rus_dist_html = plot_objects.get('RUS_dist').to_html(include_plotlyjs=False, div_id='rus-dist-plot') if plot_objects.get('RUS_dist') else '<p>Chart not available</p>'
-        tus_profile_html = plot_objects.get('TUS_profile').to_html(include_plotlyjs=False, div_id='tus-profile-plot') if plot_objects.get('TUS_profile') else '<p>Chart not available</p>'
-        rus_profile_html = plot_objects.get('RUS_profile').to_html(include_plotlyjs=False, div_id='rus-profile-plot') if plot_objects.get('RUS_profile') else '<p>Chart not available</p>'
+        figure_html = {}
+        for _, plots in REPORT_FIGURE_SECTIONS:
+            for _, key in plots:
+                fig = plot_objects.get(key)
+                div_id = f"{key.lower().replace('_', '-')}-plot"
+                figure_html[key] = figure_div(fig, div_id, compress=compress_figures) if fig is not None else '<p>Chart not available</p>'
+        plotly_bundle = plotly_script_html(plotly_src) if plotly_src else plotly_bundle_html()
     except Exception:
         # If plot conversion fails, fall back to simple report
-        return generate_simple_report_html(title, scores_data, target_mean, input_filename)
-    
-    # Create scores table HTML
-    scores_table_html = scores_data.round(3).to_html(classes='styled-table', index=False)
-
-    html_content = f"""
-    <!DOCTYPE html>
-    <html lang="en">
-    <head>
-        <meta charset="UTF-8">
-        <meta name="viewport" content="width=device-width, initial-scale=1.0">
-        <title>{title}</title>
-        <link href="https://fonts.googleapis.com/css2?family=Inter:wght@400;600;700&display=swap" rel="stylesheet">
-        <style>
-            body {{
-                font-family: 'Inter', sans-serif;
-                background-color: #F8F9FA;
-                color: #333333;
-                margin: 0;
-                padding: 20px;
-            }}
-            .container {{
-                max-width: 1200px;
-                margin: 0 auto;
-                background-color: #FFFFFF;
-                border-radius: 12px;
-                box-shadow: 0 8px 24px rgba(0,0,0,0.05);
-                padding: 40px;
-            }}
-            .header {{
-                position: relative;
-                background: linear-gradient(90deg, #D95D39, #4A0E1A);
-                color: #FFFFFF;
-                padding: 30px;
-                border-radius: 12px 12px 0 0;
-                text-align: center;
-                margin: -40px -40px 40px -40px;
-            }}
-            .header h1 {{
-                margin: 0;
-                font-size: 2.5em;
-            }}
-            .header p {{
-                margin: 5px 0 0;
-                font-size: 1.1em;
-                opacity: 0.9;
-            }}
-            .header .logo {{
-                position: absolute;
-                left: 40px;
-                top: 50%;
-                transform: translateY(-50%);
-                height: 50px;
-            }}
-            .metrics-grid {{
-                display: grid;
-                grid-template-columns: repeat(auto-fit, minmax(200px, 1fr));
-                gap: 20px;
-                margin-bottom: 40px;
-            }}
-            .metric-card {{
-                background-color: #F8F9FA;
-                border: 1px solid #EAECEF;
-                border-radius: 12px;
-                padding: 20px;
-                text-align: center;
-            }}
-            .metric-card h3 {{
-                margin: 0 0 10px 0;
-                font-size: 1em;
-                color: #5A6474;
-                font-weight: 600;
-            }}
-            .metric-card h2 {{
-                margin: 0;
-                font-size: 2em;
-                color: #D95D39;
-                font-weight: 700;
-            }}
-            .section {{
-                margin-bottom: 40px;
-            }}
-            .section h2 {{
-                color: #4A0E1A;
-                border-bottom: 2px solid #D95D39;
-                padding-bottom: 10px;
-                margin-bottom: 20px;
-            }}
-            .plot-container {{
-                background-color: #FFFFFF;
-                border: 1px solid #EAECEF;
-                border-radius: 12px;
-                padding: 20px;
-                margin-bottom: 30px;
-                box-shadow: 0 2px 8px rgba(0,0,0,0.05);
-            }}
-            .plot-container h3 {{
-                margin: 0 0 15px 0;
-                color: #4A0E1A;
-                font-size: 1.3em;
-            }}
-            .styled-table {{
-                width: 100%;
-                border-collapse: collapse;
-                margin-bottom: 20px;
-                background-color: #FFFFFF;
-                border-radius: 8px;
-                overflow: hidden;
-                box-shadow: 0 2px 8px rgba(0,0,0,0.1);
-            }}
-            .styled-table th {{
-                background-color: #4A0E1A;
-                color: #FFFFFF;
-                padding: 12px;
-                text-align: left;
-                font-weight: 600;
-            }}
-            .styled-table td {{
-                padding: 12px;
-                border-bottom: 1px solid #EAECEF;
-            }}
-            .styled-table tr:hover {{
-                background-color: #F8F9FA;
-            }}
-            .footer {{
-                text-align: center;
-                color: #5A6474;
-                margin-top: 40px;
-                padding-top: 20px;
-                border-top: 1px solid #EAECEF;
-            }}
-        </style>
-    </head>
-    <body>
-        <div class="container">
-            <div class="header">
-                {f'<img src="data:image/png;base64,{logo_base64}" alt="Logo" class="logo">' if logo_base64 else ''}
-                <h1>{title}</h1>
-                <p>Generated on {datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')}</p>
-            </div>
+        return write_simple_report(out, title, scores_data, target_mean, input_filename, summary, disposition)
 
-            <div class="metrics-grid">
-                <div class="metric-card">
-                    <h3>Total Sensors</h3>
-                    <h2>{total_sensors}</h2>
-                </div>
-                <div class="metric-card">
-                    <h3>Average Thickness</h3>
-                    <h2>{avg_thickness} μm</h2>
-                </div>
-                <div class="metric-card">
-                    <h3>Average TUS</h3>
-                    <h2>{avg_tus}</h2>
-                </div>
-                <div class="metric-card">
-                    <h3>Average RUS</h3>
-                    <h2>{avg_rus}</h2>
-                </div>
-                <div class="metric-card">
-                    <h3>Target Mean</h3>
-                    <h2>{target_mean} μm</h2>
-                </div>
-            </div>
+    _write_page_start(out, title, head_extra=plotly_bundle)
+    _write_metrics(out, _report_summary(scores_data, summary), target_mean)
+    _write_disposition_section(out, disposition)
 
-            <div class="section">
-                <h2>📊 Score Distributions</h2>
-                
-                <div class="plot-container">
-                    <h3>TUS Distribution</h3>
-                    {tus_dist_html}
-                </div>
-                
-                <div class="plot-container">
-                    <h3>RUS Distribution</h3>
-                    {rus_dist_html}
-                </div>
-            </div>
+    for section_title, plots in REPORT_FIGURE_SECTIONS:
+        out.write(templates.SECTION_START.render(heading=section_title))
+        for plot_title, key in plots:
+            out.write(templates.PLOT_START.render(heading=plot_title))
+            out.write(figure_html[key])
+            out.write(templates.PLOT_END)
+        out.write(templates.SECTION_END)
 
-            <div class="section">
-                <h2>📈 Thickness Profiles</h2>
-                
-                <div class="plot-container">
-                    <h3>TUS Profiles</h3>
-                    {tus_profile_html}
-                </div>
-                
-                <div class="plot-container">
-                    <h3>RUS Profiles</h3>
-                    {rus_profile_html}
-                </div>
-            </div>
+    _write_scores_section(out, scores_data)
+    out.write(templates.PAGE_END.render(input_filename=input_filename))
 
-            <div class="section">
-                <h2>📋 Detailed Results</h2>
-                {scores_table_html}
-            </div>
+def generate_static_lot_report_html(title, scores_data, plot_images, target_mean, input_filename, summary=None, image_format='png', disposition=None):
+    """
+    Generates a script-free HTML report with pre-rendered chart images, returned as one string.
+    """
+    out = io.StringIO()
+    write_static_lot_report(out, title, scores_data, plot_images, target_mean, input_filename, summary, image_format, disposition)
+    return out.getvalue()
 
-            <div class="footer">
-                <p>Report generated from: {input_filename}</p>
-                <p>Thickness Uniformity Analysis System</p>
-            </div>
-        </div>
-    </body>
-    </html>
+def write_static_lot_report(out, title, scores_data, plot_images, target_mean, input_filename, summary=None, image_format='png', disposition=None):
     """
-    return html_content
+    Streams a static lot report into `out`: charts are embedded images and the
+    scores are a plain HTML table, so the file opens instantly in email clients
+    and archives with no JavaScript.
+    """
+    if not isinstance(scores_data, pd.DataFrame) or scores_data.empty:
+        return write_simple_report(out, title, scores_data, target_mean, input_filename, summary, disposition)
+
+    _write_page_start(out, title)
+    _write_metrics(out, _report_summary(scores_data, summary), target_mean)
+    _write_disposition_section(out, disposition)
+
+    mime = IMAGE_MIME_TYPES[image_format]
+    for section_title, plots in REPORT_FIGURE_SECTIONS:
+        out.write(templates.SECTION_START.render(heading=section_title))
+        for plot_title, key in plots:
+            out.write(templates.PLOT_START.render(heading=plot_title))
+            image = plot_images.get(key)
+            if image:
+                out.write(f'<img src="data:{mime};base64,{base64.b64encode(image).decode("ascii")}" alt="{plot_title}" style="width: 100%;">')
+            else:
+                out.write('<p>Chart not available</p>')
+            out.write(templates.PLOT_END)
+        out.write(templates.SECTION_END)
+
+    out.write(templates.SECTION_START.render(heading="📋 Detailed Results"))
+    write_static_scores_table(out, scores_data)
+    out.write(templates.SECTION_END)
+    out.write(templates.PAGE_END.render(input_filename=input_filename))
 
 def create_download_link_html(html_content, filename):
     """Generates a link to download the HTML report."""
     b64 = base64.b64encode(html_content.encode('utf-8')).decode('utf-8')
     filename = f"{filename.replace(' ', '_')}_{datetime.date.today().strftime('%Y%m%d')}.html"
     href = f'<a href="data:file/html;base64,{b64}" download="{filename}">Download Report</a>'
-    return href 
\ No newline at end of file
+    return href
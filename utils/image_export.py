@@ -0,0 +1,121 @@
+import atexit
+import json
+import multiprocessing
+import os
+import threading
+import time
+import concurrent.futures
+
+# Static image formats the export pool can produce
+IMAGE_FORMATS = ('png', 'svg', 'pdf')
+
+DEFAULT_IMAGE_WIDTH = 800
+DEFAULT_IMAGE_HEIGHT = 500
+
+# Kaleido scope held by each worker process for its whole lifetime
+_worker_scope = None
+
+def _init_worker():
+    """Starts one Kaleido renderer per worker and warms it with a blank figure."""
+    global _worker_scope
+    import plotly.io as pio
+
+    # plotly.io's scope points Kaleido at the bundled plotly.js rather than a CDN
+    _worker_scope = pio.kaleido.scope
+    _worker_scope.mathjax = False
+    _worker_scope.transform({'data': [], 'layout': {}}, format='png', width=10, height=10)
+
+def _convert_batch(fig_jsons, fmt, width, height, scale):
+    """Converts a batch of figure JSON strings in the worker's warm renderer."""
+    images = []
+    for fig_json in fig_jsons:
+        fig_dict = json.loads(fig_json)
+        fig_height = height or fig_dict.get('layout', {}).get('height') or DEFAULT_IMAGE_HEIGHT
+        images.append(_worker_scope.transform(fig_dict, format=fmt, width=width, height=fig_height, scale=scale))
+    return images
+
+class ImageExportPool:
+    """Long-lived worker processes that keep Kaleido renderers warm.
+
+    Each worker pays the Chromium startup cost once; figures are then sent in
+    batches, spread across the workers, instead of one `write_image` per figure.
+    """
+
+    def __init__(self, max_workers=None):
+        self.max_workers = max_workers or max(1, min(2, os.cpu_count() or 1))
+        self._executor = None
+        self._lock = threading.Lock()
+        self.stats = {'figures': 0, 'seconds': 0.0}
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                # 'spawn' keeps workers independent of the (threaded) Streamlit server process
+                self._executor = concurrent.futures.ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=multiprocessing.get_context('spawn'),
+                    initializer=_init_worker
+                )
+            return self._executor
+
+    def convert(self, figures, fmt='png', width=DEFAULT_IMAGE_WIDTH, height=None, scale=1):
+        """Converts figures to image bytes, preserving order; failed figures come back as b"".
+
+        Returns (images, throughput) where throughput is in figures per second.
+        """
+        if fmt not in IMAGE_FORMATS:
+            raise ValueError(f"Unsupported image format: {fmt}")
+        figures = list(figures)
+        if not figures:
+            return [], 0.0
+
+        start = time.perf_counter()
+        fig_jsons = [fig.to_json() if fig is not None else None for fig in figures]
+        present = [i for i, fig_json in enumerate(fig_jsons) if fig_json is not None]
+
+        # One batch per worker, interleaved so large and small figures spread evenly
+        n_batches = min(self.max_workers, len(present)) or 1
+        batches = [present[i::n_batches] for i in range(n_batches)]
+        executor = self._get_executor()
+        futures = {
+            executor.submit(_convert_batch, [fig_jsons[i] for i in batch], fmt, width, height, scale): batch
+            for batch in batches if batch
+        }
+
+        images = [b""] * len(figures)
+        for future in concurrent.futures.as_completed(futures):
+            try:
+                for i, image in zip(futures[future], future.result()):
+                    images[i] = image
+            except Exception:
+                pass
+
+        elapsed = time.perf_counter() - start
+        converted = sum(1 for image in images if image)
+        with self._lock:
+            self.stats['figures'] += converted
+            self.stats['seconds'] += elapsed
+        return images, (converted / elapsed if elapsed > 0 else 0.0)
+
+    def throughput(self):
+        """Average figures per second over the pool's lifetime."""
+        with self._lock:
+            return self.stats['figures'] / self.stats['seconds'] if self.stats['seconds'] else 0.0
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+def kaleido_available():
+    """Returns True if the Kaleido static-image engine is installed."""
+    try:
+        import kaleido  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+# Global instance
+image_export_pool = ImageExportPool()
+atexit.register(image_export_pool.shutdown)
@@ -0,0 +1,132 @@
+import base64
+import json
+import zlib
+from functools import lru_cache
+
+import numpy as np
+from plotly.offline import get_plotlyjs
+from plotly.utils import PlotlyJSONEncoder
+
+# Numeric arrays shorter than this stay as plain JSON lists
+MIN_TYPED_ARRAY_LENGTH = 8
+
+# Client-side loader. The Plotly.js bundle ships deflated and base64-encoded;
+# it is inflated once in the browser and every figure waits for it. Figure
+# payloads are inflated the same way and {dtype, bdata} specs are turned back
+# into typed arrays before plotting.
+_FIGURE_LOADER_JS = """
+<script>
+(function () {
+    const TYPED = {f8: Float64Array, f4: Float32Array, i4: Int32Array, i2: Int16Array, i1: Int8Array,
+                   u4: Uint32Array, u2: Uint16Array, u1: Uint8Array};
+    function b64ToBytes(b64) {
+        const bin = atob(b64);
+        const bytes = new Uint8Array(bin.length);
+        for (let i = 0; i < bin.length; i++) bytes[i] = bin.charCodeAt(i);
+        return bytes;
+    }
+    function revive(node) {
+        if (Array.isArray(node)) return node.map(revive);
+        if (node && typeof node === 'object') {
+            if (typeof node.bdata === 'string' && TYPED[node.dtype]) {
+                return new TYPED[node.dtype](b64ToBytes(node.bdata).buffer);
+            }
+            for (const key in node) node[key] = revive(node[key]);
+        }
+        return node;
+    }
+    async function inflate(b64) {
+        const stream = new Blob([b64ToBytes(b64)]).stream().pipeThrough(new DecompressionStream('deflate'));
+        return await new Response(stream).text();
+    }
+    window.savaPlotlyReady = (async function () {
+        if (window.Plotly) return;
+        const bundle = document.getElementById('sava-plotly-bundle');
+        if (!bundle) throw new Error('Plotly.js could not be loaded: keep this report next to plotly.min.js');
+        const source = await inflate(bundle.textContent.trim());
+        const script = document.createElement('script');
+        script.src = URL.createObjectURL(new Blob([source], {type: 'text/javascript'}));
+        await new Promise(function (resolve, reject) {
+            script.onload = resolve;
+            script.onerror = reject;
+            document.head.appendChild(script);
+        });
+    })();
+    window.savaRenderFigure = async function (divId) {
+        const holder = document.getElementById(divId + '-data');
+        const text = holder.dataset.compressed === '1' ? await inflate(holder.textContent.trim()) : holder.textContent;
+        const fig = revive(JSON.parse(text));
+        await window.savaPlotlyReady;
+        Plotly.newPlot(divId, fig.data, fig.layout || {}, {responsive: true, displaylogo: false});
+    };
+})();
+</script>
+"""
+
+def _typed_array(values):
+    """Returns a {dtype, bdata} spec for a numeric sequence, or None if it isn't one."""
+    if isinstance(values, np.ndarray):
+        arr = values
+    elif isinstance(values, (list, tuple)) and len(values) >= MIN_TYPED_ARRAY_LENGTH:
+        if not all(isinstance(v, (int, float, np.number)) and not isinstance(v, bool) for v in values):
+            return None
+        arr = np.asarray(values)
+    else:
+        return None
+
+    if arr.ndim != 1 or len(arr) < MIN_TYPED_ARRAY_LENGTH:
+        return None
+    if arr.dtype.kind == 'f':
+        arr = arr.astype('<f8', copy=False)
+        dtype = 'f8'
+    elif arr.dtype.kind in 'iu' and np.abs(arr).max(initial=0) < 2**31:
+        arr = arr.astype('<i4', copy=False)
+        dtype = 'i4'
+    else:
+        return None
+    return {'dtype': dtype, 'bdata': base64.b64encode(arr.tobytes()).decode('ascii')}
+
+def _encode_arrays(node):
+    """Recursively replaces numeric arrays in a figure dict with base64 typed arrays."""
+    if isinstance(node, (str, int, float)):
+        return node
+    if isinstance(node, dict):
+        return {key: _encode_arrays(value) for key, value in node.items()}
+    if isinstance(node, (list, tuple, np.ndarray)):
+        typed = _typed_array(node)
+        if typed is not None:
+            return typed
+        return [_encode_arrays(value) for value in node]
+    return node
+
+def encode_figure(fig, compress=True):
+    """Serializes a Plotly figure with binary-encoded arrays, optionally deflated and base64'd."""
+    payload = json.dumps(_encode_arrays(fig.to_plotly_json()), cls=PlotlyJSONEncoder, separators=(',', ':'))
+    if not compress:
+        return payload
+    return base64.b64encode(zlib.compress(payload.encode('utf-8'), 6)).decode('ascii')
+
+def figure_div(fig, div_id, compress=True):
+    """Returns the HTML for one figure: an empty div, its encoded data and the render call."""
+    payload = encode_figure(fig, compress)
+    if not compress:
+        # Keep '</script>' inside string values from closing the data block
+        payload = payload.replace('</', '<\\/')
+    return (
+        f'<div id="{div_id}" class="plotly-graph-div"></div>\n'
+        f'<script type="application/json" id="{div_id}-data" data-compressed="{1 if compress else 0}">{payload}</script>\n'
+        f'<script>savaRenderFigure("{div_id}");</script>'
+    )
+
+def plotly_script_html(src):
+    """Returns a script tag loading Plotly.js from `src` plus the figure loader, for reports shipped next to the bundle."""
+    return f'<script src="{src}"></script>\n{_FIGURE_LOADER_JS}'
+
+@lru_cache(maxsize=1)
+def plotly_bundle_html():
+    """Returns the deflated Plotly.js bundle and figure loader, inlined once per report."""
+    bundle = base64.b64encode(zlib.compress(get_plotlyjs().encode('utf-8'), 9)).decode('ascii')
+    return (
+        f'<script type="application/octet-stream" id="sava-plotly-bundle">{bundle}</script>\n'
+        f'{_FIGURE_LOADER_JS}'
+    )
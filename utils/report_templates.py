@@ -0,0 +1,193 @@
+import base64
+import html
+import os
+from functools import lru_cache
+from string import Formatter
+
+from utils.report_writer import SCORES_TABLE_CSS
+
+LOGO_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "logo.png")
+
+# Inter is used when installed locally; reports never fetch fonts over the network
+FONT_STACK = "'Inter', -apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto, Helvetica, Arial, sans-serif"
+
+# Shared stylesheet for the simple and full lot reports
+REPORT_CSS = """
+body {
+    font-family: %(font_stack)s;
+    background-color: #F8F9FA;
+    color: #333333;
+    margin: 0;
+    padding: 20px;
+}
+.container {
+    max-width: 1200px;
+    margin: 0 auto;
+    background-color: #FFFFFF;
+    border-radius: 12px;
+    box-shadow: 0 8px 24px rgba(0,0,0,0.05);
+    padding: 40px;
+}
+.header {
+    position: relative;
+    background: linear-gradient(90deg, #D95D39, #4A0E1A);
+    color: #FFFFFF;
+    padding: 30px;
+    border-radius: 12px 12px 0 0;
+    text-align: center;
+    margin: -40px -40px 40px -40px;
+}
+.header h1 { margin: 0; font-size: 2.5em; }
+.header p { margin: 5px 0 0; font-size: 1.1em; opacity: 0.9; }
+.header .logo {
+    position: absolute;
+    left: 40px;
+    top: 50%%;
+    transform: translateY(-50%%);
+    height: 50px;
+}
+.metrics-grid {
+    display: grid;
+    grid-template-columns: repeat(auto-fit, minmax(200px, 1fr));
+    gap: 20px;
+    margin-bottom: 40px;
+}
+.metric-card {
+    background-color: #F8F9FA;
+    border: 1px solid #EAECEF;
+    border-radius: 12px;
+    padding: 20px;
+    text-align: center;
+}
+.metric-card h3 { margin: 0 0 10px 0; font-size: 1em; color: #5A6474; font-weight: 600; }
+.metric-card h2 { margin: 0; font-size: 2em; color: #D95D39; font-weight: 700; }
+.section { margin-bottom: 40px; }
+.section h2 {
+    color: #4A0E1A;
+    border-bottom: 2px solid #D95D39;
+    padding-bottom: 10px;
+    margin-bottom: 20px;
+}
+.plot-container {
+    background-color: #FFFFFF;
+    border: 1px solid #EAECEF;
+    border-radius: 12px;
+    padding: 20px;
+    margin-bottom: 30px;
+    box-shadow: 0 2px 8px rgba(0,0,0,0.05);
+}
+.plot-container h3 { margin: 0 0 15px 0; color: #4A0E1A; font-size: 1.3em; }
+.styled-table {
+    width: 100%%;
+    border-collapse: collapse;
+    margin-bottom: 20px;
+    background-color: #FFFFFF;
+    border-radius: 8px;
+    overflow: hidden;
+    box-shadow: 0 2px 8px rgba(0,0,0,0.1);
+}
+.styled-table th {
+    background-color: #4A0E1A;
+    color: #FFFFFF;
+    padding: 12px;
+    text-align: left;
+    font-weight: 600;
+}
+.styled-table td { padding: 12px; border-bottom: 1px solid #EAECEF; }
+.styled-table tr:hover { background-color: #F8F9FA; }
+.footer {
+    text-align: center;
+    color: #5A6474;
+    margin-top: 40px;
+    padding-top: 20px;
+    border-top: 1px solid #EAECEF;
+}
+""" % {'font_stack': FONT_STACK} + SCORES_TABLE_CSS
+
+class ReportTemplate:
+    """A `{field}` template parsed once into literal and field segments.
+
+    Rendering is a single join over the pre-split segments; values are
+    HTML-escaped unless passed through `raw`.
+    """
+
+    def __init__(self, source):
+        self.segments = [(literal, field) for literal, field, _, _ in Formatter().parse(source)]
+
+    def render(self, raw=(), **values):
+        parts = []
+        for literal, field in self.segments:
+            parts.append(literal)
+            if field is not None:
+                value = str(values[field])
+                parts.append(value if field in raw else html.escape(value))
+        return ''.join(parts)
+
+# The stylesheet is baked into the page head once, at import
+PAGE_START = ReportTemplate("""<!DOCTYPE html>
+<html lang="en">
+<head>
+    <meta charset="UTF-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1.0">
+    <title>{title}</title>
+    <style>""" + REPORT_CSS.replace('{', '{{').replace('}', '}}') + """</style>
+    {head_extra}
+</head>
+<body>
+<div class="container">
+""")
+
+PAGE_HEADER = ReportTemplate("""
+    <div class="header">
+        {logo}
+        <h1>{title}</h1>
+        <p>Generated on {generated}</p>
+    </div>
+""")
+
+METRICS_START = '\n    <div class="metrics-grid">\n'
+METRIC_CARD = ReportTemplate("""        <div class="metric-card">
+            <h3>{label}</h3>
+            <h2>{value}</h2>
+        </div>
+""")
+METRICS_END = '    </div>\n'
+
+SECTION_START = ReportTemplate("""
+    <div class="section">
+        <h2>{heading}</h2>
+""")
+SECTION_END = '    </div>\n'
+
+PLOT_START = ReportTemplate("""
+        <div class="plot-container">
+            <h3>{heading}</h3>
+""")
+PLOT_END = '        </div>\n'
+
+NO_DATA = """
+    <div class="section">
+        <h2>No Data Available</h2>
+        <p>No analysis data was found for this report.</p>
+    </div>
+"""
+
+PAGE_END = ReportTemplate("""
+    <div class="footer">
+        <p>Report generated from: {input_filename}</p>
+        <p>Thickness Uniformity Analysis System</p>
+    </div>
+</div>
+</body>
+</html>
+""")
+
+@lru_cache(maxsize=1)
+def logo_img_html():
+    """Returns the header logo as an inline <img>, read and base64-encoded once per process."""
+    try:
+        with open(LOGO_PATH, "rb") as f:
+            logo_base64 = base64.b64encode(f.read()).decode("utf-8")
+    except FileNotFoundError:
+        return ""
+    return f'<img src="data:image/png;base64,{logo_base64}" alt="Logo" class="logo">'
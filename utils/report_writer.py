@@ -0,0 +1,116 @@
+import html
+import json
+
+# Rows serialized per chunk when streaming the scores table into a report
+TABLE_CHUNK_ROWS = 10000
+
+# Styles for the client-side scores table (part of the shared report stylesheet)
+SCORES_TABLE_CSS = """
+.scores-table-meta { color: #5A6474; margin-bottom: 10px; }
+.scores-viewport {
+    height: 600px;
+    overflow: auto;
+    border-radius: 8px;
+    box-shadow: 0 2px 8px rgba(0,0,0,0.1);
+}
+.scores-viewport .styled-table { margin-bottom: 0; box-shadow: none; border-radius: 0; overflow: visible; }
+.scores-viewport .styled-table th { position: sticky; top: 0; cursor: pointer; user-select: none; white-space: nowrap; }
+.scores-viewport .styled-table td { height: 20px; white-space: nowrap; }
+.scores-viewport .spacer td { padding: 0; border: none; }
+"""
+
+# Virtualized, sortable table: only the rows in view are ever in the DOM
+SCORES_TABLE_JS = """
+<script>
+(function () {
+    const ROW_HEIGHT = 45, OVERSCAN = 10;
+    const data = JSON.parse(document.getElementById('scores-data').textContent);
+    const columns = data.columns;
+    let rows = [];
+    for (const chunk of data.chunks) for (const row of chunk) rows.push(row);
+
+    const viewport = document.getElementById('scores-viewport');
+    const head = viewport.querySelector('thead tr');
+    const body = viewport.querySelector('tbody');
+    document.getElementById('scores-count').textContent = rows.length.toLocaleString() + ' sensors · click a column header to sort';
+
+    function escapeHtml(value) {
+        return String(value).replace(/[&<>"]/g, c => ({'&': '&amp;', '<': '&lt;', '>': '&gt;', '"': '&quot;'}[c]));
+    }
+    function cell(value) {
+        if (value === null) return '<td></td>';
+        if (typeof value === 'number') return '<td>' + (Number.isInteger(value) ? value : value.toFixed(3)) + '</td>';
+        return '<td>' + escapeHtml(value) + '</td>';
+    }
+    function render() {
+        const first = Math.max(0, Math.floor(viewport.scrollTop / ROW_HEIGHT) - OVERSCAN);
+        const last = Math.min(rows.length, first + Math.ceil(viewport.clientHeight / ROW_HEIGHT) + 2 * OVERSCAN);
+        let html = '<tr class="spacer"><td colspan="' + columns.length + '" style="height:' + first * ROW_HEIGHT + 'px"></td></tr>';
+        for (let i = first; i < last; i++) html += '<tr>' + rows[i].map(cell).join('') + '</tr>';
+        html += '<tr class="spacer"><td colspan="' + columns.length + '" style="height:' + (rows.length - last) * ROW_HEIGHT + 'px"></td></tr>';
+        body.innerHTML = html;
+    }
+
+    let sortColumn = -1, ascending = true;
+    columns.forEach(function (name, i) {
+        const th = document.createElement('th');
+        th.textContent = name;
+        th.addEventListener('click', function () {
+            ascending = sortColumn === i ? !ascending : true;
+            sortColumn = i;
+            rows.sort(function (a, b) {
+                const x = a[i], y = b[i];
+                if (x === y) return 0;
+                if (x === null) return 1;
+                if (y === null) return -1;
+                return (x < y ? -1 : 1) * (ascending ? 1 : -1);
+            });
+            head.querySelectorAll('th').forEach(h => h.textContent = h.textContent.replace(/ [▲▼]$/, ''));
+            th.textContent = name + (ascending ? ' ▲' : ' ▼');
+            render();
+        });
+        head.appendChild(th);
+    });
+
+    viewport.addEventListener('scroll', function () { window.requestAnimationFrame(render); });
+    render();
+})();
+</script>
+"""
+
+def _escape_script_json(text):
+    """Keeps embedded JSON from closing its <script> element early."""
+    return text.replace('</', '<\\/')
+
+def write_scores_table(out, scores_data, chunk_rows=TABLE_CHUNK_ROWS):
+    """Streams a scores frame into `out` as chunked JSON plus a client-side virtualized table.
+
+    Rows are rounded and serialized one chunk at a time, so memory use does not
+    grow with the number of sensors and the report DOM holds only visible rows.
+    """
+    columns = [str(col) for col in scores_data.columns]
+    out.write('<div id="scores-count" class="scores-table-meta"></div>\n')
+    out.write('<div id="scores-viewport" class="scores-viewport">'
+              '<table class="styled-table"><thead><tr></tr></thead><tbody></tbody></table></div>\n')
+
+    out.write('<script type="application/json" id="scores-data">')
+    out.write(_escape_script_json(json.dumps({'columns': columns})[:-1]))
+    out.write(',"chunks":[')
+    for start in range(0, len(scores_data), chunk_rows):
+        if start:
+            out.write(',')
+        chunk = scores_data.iloc[start:start + chunk_rows].round(3)
+        out.write(_escape_script_json(chunk.to_json(orient='values', force_ascii=False)))
+    out.write(']}</script>\n')
+    out.write(SCORES_TABLE_JS)
+
+def write_static_scores_table(out, scores_data, chunk_rows=TABLE_CHUNK_ROWS):
+    """Streams a scores frame into `out` as a plain HTML table (no scripts), chunk by chunk."""
+    out.write('<table class="styled-table"><thead><tr>')
+    out.write(''.join(f'<th>{html.escape(str(col))}</th>' for col in scores_data.columns))
+    out.write('</tr></thead><tbody>\n')
+    for start in range(0, len(scores_data), chunk_rows):
+        cells = scores_data.iloc[start:start + chunk_rows].round(3).astype(str).apply(lambda col: col.map(html.escape))
+        rows = cells.agg('</td><td>'.join, axis=1)
+        out.write('<tr><td>' + '</td></tr>\n<tr><td>'.join(rows) + '</td></tr>\n')
+    out.write('</tbody></table>\n')
@@ -1,7 +1,6 @@
 import streamlit as st
 import streamlit.components.v1 as components
 import base64
-from io import BytesIO
 
 def load_custom_css():
     """Loads custom CSS for styling the application."""
@@ -359,28 +358,21 @@ def keyboard_shortcuts():
     """, height=0)
 
 def fig_to_base64(fig, width=800, height=None):
-    """OPTIMIZED: Converts a Plotly figure to a base64 encoded string."""
+    """Converts a Plotly figure to a base64 encoded PNG using the shared image export pool."""
     if fig is None:
         return ""
     
-    try:
-        import kaleido
-    except ImportError:
+    from utils.image_export import image_export_pool, kaleido_available
+    if not kaleido_available():
         st.warning("Kaleido library not found. Please install it for full report generation: `pip install kaleido`")
         return ""
     
-    try:
-        buf = BytesIO()
-        if height is None:
-            height = fig.layout.height if fig.layout.height else 500  # Reduced from 600
-        
-        # OPTIMIZATION: Direct conversion without threading for better performance
-        fig.write_image(buf, format="png", width=width, height=height, engine="kaleido")
-        return base64.b64encode(buf.getvalue()).decode("utf-8")
-        
-    except Exception as e:
-        st.warning(f"Figure conversion failed: {e}. Report will be generated without this image.")
+    # Workers keep their renderer warm, so repeated calls skip Kaleido's startup cost
+    images, _ = image_export_pool.convert([fig], fmt="png", width=width, height=height)
+    if not images[0]:
+        st.warning("Figure conversion failed. Report will be generated without this image.")
         return ""
+    return base64.b64encode(images[0]).decode("utf-8")
 
 def create_download_link_html(html_content, filename):
     """Generates a link to download the HTML report."""
@@ -2,6 +2,9 @@
 from .welcome import render_welcome_page
 from .upload import render_upload_page
 from .analysis import render_analysis_dashboard
+from .comparison import render_comparison_page
+from .batch import render_batch_page
+from .spc import render_spc_page
 from .help import render_help_page
 
-__all__ = ['render_welcome_page', 'render_upload_page', 'render_analysis_dashboard', 'render_help_page'] 
\ No newline at end of file
+__all__ = ['render_welcome_page', 'render_upload_page', 'render_analysis_dashboard', 'render_comparison_page', 'render_batch_page', 'render_spc_page', 'render_help_page'] 
\ No newline at end of file
@@ -1,5 +1,56 @@
 import streamlit as st
 import pandas as pd
+from processing.indexing import build_score_index
+from processing.scoring import SHAPE_COLUMNS
+from processing.spectral import ROUGHNESS_BANDS
+from processing.summary import summarize_scores
+from processing.exports import EXPORT_FORMATS, export_scores
+from processing.sweep import SWEEP_METRICS, DEFAULT_YIELD_THRESHOLD, target_grid, sweep_targets, optimal_target
+from processing.plotting import create_target_sweep_plot, create_cluster_profiles_plot, create_similar_profiles_plot, create_run_chart
+from processing.clustering import DEFAULT_CLUSTERS, MAX_CLUSTERS, cluster_profiles
+from processing.similarity import DEFAULT_NEIGHBOURS, find_similar
+from processing.drift import DRIFT_COLUMNS, DEFAULT_ROLLING_WINDOW, DEFAULT_CHANGE_PENALTY, analyze_drift
+from processing.disposition import LIMIT_COLUMNS, SpecLimits, evaluate_disposition
+from processing.data_processing import condition_spec_limits
+from utils.background_processing import background_generator, report_cache_key
+from utils.image_export import image_export_pool, kaleido_available
+
+PAGE_SIZES = [25, 50, 100, 250, 500]
+
+# Cluster members listed per cluster, closest to the centroid first
+CLUSTER_MEMBERS_SHOWN = 100
+
+# Largest neighbour count offered by the similar-sensor search
+MAX_NEIGHBOURS = 50
+
+# Display formats for the numeric columns of the scores table
+TABLE_COLUMN_CONFIG = {
+    'mean_thickness': "%.2f",
+    'thickness_sd': "%.2f",
+    'thickness_range': "%.2f",
+    'r2_straightness': "%.3f",
+    'slope': "%.3f",
+    'curvature': "%.2f",
+    'residual_rms': "%.3f",
+    'roughness_low': "%.3f",
+    'roughness_mid': "%.3f",
+    'roughness_high': "%.3f",
+    'ripple_wavelength': "%.3f",
+    'median_thickness': "%.2f",
+    'trimmed_mean': "%.2f",
+    'thickness_mad': "%.3f",
+    'thickness_iqr': "%.2f",
+    'TUS': "%.3f",
+    'RUS': "%.3f",
+}
+
+def table_column_formats(scores):
+    """Display formats for the score columns, including custom scores from the scoring profile."""
+    formats = {col: fmt for col, fmt in TABLE_COLUMN_CONFIG.items() if col in scores.columns}
+    for col in scores.columns:
+        if col not in formats and pd.api.types.is_float_dtype(scores[col]):
+            formats[col] = "%.3f"
+    return formats
 
 def render_analysis_dashboard(analysis_type):
     """
@@ -12,14 +63,22 @@ def render_analysis_dashboard(analysis_type):
 
     if analysis_type == 'Pre-OL':
         scores = st.session_state.get('pre_scores', pd.DataFrame())
+        score_index = st.session_state.get('pre_index')
+        summary = st.session_state.get('pre_summary')
         title = "Pre-OL Analysis"
         plots = st.session_state.get('pre_plots', {})
-        report_html = st.session_state.get('pre_report_html', "")
+        report_request = st.session_state.get('pre_report_request')
+        condition_df = st.session_state.get('pre_data')
+        similarity = st.session_state.get('pre_similarity')
     else: # Post-OL
         scores = st.session_state.get('post_scores', pd.DataFrame())
+        score_index = st.session_state.get('post_index')
+        summary = st.session_state.get('post_summary')
         title = "Post-OL Analysis"
         plots = st.session_state.get('post_plots', {})
-        report_html = st.session_state.get('post_report_html', "")
+        report_request = st.session_state.get('post_report_request')
+        condition_df = st.session_state.get('post_data')
+        similarity = st.session_state.get('post_similarity')
 
     st.header(title)
 
@@ -27,41 +86,77 @@ def render_analysis_dashboard(analysis_type):
         st.info(f"No {analysis_type} data was found in the uploaded file.")
         return
 
-    # Create tabs with improved performance
-    tab1, tab2, tab3 = st.tabs(["📊 Dashboard", "📋 Results", "📈 Plots"])
+    # Neighbours can come from any lot, so the drill-down uses the scores of the whole condition
+    condition_scores = scores
+
+    # Multi-lot files: every lot was scored and plotted during processing
+    lot_views = st.session_state.get('pre_lots' if analysis_type == 'Pre-OL' else 'post_lots') or {}
+    selected_lot = None
+    if lot_views:
+        selected_lot = st.selectbox(
+            "Lot", ["All lots"] + list(lot_views), key=f"lot_select_{analysis_type}",
+            help="Scores are normalised within each lot; 'All lots' shows every sensor together."
+        )
+        if selected_lot != "All lots":
+            view = lot_views[selected_lot]
+            scores, score_index, summary = view['scores'], view['index'], view['summary']
+            plots, report_request = view['plots'], view['report_request']
+
+    if summary is None:
+        summary = summarize_scores(scores)
+
+    # Each tab body is an independent fragment, so widget interactions inside
+    # a tab rerun only that tab instead of the whole app (CSS, sidebar, charts).
+    tab1, tab2, tab3, tab4, tab5 = st.tabs(["📊 Dashboard", "📋 Results", "📈 Plots", "🎯 Target Sweep", "🧬 Shape Clusters"])
 
     with tab1:
-        render_dashboard_tab(scores, plots, report_html, analysis_type)
+        render_dashboard_tab(scores, summary, plots, report_request, analysis_type)
 
+    lot = selected_lot if selected_lot not in (None, "All lots") else None
     with tab2:
-        render_results_tab(scores, analysis_type)
+        render_results_tab(scores, score_index, summary, analysis_type)
+        render_similar_sensors(condition_scores, similarity, lot, analysis_type)
 
     with tab3:
         render_plots_tab(plots, analysis_type)
 
-def render_dashboard_tab(scores, plots, report_html, analysis_type):
+    with tab4:
+        render_sweep_tab(scores, (report_request or {}).get('target_mean'), analysis_type)
+
+    with tab5:
+        render_clusters_tab(scores, summary, condition_df, lot, analysis_type)
+
+@st.fragment
+def render_dashboard_tab(scores, summary, plots, report_request, analysis_type):
     """Renders the content of the 'Dashboard' tab."""
     
     st.subheader("📊 Summary Metrics")
     col1, col2, col3, col4, col5, col6 = st.columns(6)
     
     with col1:
-        st.metric("Total Sensors", len(scores))
+        st.metric("Total Sensors", summary.count)
     with col2:
-        mean_thickness = scores['mean_thickness'].mean()
-        st.metric("Mean Thickness", f"{mean_thickness:.1f} μm")
+        st.metric("Mean Thickness", f"{summary.mean('mean_thickness'):.1f} μm")
     with col3:
-        mean_sd = scores['thickness_sd'].mean()
-        st.metric("Mean Std Dev", f"{mean_sd:.2f} μm")
+        st.metric("Mean Std Dev", f"{summary.mean('thickness_sd'):.2f} μm")
     with col4:
-        mean_range = scores['thickness_range'].mean()
-        st.metric("Mean Range", f"{mean_range:.2f} μm")
+        st.metric("Mean Range", f"{summary.mean('thickness_range'):.2f} μm")
     with col5:
-        mean_tus = scores['TUS'].mean()
-        st.metric("Mean TUS Score", f"{mean_tus:.3f}")
+        st.metric("Mean TUS Score", f"{summary.mean('TUS'):.3f}")
     with col6:
-        mean_rus = scores['RUS'].mean()
-        st.metric("Mean RUS Score", f"{mean_rus:.3f}")
+        st.metric("Mean RUS Score", f"{summary.mean('RUS'):.3f}")
+
+    st.divider()
+
+    report_request = report_request or {'title': f"{analysis_type} Thickness Report", 'target_mean': None, 'input_filename': None}
+    render_disposition_section(scores, summary, report_request['target_mean'], analysis_type)
+
+    st.divider()
+    render_drift_section(scores, analysis_type)
+
+    def current_disposition():
+        # Read at download time, so reports follow limits edited since this tab was drawn
+        return evaluate_disposition(scores, condition_spec_limits(analysis_type, report_request['target_mean']))
 
     st.divider()
 
@@ -69,18 +164,55 @@ def render_dashboard_tab(scores, plots, report_html, analysis_type):
     with st.container():
         st.subheader("📄 Download Report")
         col1, col2 = st.columns([3, 1])
+        # Only looks for an earlier build; the report is built when downloaded
+        report_future = background_generator.peek(report_cache_key(summary=summary, disposition=current_disposition(), **report_request))
         with col1:
-            st.success(f"✅ Complete HTML report with interactive charts is ready!")
+            if report_future is None:
+                st.info("The HTML report with interactive charts is built when you download it.")
+            elif report_future.done():
+                st.success(f"✅ Complete HTML report with interactive charts is ready!")
+            else:
+                st.info("⏳ The HTML report is being prepared in the background. Downloading now will wait for it to finish.")
             st.info(f"Full HTML report for {analysis_type} analysis with all visualizations and data tables.")
         with col2:
             st.download_button(
                 label="📥 Download HTML Report",
-                data=report_html,
+                data=lambda: background_generator.report_bytes(
+                    scores_data=scores, plot_objects=plots, summary=summary, disposition=current_disposition(), **report_request
+                ),
                 file_name=f"{analysis_type.replace('-', '_')}_report.html",
                 mime="text/html",
+                on_click="ignore",
                 use_container_width=True,
                 type="primary"
             )
+
+        # Static variant: charts pre-rendered as images, for email and archiving
+        if kaleido_available():
+            col1, col2, col3 = st.columns([2, 1, 1])
+            with col2:
+                image_format = st.selectbox(
+                    "Chart format", ["png", "svg"], format_func=str.upper,
+                    key=f"static_report_format_{analysis_type}", label_visibility="collapsed"
+                )
+            with col1:
+                throughput = image_export_pool.throughput()
+                st.caption(f"Static report with {image_format.upper()} charts, rendered on download"
+                           + (f" · {throughput:.1f} figures/s" if throughput else ""))
+            with col3:
+                # Rendered only when requested; repeat downloads reuse the cached build
+                st.download_button(
+                    label="📥 Static Report",
+                    data=lambda: background_generator.report_bytes(
+                        scores_data=scores, plot_objects=plots, summary=summary, variant=image_format,
+                        disposition=current_disposition(), **report_request
+                    ),
+                    file_name=f"{analysis_type.replace('-', '_')}_report_static.html",
+                    mime="text/html",
+                    on_click="ignore",
+                    use_container_width=True,
+                    key=f"static_report_download_{analysis_type}"
+                )
     
     st.divider()
 
@@ -94,13 +226,7 @@ def render_dashboard_tab(scores, plots, report_html, analysis_type):
         with st.expander("📊 TUS Statistics"):
             tus_stats = pd.DataFrame({
                 'Metric': ['Mean', 'Std Dev', 'Min', 'Max', 'Median'],
-                'Value': [
-                    f"{scores['TUS'].mean():.3f}",
-                    f"{scores['TUS'].std():.3f}",
-                    f"{scores['TUS'].min():.3f}",
-                    f"{scores['TUS'].max():.3f}",
-                    f"{scores['TUS'].median():.3f}"
-                ]
+                'Value': [f"{summary.stat('TUS', stat):.3f}" for stat in ['mean', 'std', 'min', 'max', '50%']]
             })
             st.dataframe(tus_stats, use_container_width=True, hide_index=True)
     
@@ -110,33 +236,132 @@ def render_dashboard_tab(scores, plots, report_html, analysis_type):
         with st.expander("📊 RUS Statistics"):
             rus_stats = pd.DataFrame({
                 'Metric': ['Mean', 'Std Dev', 'Min', 'Max', 'Median'],
-                'Value': [
-                    f"{scores['RUS'].mean():.3f}",
-                    f"{scores['RUS'].std():.3f}",
-                    f"{scores['RUS'].min():.3f}",
-                    f"{scores['RUS'].max():.3f}",
-                    f"{scores['RUS'].median():.3f}"
-                ]
+                'Value': [f"{summary.stat('RUS', stat):.3f}" for stat in ['mean', 'std', 'min', 'max', '50%']]
             })
             st.dataframe(rus_stats, use_container_width=True, hide_index=True)
 
-def render_results_tab(scores, analysis_type):
+@st.fragment
+def render_drift_section(scores, analysis_type):
+    """Renders the run chart of a score in production order with its rolling mean and detected shifts.
+
+    A fragment of its own: changing the column, window or sensitivity reruns
+    only the (vectorized) drift analysis, not the rest of the dashboard.
+    """
+    st.subheader("📉 Production Drift")
+    columns = [col for col in DRIFT_COLUMNS if col in scores.columns]
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        column = st.selectbox("Score", columns, format_func=DRIFT_COLUMNS.get, key=f"drift_col_{analysis_type}")
+    with col2:
+        window = st.slider("Rolling window (sensors)", 5, 1000, DEFAULT_ROLLING_WINDOW, step=5, key=f"drift_window_{analysis_type}")
+    with col3:
+        sensitivity = st.slider(
+            "Shift threshold", 1.0, 10.0, DEFAULT_CHANGE_PENALTY, step=0.5, key=f"drift_penalty_{analysis_type}",
+            help="Evidence a mean shift needs to be reported, relative to the sensor-to-sensor noise. Lower finds smaller shifts."
+        )
+
+    drift = analyze_drift(scores, column, window, sensitivity)
+    if drift is None:
+        st.info(f"No {DRIFT_COLUMNS[column]} values to analyse.")
+        return
+    segments = drift.segments()
+    shifts = segments.loc[segments['change_point'], 'shift']
+
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.metric("Shift Points", len(drift.change_points))
+    with col2:
+        st.metric("Largest Shift", f"{shifts.loc[shifts.abs().idxmax()]:+.3f}" if len(shifts) else "—")
+    with col3:
+        st.metric("Sensor-to-Sensor Noise (σ)", f"{drift.sigma:.3f}")
+
+    st.plotly_chart(create_run_chart(drift, DRIFT_COLUMNS[column]), use_container_width=True, key=f"run_chart_{analysis_type}")
+    st.caption(f"{len(drift.values):,} sensors ordered by lot and sensor ID · analysed in {drift.elapsed * 1000:.0f} ms. "
+               "Red dashed lines mark detected shifts; gray dotted lines separate lots.")
+    with st.expander("📋 Segments"):
+        st.dataframe(segments, use_container_width=True, hide_index=True,
+                     column_config={col: st.column_config.NumberColumn(format="%.3f") for col in ('mean', 'shift')})
+
+@st.fragment
+def render_disposition_section(scores, summary, target_mean, analysis_type):
+    """Renders the specification limits and the resulting lot disposition.
+
+    A fragment of its own: editing a limit re-evaluates only the pass/fail
+    masks over the cached scores, not the rest of the dashboard.
+    """
+    st.subheader("✅ Lot Disposition")
+    current = condition_spec_limits(analysis_type, target_mean)
+
+    with st.expander("📏 Specification Limits"):
+        limits = {}
+        for column, col in zip(LIMIT_COLUMNS, st.columns(len(LIMIT_COLUMNS))):
+            low, high = current.limits.get(column, (None, None))
+            with col:
+                st.markdown(f"**{LIMIT_COLUMNS[column]}**")
+                limits[column] = (
+                    st.number_input("Min", value=low, step=0.01, format="%.3f", placeholder="None", key=f"limit_low_{column}_{analysis_type}"),
+                    st.number_input("Max", value=high, step=0.01, format="%.3f", placeholder="None", key=f"limit_high_{column}_{analysis_type}"),
+                )
+        min_yield = st.slider("Minimum lot yield", 0.0, 1.0, float(current.min_yield), 0.01, key=f"min_yield_{analysis_type}")
+
+    try:
+        spec_limits = SpecLimits(limits, min_yield)
+    except ValueError as e:
+        st.error(f"**Limit Error:** {e}")
+        return
+    st.session_state.spec_limits = {**st.session_state.get('spec_limits', {}), analysis_type: spec_limits}
+    disposition = evaluate_disposition(scores, spec_limits)
+
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        st.metric("Disposition", f"{'✅' if disposition.accepted else '❌'} {disposition.status}")
+    with col2:
+        st.metric("Yield", f"{disposition.yield_:.1%}", f"{(disposition.yield_ - min_yield) * 100:+.1f} pts vs minimum")
+    with col3:
+        st.metric("Passed Sensors", f"{disposition.passed_count:,}")
+    with col4:
+        st.metric("Failed Sensors", f"{disposition.count - disposition.passed_count:,}")
+
+    if len(disposition.lots) > 1:
+        st.dataframe(disposition.lots, use_container_width=True, hide_index=True,
+                     column_config={'yield': st.column_config.NumberColumn(format="percent")})
+
+    failures = disposition.failure_counts[disposition.failure_counts > 0].sort_values(ascending=False)
+    if failures.empty:
+        return
+    col1, col2 = st.columns([1, 2])
+    with col1:
+        st.markdown("**Failures by Limit**")
+        st.dataframe(failures.rename_axis('Failure').reset_index(name='Sensors'), use_container_width=True, hide_index=True)
+    with col2:
+        failing = disposition.failing()
+        st.markdown(f"**Failing Sensors** (first {len(failing):,})")
+        st.dataframe(failing, use_container_width=True, hide_index=True,
+                     column_config={col: st.column_config.NumberColumn(format=fmt) for col, fmt in table_column_formats(failing).items()})
+    st.download_button(
+        label="📥 Download Pass/Fail Flags (CSV)",
+        data=lambda: export_scores(disposition.flags(), 'CSV', summary.fingerprint, filter_key=('disposition', spec_limits.key)),
+        file_name=f"{analysis_type.replace('-', '_')}_disposition.csv",
+        mime="text/csv",
+        on_click="ignore",
+        key=f"disposition_download_{analysis_type}"
+    )
+
+@st.fragment
+def render_results_tab(scores, score_index, summary, analysis_type):
     """Renders the content of the 'Results' tab."""
     st.subheader(f"📋 {analysis_type} Uniformity Scores")
     
     # Thickness statistics
     col1, col2, col3, col4 = st.columns(4)
     with col1:
-        st.metric("Total Sensors", len(scores))
+        st.metric("Total Sensors", summary.count)
     with col2:
-        thickness_mean = scores['mean_thickness'].mean()
-        st.metric("Mean Thickness", f"{thickness_mean:.1f} μm")
+        st.metric("Mean Thickness", f"{summary.mean('mean_thickness'):.1f} μm")
     with col3:
-        thickness_std = scores['thickness_sd'].mean()
-        st.metric("Mean Std Dev", f"{thickness_std:.2f} μm")
+        st.metric("Mean Std Dev", f"{summary.mean('thickness_sd'):.2f} μm")
     with col4:
-        thickness_range = scores['thickness_range'].mean()
-        st.metric("Mean Range", f"{thickness_range:.2f} μm")
+        st.metric("Mean Range", f"{summary.mean('thickness_range'):.2f} μm")
     
     st.divider()
     
@@ -148,15 +373,7 @@ def render_results_tab(scores, analysis_type):
         st.markdown("**Thickness Distribution**")
         thickness_stats = pd.DataFrame({
             'Metric': ['Mean', 'Std Dev', 'Min', 'Max', 'Median', 'Q1', 'Q3'],
-            'Value (μm)': [
-                f"{scores['mean_thickness'].mean():.2f}",
-                f"{scores['mean_thickness'].std():.2f}",
-                f"{scores['mean_thickness'].min():.2f}",
-                f"{scores['mean_thickness'].max():.2f}",
-                f"{scores['mean_thickness'].median():.2f}",
-                f"{scores['mean_thickness'].quantile(0.25):.2f}",
-                f"{scores['mean_thickness'].quantile(0.75):.2f}"
-            ]
+            'Value (μm)': [f"{summary.stat('mean_thickness', stat):.2f}" for stat in ['mean', 'std', 'min', 'max', '50%', '25%', '75%']]
         })
         st.dataframe(thickness_stats, use_container_width=True, hide_index=True)
     
@@ -164,18 +381,25 @@ def render_results_tab(scores, analysis_type):
         st.markdown("**Variability Metrics**")
         variability_stats = pd.DataFrame({
             'Metric': ['Mean Std Dev', 'Mean Range', 'Mean R²', 'Mean TUS', 'Mean RUS'],
-            'Value': [
-                f"{scores['thickness_sd'].mean():.3f}",
-                f"{scores['thickness_range'].mean():.3f}",
-                f"{scores['r2_straightness'].mean():.3f}",
-                f"{scores['TUS'].mean():.3f}",
-                f"{scores['RUS'].mean():.3f}"
-            ]
+            'Value': [f"{summary.mean(col):.3f}" for col in ['thickness_sd', 'thickness_range', 'r2_straightness', 'TUS', 'RUS']]
         })
         st.dataframe(variability_stats, use_container_width=True, hide_index=True)
     
     st.divider()
-    
+
+    render_filtered_results(scores, score_index, summary, analysis_type)
+
+@st.fragment
+def render_filtered_results(scores, score_index, summary, analysis_type):
+    """Renders the filter controls and the filtered scores table.
+
+    Runs as its own fragment so typing in the search box or dragging a slider
+    only recomputes and re-sends the filtered table. Filters are answered from
+    the lot's precomputed ScoreIndex rather than by scanning the scores frame.
+    """
+    if score_index is None or score_index.size != len(scores):
+        score_index = build_score_index(scores)
+
     # Filtering section
     with st.expander("🔍 Filter & Search Options"):
         col1, col2, col3 = st.columns(3)
@@ -186,70 +410,170 @@ def render_results_tab(scores, analysis_type):
             tus_range = st.slider("TUS Score Range", 0.0, 1.0, (0.0, 1.0), 0.01, key=f"tus_{analysis_type}")
         with col3:
             rus_range = st.slider("RUS Score Range", 0.0, 1.0, (0.0, 1.0), 0.01, key=f"rus_{analysis_type}")
+
+        # Shape filter on one polynomial fit feature; sensors without a fit only drop out once it is narrowed
+        shape_ranges = {}
+        roughness_columns = [f'roughness_{band}' for band in ROUGHNESS_BANDS]
+        shape_columns = [col for col in SHAPE_COLUMNS + roughness_columns if col in scores.columns and scores[col].notna().any()]
+        if shape_columns:
+            col1, col2 = st.columns([1, 2])
+            with col1:
+                shape_col = st.selectbox("Shape Feature", shape_columns, key=f"shape_col_{analysis_type}",
+                                         help="slope: wedge (μm/mm) · curvature: bow (μm/mm², negative for a dome) · residual_rms: cubic fit residual (μm) · "
+                                              "roughness_low/mid/high: RMS thickness (μm) in each spatial-frequency band")
+            low, high = float(scores[shape_col].min()), float(scores[shape_col].max())
+            with col2:
+                shape_range = st.slider(f"{shape_col} Range", low, high, (low, high), key=f"shape_range_{analysis_type}_{shape_col}") if high > low else (low, high)
+            if tuple(shape_range) != (low, high):
+                shape_ranges[shape_col] = shape_range
     
-    # Apply filters
-    filtered_scores = scores.copy()
-    if search_sensor:
-        filtered_scores = filtered_scores[filtered_scores['sensor_id'].str.contains(search_sensor, case=False, na=False)]
-    filtered_scores = filtered_scores[
-        (filtered_scores['TUS'] >= tus_range[0]) & (filtered_scores['TUS'] <= tus_range[1]) &
-        (filtered_scores['RUS'] >= rus_range[0]) & (filtered_scores['RUS'] <= rus_range[1])
-    ]
+    # Apply filters via the precomputed index
+    positions = score_index.query(search_sensor, {'TUS': tus_range, 'RUS': rus_range, **shape_ranges})
+    filtered_scores = scores.iloc[positions]
+    filter_key = (search_sensor, tuple(tus_range), tuple(rus_range), tuple((col, tuple(r)) for col, r in shape_ranges.items()))
+    filtered_summary = summary.for_subset(filter_key, scores, positions)
     
     # Display results
     col1, col2 = st.columns([3, 1])
     with col1:
-        st.info(f"Showing {len(filtered_scores):,} of {len(scores):,} sensors")
+        st.info(
+            f"Showing {len(filtered_scores):,} of {len(scores):,} sensors · "
+            f"mean TUS {filtered_summary.mean('TUS'):.3f} · mean RUS {filtered_summary.mean('RUS'):.3f}"
+        )
     with col2:
-        # Download button
-        csv_data = filtered_scores.to_csv(index=False).encode('utf-8')
+        # Exports are serialized only when the button is clicked, then cached
+        export_format = st.selectbox("Export format", list(EXPORT_FORMATS), key=f"export_fmt_{analysis_type}", label_visibility="collapsed")
+        extension, mime = EXPORT_FORMATS[export_format]
         st.download_button(
-            label="📥 Download CSV",
-            data=csv_data,
-            file_name=f"{analysis_type.replace('-', '_')}_scores.csv",
-            mime="text/csv",
+            label=f"📥 Download {export_format}",
+            data=lambda: export_scores(filtered_scores, export_format, summary.fingerprint, filter_key),
+            file_name=f"{analysis_type.replace('-', '_')}_scores.{extension}",
+            mime=mime,
+            on_click="ignore",
             use_container_width=True
         )
     
     if len(filtered_scores) > 0:
-        # Display data with improved formatting
-        display_df = filtered_scores.copy()
-        
-        # Format numerical columns
-        numerical_cols = ['mean_thickness', 'thickness_sd', 'thickness_range', 'r2_straightness', 'TUS', 'RUS']
-        for col in numerical_cols:
-            if col in display_df.columns:
-                if col in ['TUS', 'RUS', 'r2_straightness']:
-                    display_df[col] = display_df[col].apply(lambda x: f"{x:.3f}")
-                else:
-                    display_df[col] = display_df[col].apply(lambda x: f"{x:.2f}")
-        
-        # Simple styling function for better readability
-        def highlight_scores(val):
-            return ''  # No color coding - just neutral display
-        
-        # Apply styling
-        styled_df = display_df.style.applymap(highlight_scores, subset=['TUS', 'RUS'])
-        
-        st.dataframe(styled_df, use_container_width=True, hide_index=True)
+        render_paginated_table(scores, score_index, positions, analysis_type)
         
         # Top performers section
         if len(filtered_scores) >= 3:
             st.subheader("🏆 Top Performers")
+            id_cols = [col for col in ['lot_id', 'sensor_id'] if col in filtered_scores.columns]
             col1, col2 = st.columns(2)
             
             with col1:
                 st.markdown("**🥇 Best TUS Scores**")
-                top_tus = filtered_scores.nlargest(3, 'TUS')[['sensor_id', 'TUS', 'RUS']]
+                top_tus = filtered_scores.nlargest(3, 'TUS')[id_cols + ['TUS', 'RUS']]
                 st.dataframe(top_tus.round(3), use_container_width=True, hide_index=True)
             
             with col2:
                 st.markdown("**🥇 Best RUS Scores**")
-                top_rus = filtered_scores.nlargest(3, 'RUS')[['sensor_id', 'TUS', 'RUS']]
+                top_rus = filtered_scores.nlargest(3, 'RUS')[id_cols + ['TUS', 'RUS']]
                 st.dataframe(top_rus.round(3), use_container_width=True, hide_index=True)
     else:
         st.warning("No sensors match the current filter criteria.")
 
+def render_paginated_table(scores, score_index, positions, analysis_type):
+    """Renders one sorted page of the filtered scores.
+
+    Only the visible page is sliced out and sent to the browser; number
+    formatting is applied client-side through column_config.
+    """
+    column_formats = table_column_formats(scores)
+    sortable_cols = [col for col in ['lot_id', 'sensor_id'] if col in scores.columns] + list(column_formats)
+
+    col1, col2, col3, col4 = st.columns([2, 1, 1, 1])
+    with col1:
+        sort_col = st.selectbox("Sort by", sortable_cols, index=sortable_cols.index('TUS') if 'TUS' in sortable_cols else 0, key=f"sort_col_{analysis_type}")
+    with col2:
+        descending = st.toggle("Descending", value=True, key=f"sort_desc_{analysis_type}")
+    with col3:
+        page_size = st.selectbox("Rows per page", PAGE_SIZES, index=1, key=f"page_size_{analysis_type}")
+
+    total_pages = max(1, -(-len(positions) // page_size))
+    page_key = f"page_{analysis_type}"
+    # Clamp a stale page cursor after the filters shrink the result set
+    if st.session_state.get(page_key, 1) > total_pages:
+        st.session_state[page_key] = total_pages
+    with col4:
+        page = st.number_input(f"Page (of {total_pages:,})", min_value=1, max_value=total_pages, step=1, key=page_key)
+
+    ordered = score_index.order_by(positions, sort_col, scores[sort_col].to_numpy(), ascending=not descending)
+    start = (page - 1) * page_size
+    page_df = scores.iloc[ordered[start:start + page_size]]
+
+    st.dataframe(
+        page_df,
+        use_container_width=True,
+        hide_index=True,
+        column_config={col: st.column_config.NumberColumn(col, format=fmt) for col, fmt in column_formats.items()}
+    )
+    st.caption(f"Rows {start + 1:,}–{start + len(page_df):,} of {len(positions):,}")
+
+@st.fragment
+def render_similar_sensors(scores, similarity, lot, analysis_type):
+    """Renders the similar-sensor drill-down: the profiles nearest in shape to one sensor.
+
+    Queries the BallTree built for this condition during processing and,
+    optionally, the same condition's indexes of the other lots processed in
+    this session.
+    """
+    st.divider()
+    st.subheader("🔎 Find Similar Sensors")
+    if similarity is None:
+        st.info("No profile index is available for this condition.")
+        return
+
+    keys = similarity.keys
+    has_lots = 'lot_id' in keys.columns
+    library = st.session_state.get('similarity_library') or {}
+    # Profiles are only compared within a condition (Pre with Pre, Post with Post)
+    other_lots = [index for index in library.values() if index is not similarity and index.condition == similarity.condition]
+
+    col1, col2, col3 = st.columns([2, 2, 1])
+    with col1:
+        if has_lots and lot is None:
+            lot = st.selectbox("Sensor lot", list(pd.unique(keys['lot_id'])), key=f"similar_lot_{analysis_type}")
+        sensor_id = st.text_input("Sensor ID", key=f"similar_sensor_{analysis_type}",
+                                  placeholder=f"e.g. {keys['sensor_id'].iloc[0]}")
+    with col2:
+        scope = st.radio(
+            "Search in", ["This upload", f"All processed lots ({len(other_lots) + 1})"], key=f"similar_scope_{analysis_type}",
+            disabled=not other_lots, help="Lots processed earlier in this session stay searchable until the data is cleared."
+        )
+    with col3:
+        k = st.number_input("Neighbours", min_value=1, max_value=MAX_NEIGHBOURS, value=DEFAULT_NEIGHBOURS, key=f"similar_k_{analysis_type}")
+
+    if not sensor_id:
+        st.caption(f"Profiles of {similarity.size:,} sensors indexed in {similarity.build_seconds:.2f} s. "
+                   "Enter a sensor ID to find the sensors with the most similar profile shape.")
+        return
+    position = similarity.locate(sensor_id.strip(), lot)
+    if position is None:
+        st.warning(f"Sensor {sensor_id} was not found" + (f" in lot {lot}." if has_lots else "."))
+        return
+
+    indexes = [similarity] + (other_lots if scope != "This upload" else [])
+    matches, curves, seconds = find_similar(similarity, position, indexes, int(k))
+    st.caption(f"{len(matches)} nearest of {sum(index.size for index in indexes):,} profiles in {seconds * 1000:.1f} ms "
+               "(distance between normalized profiles; 0 = identical shape).")
+
+    # Scores are known for the sensors of this upload; other lots show their keys only
+    key_columns = list(keys.columns)
+    own = matches['source'] == similarity.source
+    table = matches.merge(scores[key_columns + ['TUS', 'RUS']].assign(source=similarity.source),
+                          on=['source'] + key_columns, how='left') if own.any() else matches
+    st.dataframe(table, use_container_width=True, hide_index=True,
+                 column_config={col: st.column_config.NumberColumn(format="%.3f") for col in ('distance', 'TUS', 'RUS')})
+
+    sensor_label = f"{lot} {sensor_id}".strip() if has_lots else str(sensor_id)
+    st.plotly_chart(
+        create_similar_profiles_plot(similarity.grid, similarity.vectors[position], sensor_label, matches, curves),
+        use_container_width=True, key=f"similar_plot_{analysis_type}"
+    )
+
+@st.fragment
 def render_plots_tab(plots, analysis_type):
     """Renders the content of the 'Plots' tab."""
     st.subheader(f"📈 {analysis_type} Thickness Profiles")
@@ -265,4 +589,136 @@ def render_plots_tab(plots, analysis_type):
     # RUS Profiles  
     with st.container():
         st.markdown("### 📏 RUS Profiles")
-        st.plotly_chart(plots.get('RUS_profile'), use_container_width=True, key=f"rus_profile_{analysis_type}") 
\ No newline at end of file
+        st.plotly_chart(plots.get('RUS_profile'), use_container_width=True, key=f"rus_profile_{analysis_type}") 
+
+    st.divider()
+
+    # Roughness spectrum
+    with st.container():
+        st.markdown("### 〰️ Roughness Spectrum")
+        st.caption("Power of the detrended profiles by spatial frequency, averaged over the lot. "
+                   "Low: bow (up to 2 cycles per window); mid and high: ripple.")
+        if plots.get('spectrum') is not None:
+            st.plotly_chart(plots['spectrum'], use_container_width=True, key=f"spectrum_{analysis_type}")
+
+@st.fragment
+def render_sweep_tab(scores, scored_target, analysis_type):
+    """Renders the 'Target Sweep' tab: TUS evaluated over a grid of target means from the cached scores."""
+    st.subheader(f"🎯 {analysis_type} Target Mean Sweep")
+    if scored_target is None:
+        st.info("The target mean used for scoring is unknown, so a sweep is not available.")
+        return
+    st.info("Evaluates every sensor's TUS at each target mean, without reprocessing. Only the mean penalty depends on the target.")
+
+    center = float(scores['mean_thickness'].median())
+    if pd.isna(center):
+        center = float(scored_target)
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        low = st.number_input("From (μm)", value=round(center - 5, 1), step=0.1, format="%.1f", key=f"sweep_low_{analysis_type}")
+    with col2:
+        high = st.number_input("To (μm)", value=round(center + 5, 1), step=0.1, format="%.1f", key=f"sweep_high_{analysis_type}")
+    with col3:
+        step = st.number_input("Step (μm)", value=0.05, min_value=0.001, step=0.01, format="%.3f", key=f"sweep_step_{analysis_type}")
+    with col4:
+        threshold = st.number_input("Yield threshold (TUS ≥)", value=DEFAULT_YIELD_THRESHOLD, min_value=0.0, max_value=1.0, step=0.05, format="%.2f", key=f"sweep_threshold_{analysis_type}")
+
+    try:
+        targets = target_grid(low, high, step)
+    except ValueError as e:
+        st.error(str(e))
+        return
+    if len(targets) > 5000:
+        st.warning(f"{len(targets):,} targets requested; please use a coarser step (at most 5,000 targets).")
+        return
+
+    metric = st.radio("Optimise", list(SWEEP_METRICS), format_func=SWEEP_METRICS.get, horizontal=True, key=f"sweep_metric_{analysis_type}")
+    profile = st.session_state.get('scoring_profile')
+    sweep = sweep_targets(scores, scored_target, targets, yield_threshold=threshold, profile=profile)
+    optimum = optimal_target(sweep, metric)
+    if optimum is None:
+        st.info("No sensor has finite scores to sweep, so there is no optimal target to show.")
+        return
+    current = sweep_targets(scores, scored_target, [scored_target], yield_threshold=threshold, profile=profile).iloc[0]
+
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.metric("Optimal Target", f"{optimum['target_mean']:.2f} μm", f"{optimum['target_mean'] - scored_target:+.2f} μm vs current", delta_color="off")
+    with col2:
+        st.metric("Mean TUS at Optimum", f"{optimum['mean_TUS']:.3f}", f"{optimum['mean_TUS'] - current['mean_TUS']:+.3f}")
+    with col3:
+        st.metric("Yield at Optimum", f"{optimum['yield']:.1%}", f"{(optimum['yield'] - current['yield']) * 100:+.1f} pts")
+
+    st.plotly_chart(
+        create_target_sweep_plot(sweep, metric, SWEEP_METRICS[metric], optimum, scored_target),
+        use_container_width=True, key=f"sweep_plot_{analysis_type}"
+    )
+    st.caption(f"{len(targets):,} targets × {len(scores):,} sensors · scored at {scored_target} μm. "
+               "Set the optimal target on the Data Upload page and reprocess to apply it.")
+
+@st.fragment
+def render_clusters_tab(scores, summary, condition_df, lot, analysis_type):
+    """Renders the 'Shape Clusters' tab: profile shape families found by mini-batch k-means.
+
+    Clustering runs once per lot and cluster count on request, then comes from
+    the clustering cache, so switching tabs or lots does not recompute it.
+    """
+    st.subheader(f"🧬 {analysis_type} Profile Shape Clusters")
+    st.info("Profiles are resampled onto a common position grid, normalized and grouped by shape "
+            "(dome, dish, wedge, edge roll-off, ...) regardless of how well they score.")
+    if condition_df is None:
+        st.info("The profile data for this condition is not available.")
+        return
+
+    col1, col2 = st.columns([3, 1])
+    with col1:
+        n_clusters = st.slider("Clusters", 2, MAX_CLUSTERS, DEFAULT_CLUSTERS, key=f"n_clusters_{analysis_type}")
+    requested_key = f"clusters_requested_{analysis_type}"
+    with col2:
+        if st.button("🧬 Find Shape Clusters", use_container_width=True, key=f"cluster_button_{analysis_type}"):
+            st.session_state[requested_key] = True
+    if not st.session_state.get(requested_key):
+        return
+
+    lot_df = condition_df if lot is None else condition_df[condition_df['lot_id'] == lot]
+    with st.spinner(f"Clustering {len(scores):,} profiles..."):
+        clusters = cluster_profiles(lot_df, n_clusters, lot_hash=(summary.fingerprint, analysis_type))
+    if clusters is None:
+        st.warning("No valid profiles to cluster.")
+        return
+    st.caption(f"{clusters.n_clusters} clusters over {len(clusters.keys):,} sensors · {len(clusters.grid)}-point grid · "
+               f"clustered in {clusters.elapsed:.2f} s")
+
+    st.dataframe(
+        clusters.summary(scores), use_container_width=True, hide_index=True,
+        column_config={
+            'share': st.column_config.NumberColumn(format="percent"),
+            'mean_TUS': st.column_config.NumberColumn(format="%.3f"),
+            'mean_RUS': st.column_config.NumberColumn(format="%.3f"),
+        }
+    )
+    st.plotly_chart(create_cluster_profiles_plot(clusters), use_container_width=True, key=f"cluster_plot_{analysis_type}")
+
+    st.markdown("**Cluster Members**")
+    membership = clusters.membership()
+    col1, col2 = st.columns([3, 1])
+    with col1:
+        cluster = st.selectbox(
+            "Cluster", list(range(1, clusters.n_clusters + 1)),
+            format_func=lambda c: f"C{c} · {clusters.shapes[c - 1]}", key=f"cluster_select_{analysis_type}"
+        )
+    with col2:
+        st.download_button(
+            label="📥 Download Membership (CSV)",
+            data=lambda: export_scores(membership, 'CSV', summary.fingerprint, filter_key=('clusters', analysis_type, n_clusters)),
+            file_name=f"{analysis_type.replace('-', '_')}_shape_clusters.csv",
+            mime="text/csv",
+            on_click="ignore",
+            use_container_width=True
+        )
+    keys = list(clusters.keys.columns)
+    members = membership[membership['cluster'] == cluster].nsmallest(CLUSTER_MEMBERS_SHOWN, 'distance')
+    members = members.merge(scores[keys + ['TUS', 'RUS']], on=keys, how='left')
+    st.dataframe(members, use_container_width=True, hide_index=True,
+                 column_config={col: st.column_config.NumberColumn(format="%.3f") for col in ('distance', 'TUS', 'RUS')})
+    st.caption(f"The {len(members):,} members closest to the cluster centroid (most representative first).")
@@ -0,0 +1,99 @@
+import os
+import datetime
+import pandas as pd
+import streamlit as st
+from processing.batch import build_lot_bundle, new_bundle_path, remove_stale_bundles
+from views.scoring_profiles import render_profile_selector
+from views.spc import append_lots
+
+def _read_bundle(path):
+    """The bundle ZIP's contents for the download button, closing the file once read."""
+    with open(path, "rb") as f:
+        return f.read()
+
+def render_batch_page():
+    """
+    Renders the batch page: many lot files in, one ZIP of reports and scores out.
+    """
+    st.header("Batch Lot Reports")
+    # Bundles of sessions that ended are never replaced, so old ones are swept here
+    remove_stale_bundles()
+
+    with st.container(border=True):
+        col1, col2 = st.columns([2, 1])
+        with col1:
+            st.markdown("##### 📤 Upload Lot Files")
+            uploaded_files = st.file_uploader(
+                "Choose CSV files",
+                type="csv",
+                accept_multiple_files=True,
+                help="Upload one CSV file per lot. Each file is scored and reported on its own."
+            )
+        with col2:
+            st.markdown("##### ⚙️ Set Target Means")
+            target_mean_pre = st.number_input("Target Mean Pre-OL (um)", value=st.session_state.get('target_mean_pre', 120.0), step=0.1, format="%.1f", key="batch_target_mean_pre")
+            target_mean_post = st.number_input("Target Mean Post-OL (um)", value=st.session_state.get('target_mean_post', 17.5), step=0.1, format="%.1f", key="batch_target_mean_post")
+            profile = render_profile_selector("batch_scoring_profile")
+
+    if uploaded_files and st.button(f"🚀 Build Reports for {len(uploaded_files)} Lots", use_container_width=True, type="primary"):
+        # Replace any previous bundle on disk
+        previous = st.session_state.get('batch_bundle')
+        if previous and os.path.exists(previous['path']):
+            os.remove(previous['path'])
+
+        bundle_path = new_bundle_path()
+        progress = st.progress(0.0, text="Scoring lots...")
+
+        def update_progress(done, total, lot):
+            progress.progress(done / total, text=f"Finished {lot} ({done}/{total})")
+
+        try:
+            results = build_lot_bundle(
+                [(f.name, f) for f in uploaded_files], target_mean_pre, target_mean_post,
+                bundle_path, progress_callback=update_progress, profile=profile
+            )
+        except Exception as e:
+            os.remove(bundle_path)
+            st.error(f"**Batch Error:** Could not build the report bundle. Error: {e}")
+            return
+
+        st.session_state.batch_bundle = {'path': bundle_path, 'results': results, 'profile': profile.label if profile is not None else None}
+        progress.empty()
+
+    bundle = st.session_state.get('batch_bundle')
+    if not bundle or not os.path.exists(bundle['path']):
+        return
+
+    results = bundle['results']
+    failed = [r for r in results if r['error']]
+    st.success(f"✅ Built {sum(len(r['entries']) for r in results)} reports for {len(results) - len(failed)} lots.")
+    for result in failed:
+        st.warning(f"**{result['lot']}:** {result['error']}")
+
+    overview = pd.DataFrame([
+        {'Lot': r['lot'], 'Condition': e['condition'], 'Sensors': e['sensors'],
+         'Mean TUS': e['mean_tus'], 'Mean RUS': e['mean_rus'], 'Yield': e['yield'], 'Disposition': e['disposition']}
+        for r in results for e in r['entries']
+    ])
+    if not overview.empty:
+        st.dataframe(overview, use_container_width=True, hide_index=True, column_config={
+            'Mean TUS': st.column_config.NumberColumn(format="%.3f"),
+            'Mean RUS': st.column_config.NumberColumn(format="%.3f"),
+            'Yield': st.column_config.NumberColumn(format="percent"),
+        })
+
+    # Lots go into the SPC history sorted by lot name, as listed above
+    entries = [(e['condition'], r['lot'], e['fingerprint'], e['spc_values'], e['sensors']) for r in results for e in r['entries']]
+    if entries and st.button(f"📈 Append {len(results) - len(failed)} Lots to SPC History", use_container_width=True, key="batch_spc_append"):
+        appended, skipped = append_lots(entries, bundle.get('profile'))
+        st.success(f"✅ Appended {appended} lot entries to the SPC history." + (f" {skipped} already there were skipped." if skipped else ""))
+
+    st.download_button(
+        label="📦 Download Report Bundle (ZIP)",
+        data=lambda: _read_bundle(bundle['path']),
+        file_name=f"lot_reports_{datetime.date.today().strftime('%Y%m%d')}.zip",
+        mime="application/zip",
+        on_click="ignore",
+        use_container_width=True,
+        type="primary"
+    )
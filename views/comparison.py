@@ -0,0 +1,88 @@
+import streamlit as st
+from processing.comparison import fit_transfer, add_transfer_residuals
+from processing.plotting import create_transfer_plot, create_delta_distribution_plot
+from processing.exports import EXPORT_FORMATS, export_scores
+
+# Sensors listed in the "largest changes" table
+TOP_CHANGES = 100
+
+def render_comparison_page():
+    """
+    Renders the Pre -> Post comparison: per-sensor deltas and the transfer regression.
+    """
+    if 'data_uploaded' not in st.session_state or not st.session_state.data_uploaded:
+        st.warning("Please upload and process data first on the 'Data Upload' page.")
+        return
+
+    st.header("Pre → Post Comparison")
+
+    comparison = st.session_state.get('comparison')
+    if comparison is None:
+        st.info("The comparison needs both Pre-OL and Post-OL data in the uploaded file.")
+        return
+
+    paired, transfer = comparison['paired'], comparison['transfer']
+    if paired.empty:
+        st.info("No sensor was measured in both conditions.")
+        return
+
+    selected_lot = None
+    if 'lot_id' in paired.columns and paired['lot_id'].nunique() > 1:
+        selected_lot = st.selectbox("Lot", ["All lots"] + sorted(paired['lot_id'].unique()), key="lot_select_comparison")
+        if selected_lot != "All lots":
+            paired = paired[paired['lot_id'] == selected_lot].copy()
+            transfer = fit_transfer(paired)
+            if transfer is not None:
+                add_transfer_residuals(paired, transfer)
+
+    st.caption(f"{len(paired):,} sensors measured in both conditions · "
+               f"{comparison['pre_only']:,} Pre-OL only · {comparison['post_only']:,} Post-OL only")
+
+    col1, col2, col3, col4, col5 = st.columns(5)
+    with col1:
+        st.metric("Paired Sensors", f"{len(paired):,}")
+    with col2:
+        st.metric("Mean ΔTUS", f"{paired['delta_TUS'].mean():+.3f}")
+    with col3:
+        st.metric("Mean ΔRUS", f"{paired['delta_RUS'].mean():+.3f}")
+    with col4:
+        st.metric("Transfer Slope", f"{transfer['slope']:.3f}" if transfer else "N/A")
+    with col5:
+        st.metric("Transfer R²", f"{transfer['r2']:.3f}" if transfer else "N/A")
+
+    if transfer:
+        st.info(f"Post-OL mean thickness ≈ {transfer['slope']:.3f} × Pre-OL + {transfer['intercept']:.2f} μm "
+                f"(residual SD {transfer['residual_sd']:.2f} μm over {transfer['n']:,} sensors).")
+
+    st.divider()
+
+    st.plotly_chart(create_transfer_plot(paired, transfer), use_container_width=True, key="transfer_plot")
+    col1, col2 = st.columns(2)
+    with col1:
+        st.plotly_chart(create_delta_distribution_plot(paired, 'TUS'), use_container_width=True, key="delta_tus_plot")
+    with col2:
+        st.plotly_chart(create_delta_distribution_plot(paired, 'RUS'), use_container_width=True, key="delta_rus_plot")
+
+    st.divider()
+
+    st.subheader("📉 Largest Changes")
+    change_col = st.selectbox("Rank by", ['delta_TUS', 'delta_RUS', 'transfer_residual'] if 'transfer_residual' in paired.columns else ['delta_TUS', 'delta_RUS'], key="comparison_rank_by")
+    largest = paired.reindex(paired[change_col].abs().nlargest(TOP_CHANGES).index)
+    st.dataframe(
+        largest, use_container_width=True, hide_index=True,
+        column_config={col: st.column_config.NumberColumn(format="%.3f") for col in paired.columns if col not in ('lot_id', 'sensor_id')}
+    )
+
+    col1, col2 = st.columns([1, 3])
+    with col1:
+        export_format = st.selectbox("Export format", list(EXPORT_FORMATS), key="comparison_export_format", label_visibility="collapsed")
+    with col2:
+        extension, mime = EXPORT_FORMATS[export_format]
+        st.download_button(
+            label=f"📥 Download Paired Scores ({export_format})",
+            data=lambda: export_scores(paired, export_format, comparison['fingerprint'], filter_key=('lot', selected_lot)),
+            file_name=f"pre_post_comparison.{extension}",
+            mime=mime,
+            on_click="ignore",
+            use_container_width=True
+        )
@@ -17,6 +17,7 @@ def render_help_page():
             - `thickness_mm`: The measured thickness, used for 'Post' condition analysis.
             - `condition`: The state of the measurement, either 'Pre' or 'Post'.
         - **'Pre' Condition Column:** If your data includes a 'Pre' condition, you must also include a `measurement_mm` column, which will be used for its thickness analysis.
+        - **Optional `lot_id` Column:** Files holding several lots can include a `lot_id` column. Sensors are then scored within their own lot, and the analysis pages let you switch between lots.
         - **Data Integrity:** Ensure position and thickness/measurement columns contain only numeric values and no missing data.
         """)
 
@@ -26,6 +27,26 @@ def render_help_page():
         **TUS (Targeted Uniformity Score):** This score evaluates a sensor's thickness profile based on two main criteria: its closeness to a specified target mean thickness and its overall flatness or uniformity. A high TUS indicates that the profile is both accurately on-target and highly uniform. This is useful when you have a specific thickness goal.
 
         **RUS (Relative Uniformity Score):** This score evaluates a sensor's profile based solely on its flatness and uniformity, without considering its average thickness. A high RUS signifies a very consistent and even profile, even if its average thickness is far from the target. This is useful for assessing the intrinsic quality of a process.
+
+        **Shape Features:** Every sensor's profile inside the scoring window is also fitted with quadratic and cubic least-squares polynomials. `slope` is the wedge (μm per mm at the window centre), `curvature` is the bow (μm/mm²; negative for a dome, positive for a dish), and `residual_rms` is what the cubic fit leaves unexplained (μm). They appear in the results table, can be filtered on the Results tab, and can be used in custom scores.
+
+        **Roughness:** The standard deviation mixes long-wavelength bow with short-wavelength ripple. Each profile in the scoring window is therefore resampled onto a uniform grid, detrended and Fourier transformed (the whole lot in one FFT). `roughness_low`, `roughness_mid` and `roughness_high` are the RMS thickness (μm) in the bands up to 2, 2–6 and above 6 cycles per window; a band finer than the measurement spacing can resolve is left empty. `ripple_wavelength` is the wavelength (mm) of the strongest ripple above the low band. The *Plots* tab and the reports show the lot-averaged spectrum, and the roughness columns can be filtered and used in custom scores.
+
+        **Scoring Profiles:** The weights behind TUS and RUS, the width of the target-mean penalty, the position window and any custom scores are grouped into named, versioned profiles. Create one under *Scoring Profiles* on the Data Upload page; custom scores are expressions over the per-sensor features (e.g. `cv = thickness_sd / mean_thickness`). Processed data can be re-scored with another profile without recomputing the features.
+
+        **Robust Statistics:** A single spike (e.g. a dust particle) inflates a sensor's standard deviation and range. Profiles can instead base the penalties on robust statistics: the median for the target penalty, the MAD (median absolute deviation, scaled to an SD) for smoothness and the interquartile range for the range penalty. Choose the built-in *Robust* profile or set *Penalty statistics* in the profile editor; the results then also list each sensor's median, 10% trimmed mean, MAD, IQR and spike count (points more than 3.5 robust SDs from the median).
+
+        **Edge Windows:** Besides the scoring window (0.2–0.8 mm by default), each profile measures extra position windows in the same pass. The standard profile adds `left_edge` (0.0–0.2 mm) and `right_edge` (0.8–1.0 mm), whose mean thickness and range appear in the results table to expose edge bead; custom scores can use any `<window>_<feature>` column, e.g. `edge_bead = left_edge_mean_thickness - mean_thickness`.
+
+        **Lot Disposition:** Specification limits (min and/or max) on mean thickness, standard deviation, range, R², TUS and RUS flag each sensor as pass or fail, with the reasons it failed. The lot yield is the share of passing sensors, and the lot is accepted when it reaches the minimum yield. Limits are edited live on the Dashboard tab, start from the target mean ± the scoring profile's mean penalty width (2 μm by default), and the disposition is included in the downloaded reports.
+
+        **Production Drift:** The *Dashboard* tab plots a score (mean thickness by default) against production order — by lot, then by the number in the sensor ID — with a rolling mean. Binary segmentation marks the points where the mean shifts: a split is kept when it explains clearly more than the sensor-to-sensor noise (the *Shift threshold*). Shifts are never placed across a lot boundary; a slow trend shows up as a staircase of small shifts.
+
+        **SPC Charts:** The *SPC Charts* page keeps a production history of lot-level statistics (mean thickness, TUS, RUS) and charts them on individuals (X̄), moving-range and EWMA control charts. Append the processed upload or a batch's lots; each lot becomes one point, judged against the limits of the lots before it, and the limits are updated from a small running state rather than recomputed from the whole history. A lot already in the history is skipped. The history is stored in `~/.sava_lot_analysis/spc` (or the `SPC_HISTORY_DIR` directory), survives restarts and is shared by every user of the app. Resetting it is only offered when the app is started with `SPC_ALLOW_RESET=1`, and the previous history is kept as a backup.
+
+        **Shape Clusters:** The *Shape Clusters* tab groups profiles by shape rather than by score. Each profile is resampled onto a common position grid, centred and scaled, and the lot is clustered with mini-batch k-means. Every cluster gets a shape name (flat, dome, dish, wedge, edge roll-off or edge bead), a representative plot with the spread of its members, and a membership table. Results are cached per lot and cluster count.
+
+        **Find Similar Sensors:** At the bottom of the *Results* tab, enter a sensor ID to list the sensors whose profile shape is closest to it, with an overlay of their normalized profiles. Profiles are indexed once per condition when the data is processed, so a search takes milliseconds. Lots processed earlier in the same session stay searchable (same condition only) until the data is cleared.
         """)
 
     with st.container(border=True):
@@ -33,7 +54,7 @@ def render_help_page():
         st.markdown("""
         - **File Upload Error:** If you see an error after uploading, double-check that your file is a valid CSV and that all the required column names are present and spelled correctly.
         - **No Data Displayed on Analysis Pages:** This usually means the 'condition' column in your CSV does not contain 'Pre' or 'Post' values for the respective analysis pages. Check for typos or different naming conventions.
-        - **Slow Performance:** For very large files (e.g., >100,000 rows), the initial data processing might take a few moments. Once the initial analysis is complete, navigating the app should be fast.
+        - **Slow Performance:** For very large files (e.g., >100,000 rows), the initial data processing might take a few moments. Once the initial analysis is complete, navigating the app should be fast. Files of 200,000 rows or more show provisional results first: a random sample of sensors, drawn from every lot in proportion to its size, is scored within about a second and shown with 95% bounds until the full results are ready.
         - **Incorrect Plots or Calculations:** Ensure that the numeric columns (`position_mm`, `thickness_mm`, `measurement_mm`) do not contain any text, special characters (except the decimal point), or missing values.
         - **Report Download Issues:** If the downloaded report doesn't look right, try trying to clear your browser cache or using a different web browser.
         """) 
\ No newline at end of file
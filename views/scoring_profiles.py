@@ -0,0 +1,111 @@
+import streamlit as st
+from processing.scoring import (
+    SCORING_PROFILES, DEFAULT_PROFILE, FEATURE_COLUMNS, PENALTY_COLUMNS, ROBUST_COLUMNS, ROUGHNESS_COLUMNS, EXPRESSION_FUNCTIONS, STATISTICS_MODES, ScoringProfile
+)
+
+def available_profiles():
+    """Built-in profiles plus the ones saved in this session, by label."""
+    return {**SCORING_PROFILES, **st.session_state.get('custom_profiles', {})}
+
+def render_profile_selector(key):
+    """Renders the scoring profile picker and returns the chosen profile."""
+    profiles = available_profiles()
+    current = st.session_state.get('scoring_profile') or DEFAULT_PROFILE
+    labels = list(profiles)
+    label = st.selectbox(
+        "Scoring Profile", labels,
+        index=labels.index(current.label) if current.label in labels else 0,
+        key=key, help="Weights, penalty width, position window and custom scores used for TUS/RUS."
+    )
+    return profiles[label]
+
+def _parse_expressions(text):
+    expressions = {}
+    for line in text.splitlines():
+        if not line.strip():
+            continue
+        name, sep, source = line.partition('=')
+        if not sep:
+            raise ValueError(f"Expected 'name = expression', got: {line.strip()}")
+        expressions[name.strip()] = source.strip()
+    return expressions
+
+def _parse_windows(text):
+    windows = {}
+    for line in text.splitlines():
+        if not line.strip():
+            continue
+        name, sep, bounds = line.partition('=')
+        low, comma, high = bounds.partition(',')
+        if not sep or not comma:
+            raise ValueError(f"Expected 'name = start, end', got: {line.strip()}")
+        try:
+            windows[name.strip()] = (float(low), float(high))
+        except ValueError:
+            raise ValueError(f"Window bounds must be numbers, got: {line.strip()}")
+    return windows
+
+def render_profile_editor():
+    """Renders the form that saves a new (or a new version of a) scoring profile for this session."""
+    profiles = available_profiles()
+    with st.expander("🧮 Scoring Profiles"):
+        base = profiles[st.selectbox("Start from", list(profiles), key="profile_editor_base")]
+        with st.form("profile_editor"):
+            name = st.text_input("Profile name", value="Custom" if base.name == DEFAULT_PROFILE.name else base.name)
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                window_low = st.number_input("Window start (mm)", value=float(base.window[0]), step=0.05, format="%.2f")
+            with col2:
+                window_high = st.number_input("Window end (mm)", value=float(base.window[1]), step=0.05, format="%.2f")
+            with col3:
+                mean_sigma = st.number_input("Mean penalty σ (μm)", value=float(base.mean_sigma), min_value=0.01, step=0.1, format="%.2f")
+            statistics = st.radio(
+                "Penalty statistics", STATISTICS_MODES, index=STATISTICS_MODES.index(base.statistics), horizontal=True,
+                format_func={'standard': "Standard (mean, SD, range)", 'robust': "Robust (median, MAD, IQR)"}.get,
+                help="Robust statistics ignore isolated spikes (e.g. dust) and add the median, trimmed mean, MAD, "
+                     "IQR and spike count of each sensor to the results."
+            )
+
+            terms = PENALTY_COLUMNS + [col for col in FEATURE_COLUMNS if col in ('r2_straightness', 'symmetry_bonus')]
+            st.markdown("**TUS weights**")
+            tus_cols = st.columns(len(terms))
+            tus_weights = {term: col.number_input(term, value=float(base.tus_weights.get(term, 0.0)), step=0.05, format="%.2f", key=f"tus_w_{term}")
+                           for term, col in zip(terms, tus_cols)}
+            st.markdown("**RUS weights**")
+            rus_cols = st.columns(len(terms))
+            rus_weights = {term: col.number_input(term, value=float(base.rus_weights.get(term, 0.0)), step=0.05, format="%.2f", key=f"rus_w_{term}")
+                           for term, col in zip(terms, rus_cols)}
+
+            windows_text = st.text_area(
+                "Extra windows (one `name = start, end` per line, mm)",
+                value="\n".join(f"{name} = {low:g}, {high:g}" for name, (low, high) in base.extra_windows.items()),
+                help="Measured in the same pass as the scoring window. Each window adds `<name>_<feature>` columns, "
+                     "e.g. `left_edge_mean_thickness`, usable in custom scores."
+            )
+            expressions_text = st.text_area(
+                "Custom scores (one `name = expression` per line)",
+                value="\n".join(f"{col} = {source}" for col, source in base.expressions.items()),
+                help=f"Columns: {', '.join(FEATURE_COLUMNS + PENALTY_COLUMNS + ROUGHNESS_COLUMNS)}, plus `<window>_<feature>` for each extra window "
+                     f"and, with robust statistics, {', '.join(ROBUST_COLUMNS)}. "
+                     f"Functions: {', '.join(EXPRESSION_FUNCTIONS)}."
+            )
+            submitted = st.form_submit_button("💾 Save Profile")
+
+        if submitted:
+            try:
+                versions = [p.version for p in profiles.values() if p.name == name.strip()]
+                profile = ScoringProfile(
+                    name.strip() or "Custom", version=max(versions, default=0) + 1,
+                    window=(window_low, window_high), mean_sigma=mean_sigma,
+                    tus_weights={term: w for term, w in tus_weights.items() if w},
+                    rus_weights={term: w for term, w in rus_weights.items() if w},
+                    category_edges=base.category_edges, expressions=_parse_expressions(expressions_text),
+                    extra_windows=_parse_windows(windows_text), statistics=statistics
+                )
+                if window_high <= window_low:
+                    raise ValueError("Window end must be after window start.")
+            except ValueError as e:
+                st.error(f"**Profile Error:** {e}")
+            else:
+                st.session_state.custom_profiles = {**st.session_state.get('custom_profiles', {}), profile.label: profile}
+                st.success(f"✅ Saved {profile.label}. Select it above to score with it.")
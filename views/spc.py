@@ -0,0 +1,101 @@
+import os
+import streamlit as st
+from processing.data_processing import CONDITIONS
+from processing.spc import SPC_COLUMNS, MIN_BASELINE_LOTS, SPC_ALLOW_RESET, SPC_BACKUPS_KEPT, lot_values, spc_history
+from processing.plotting import create_spc_chart
+
+def session_lots():
+    """Lots of the processed upload as (condition label, lot name, LotSummary): one per lot, or the file as one lot."""
+    lots = []
+    filename = st.session_state.get('input_filename') or "upload"
+    for condition in CONDITIONS:
+        prefix = condition.lower()
+        label = CONDITIONS[condition]['label']
+        lot_views = st.session_state.get(f'{prefix}_lots') or {}
+        if lot_views:
+            lots.extend((label, lot, view['summary']) for lot, view in lot_views.items() if view['summary'] is not None)
+        elif st.session_state.get(f'{prefix}_summary') is not None:
+            lots.append((label, os.path.splitext(filename)[0], st.session_state[f'{prefix}_summary']))
+    return lots
+
+def append_lots(lots, profile_label=None):
+    """Appends (condition label, lot name, key, values, sensors) lots to the history; returns (appended, skipped)."""
+    appended, skipped = 0, 0
+    for condition, lot, key, values, sensors in lots:
+        if spc_history.append_lot(key, lot, condition, values, sensors=sensors, profile=profile_label) is None:
+            skipped += 1
+        else:
+            appended += 1
+    return appended, skipped
+
+def render_spc_page():
+    """
+    Renders the SPC page: control charts of lot-level statistics across the stored production history.
+    """
+    st.header("Statistical Process Control")
+    st.info("Each appended lot adds one point per statistic. Control limits and the EWMA are updated incrementally "
+            "from a small running state, and each point is judged against the limits of the lots before it.")
+
+    with st.container(border=True):
+        st.markdown("##### ➕ Add Lots to the History")
+        lots = session_lots()
+        if not lots:
+            st.caption("Process a file on the Data Upload page (or build a batch) to add its lots here.")
+        else:
+            st.caption(f"Processed upload: {', '.join(f'{lot} ({condition})' for condition, lot, _ in lots)}")
+            if st.button(f"📈 Append {len(lots)} Lot(s)", type="primary", key="spc_append"):
+                profile = st.session_state.get('scoring_profile')
+                appended, skipped = append_lots(
+                    [(condition, lot, summary.fingerprint, lot_values(summary), summary.count) for condition, lot, summary in lots],
+                    profile.label if profile is not None else None
+                )
+                st.success(f"✅ Appended {appended} lot(s)." + (f" {skipped} already in the history were skipped." if skipped else ""))
+
+    records = spc_history.records()
+    if not records:
+        st.info(f"The history is empty. Control limits appear once {MIN_BASELINE_LOTS} lots have been appended.")
+        return
+
+    col1, col2 = st.columns(2)
+    with col1:
+        condition = st.selectbox("Condition", [c['label'] for c in CONDITIONS.values()], key="spc_condition")
+    with col2:
+        column = st.selectbox("Statistic", list(SPC_COLUMNS), format_func=SPC_COLUMNS.get, key="spc_column")
+
+    data = spc_history.chart_data(condition, column)
+    if data.empty:
+        st.info(f"No {condition} lots in the history yet.")
+        return
+
+    signals = data[['signal', 'mr_signal', 'ewma_signal']].any(axis=1)
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.metric("Lots", len(data))
+    with col2:
+        st.metric("Out-of-Control Lots", int(signals.sum()))
+    with col3:
+        latest = data.iloc[-1]
+        st.metric("Latest Lot", latest['lot'], delta="Signal" if signals.iloc[-1] else "In control",
+                  delta_color="inverse" if signals.iloc[-1] else "normal")
+
+    st.plotly_chart(create_spc_chart(data, SPC_COLUMNS[column]), use_container_width=True, key="spc_chart")
+
+    with st.expander("📋 Lot History"):
+        st.dataframe(data, use_container_width=True, hide_index=True)
+        st.download_button(
+            label="📥 Download History (CSV)",
+            data=lambda: data.to_csv(index=False),
+            file_name=f"spc_{condition}_{column}.csv",
+            mime="text/csv",
+            on_click="ignore",
+        )
+
+    # The history is shared by every user of the app, so only an operator can enable resetting it
+    if SPC_ALLOW_RESET:
+        with st.expander("🗑️ Reset History"):
+            st.warning(f"Starts a new history for every user. The current one is moved to a backup next to "
+                       f"`{spc_history.directory}` (the newest {SPC_BACKUPS_KEPT} backups are kept).")
+            confirm = st.checkbox("I understand every user's charts start over", key="spc_reset_confirm")
+            if st.button("Reset History", disabled=not confirm, key="spc_reset"):
+                spc_history.reset()
+                st.rerun()
@@ -1,5 +1,49 @@
 import streamlit as st
-from processing.data_processing import load_and_validate_data, process_and_cache_results, get_session_id
+from processing.data_processing import load_and_validate_data, process_and_cache_results, rescore_cached_results, get_session_id
+from processing.exports import clear_export_cache
+from processing.preview import PREVIEW_COLUMNS, preview_upload
+from processing.plotting import create_preview_histogram
+from views.scoring_profiles import render_profile_selector, render_profile_editor
+
+def session_lot_hashes():
+    """Content hashes of this session's processed lots, which key its cached exports."""
+    hashes = []
+    for prefix in ('pre', 'post'):
+        summaries = [st.session_state.get(f'{prefix}_summary')]
+        summaries += [view['summary'] for view in (st.session_state.get(f'{prefix}_lots') or {}).values()]
+        hashes += [summary.fingerprint for summary in summaries if summary is not None]
+    comparison = st.session_state.get('comparison')
+    if comparison:
+        hashes.append(comparison.get('fingerprint'))
+    return hashes
+
+def render_preview(preview):
+    """
+    Renders provisional results from an UploadPreview while the full scoring runs.
+    """
+    with st.container(border=True):
+        st.markdown("##### ⏳ Provisional Results")
+        st.caption(
+            f"Estimated from a stratified sample of {preview.sampled:,} of {preview.population:,} sensors "
+            f"({preview.fraction:.1%}, drawn lot by lot) in {preview.elapsed:.2f} s; ranges are 95% bounds. "
+            "Full scoring is running and replaces this preview when it finishes."
+        )
+        if not preview.exact_range:
+            st.caption("⚠️ Robust profile: the range penalty uses the largest IQR in the sample, so TUS and RUS lean low.")
+        for label, scores in preview.scores.items():
+            scored, estimated = preview.sensors(label)
+            st.markdown(f"**{label}** · {scored:,} sensors scored of ~{estimated:,}")
+            cols = st.columns(len(PREVIEW_COLUMNS))
+            for col, (column, name) in zip(cols, PREVIEW_COLUMNS.items()):
+                estimate, low, high = preview.estimate(label, column)
+                with col:
+                    st.metric(name, f"{estimate:.3f}", help=f"95% bounds: {low:.3f} – {high:.3f}")
+                    st.caption(f"{low:.3f} – {high:.3f}")
+            cols = st.columns(2)
+            for col, column in zip(cols, ['TUS', 'RUS']):
+                with col:
+                    st.plotly_chart(create_preview_histogram(preview.histogram(label, column), column),
+                                    use_container_width=True, key=f"preview_{label}_{column}")
 
 def render_upload_page():
     """
@@ -21,6 +65,9 @@ def render_upload_page():
             st.markdown("##### ⚙️ Set Target Means")
             st.session_state.target_mean_pre = st.number_input("Target Mean Pre-OL (um)", value=st.session_state.get('target_mean_pre', 120.0), step=0.1, format="%.1f")
             st.session_state.target_mean_post = st.number_input("Target Mean Post-OL (um)", value=st.session_state.get('target_mean_post', 17.5), step=0.1, format="%.1f")
+            profile = render_profile_selector("upload_scoring_profile")
+
+    render_profile_editor()
 
     # --- Processing and Validation ---
     if st.session_state.get('data_uploaded', False):
@@ -48,11 +95,21 @@ def render_upload_page():
                 else:
                     st.metric("Post-OL Sensors", "0")
         
+        current_profile = st.session_state.get('scoring_profile')
+        if current_profile is not None and profile.label != current_profile.label:
+            st.info(f"Results were scored with **{current_profile.label}**.")
+            if st.button(f"🔁 Re-score with {profile.label}", type="primary"):
+                with st.spinner("Re-scoring from cached sensor features..."):
+                    rescore_cached_results(profile)
+                st.rerun()
+
         if st.button("🗑️ Clear Processed Data", type="secondary"):
             # Clear Streamlit caches first - this is critical for preventing data contamination
             try:
                 # Clear all @st.cache_data caches
                 st.cache_data.clear()
+                # Only this session's exports: the export cache is shared by all sessions
+                clear_export_cache(session_lot_hashes())
                 # Alternative: Clear specific cached functions if needed
                 # load_and_validate_data.clear()  
                 # process_and_cache_results.clear()
@@ -62,8 +119,11 @@ def render_upload_page():
             
             # Reset session state related to data
             keys_to_clear = [
-                'data_uploaded', 'processed_data', 'pre_scores', 'post_scores', 
-                'pre_plots', 'post_plots', 'pre_report_html', 'post_report_html', 
+                'data_uploaded', 'processed_data', 'pre_scores', 'post_scores', 'pre_index', 'post_index',
+                'pre_summary', 'post_summary',
+                'pre_data', 'post_data', 'pre_features', 'post_features', 'scoring_profile',
+                'pre_plots', 'post_plots', 'pre_lots', 'post_lots', 'pre_report_request', 'post_report_request', 'comparison', 'spec_limits',
+                'pre_similarity', 'post_similarity', 'similarity_library',
                 'processed_filename', 'input_filename', 'background_processing_started'
             ]
             
@@ -94,8 +154,13 @@ def render_upload_page():
                     st.info(f"**Sensors:** {df['sensor_id'].nunique():,}")
                 
                 if st.button("🚀 Process Data", use_container_width=True, type="primary"):
+                    # Large uploads get provisional results from a sample first;
+                    # the rerun after full processing replaces them
+                    preview = preview_upload(df, st.session_state.target_mean_pre, st.session_state.target_mean_post, profile)
+                    if preview is not None:
+                        render_preview(preview)
                     with st.spinner("Processing data... This may take a moment."):
-                        process_and_cache_results(df, st.session_state.target_mean_pre, st.session_state.target_mean_post, uploaded_file.name)
+                        process_and_cache_results(df, st.session_state.target_mean_pre, st.session_state.target_mean_post, uploaded_file.name, profile)
                     st.rerun()
 
         except ValueError as e:
@@ -35,7 +35,7 @@ def render_welcome_page():
         <div class="feature-box">
             <div class="icon">📄</div>
             <h3>3. Export</h3>
-            <p>Download comprehensive HTML reports for each analysis stage, or export the calculated uniformity scores to a CSV file for further use.</p>
+            <p>Download comprehensive HTML reports for each analysis stage, or export the calculated uniformity scores as CSV, Parquet or Excel for further use.</p>
         </div>
         """, unsafe_allow_html=True)
     